@@ -1,2 +1,21 @@
+from magnet_regex.budget import CancellationToken, MatchBudgetExceeded
+from magnet_regex.instrument import Profile
+from magnet_regex.matcher import Match, Matcher
+from magnet_regex.pattern import (
+    Pattern,
+    PatternCache,
+    cache_stats,
+    compile,
+    findall,
+    finditer,
+    match,
+    profile,
+    purge,
+    search,
+    set_cache_size,
+)
+from magnet_regex.regex_set import RegexSet
+
+
 def hello() -> str:
     return "Hello from magnet-regex!"
@@ -0,0 +1,10 @@
+"""Helpers shared by the test modules"""
+
+from magnet_regex.ast_node import ASTNode
+from magnet_regex.lexer import Lexer
+from magnet_regex.parser import Parser
+
+
+def parse(pattern: str) -> ASTNode:
+    """The AST of `pattern`, as the matchers in the tests are built from"""
+    return Parser(Lexer(pattern).tokenize()).parse()
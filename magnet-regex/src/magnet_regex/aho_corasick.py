@@ -0,0 +1,72 @@
+"""Aho-Corasick automaton: finds the occurrences of many literals in one pass over the text.
+
+The literals are stored in a trie. Every node also gets a failure link, to the node for the
+longest proper suffix of its string that is in the trie, and the list of literals ending there
+(its own and those reachable through failure links). Scanning follows one goto or failure edge per
+character, whatever the number of literals.
+"""
+
+from collections import deque
+from typing import Iterator
+
+
+class AhoCorasick:
+    def __init__(self, literals: list[str], ignore_case: bool = False):
+        self.ignore_case = ignore_case
+        self.literals = [literal.lower() if ignore_case else literal for literal in literals]
+        # Per node: goto edges, failure link and the indexes of the literals ending there
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._outputs: list[tuple[int, ...]] = [()]
+
+        for index, literal in enumerate(self.literals):
+            self._insert(index, literal)
+        self._link()
+
+    def _insert(self, index: int, literal: str):
+        node = 0
+        for char in literal:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append(())
+                self._goto[node][char] = next_node
+            node = next_node
+        self._outputs[node] += (index,)
+
+    def _link(self):
+        # Breadth first, so that the failure target of a node is always done before the node
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._outputs[child] += self._outputs[self._fail[child]]
+
+    def iter_matches(self, text: str) -> Iterator[tuple[int, int]]:
+        """Yields (literal index, end) for every occurrence of every literal, by increasing end"""
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        ignore_case = self.ignore_case
+        node = 0
+
+        for pos, char in enumerate(text):
+            if ignore_case:
+                char = char.lower()
+            while True:
+                next_node = goto[node].get(char)
+                if next_node is not None:
+                    node = next_node
+                    break
+                if node == 0:
+                    break
+                node = fail[node]
+
+            for index in outputs[node]:
+                yield index, pos + 1
@@ -1,5 +1,5 @@
-from dataclasses import dataclass
-from typing import Optional, Set
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Set, Tuple
 
 
 @dataclass
@@ -15,6 +15,16 @@ class CharNode(ASTNode):
         return f"Char({self.char!r})"
 
 
+@dataclass
+class LiteralNode(ASTNode):
+    """A run of characters matched one after the other, made by the optimizer out of CharNodes"""
+
+    text: str
+
+    def __repr__(self):
+        return f"Literal({self.text!r})"
+
+
 @dataclass
 class DotNode(ASTNode):
     def __repr__(self):
@@ -27,18 +37,22 @@ class CharClassNode(ASTNode):
 
     chars: Set[str]
     negated: bool = False  # True if the class contains a caret: [^m]
+    # Ranges such as a-z, as (first, last) characters. They are kept as is rather than expanded
+    # into `chars`, since they can span most of Unicode.
+    ranges: List[Tuple[str, str]] = field(default_factory=list)
 
     def __repr__(self):
         prefix = "^" if self.negated else ""
-        chars_str = "".join(sorted(self.chars)[:10])
-        if len(self.chars) > 10:
+        chars_str = "".join(f"{first}-{last}" for first, last in self.ranges[:10])
+        chars_str += "".join(sorted(self.chars)[:10])
+        if len(self.chars) > 10 or len(self.ranges) > 10:
             chars_str += "..."
         return f"CharClass([{prefix}{chars_str}])"
 
 
 @dataclass
 class PredefinedClassNode(ASTNode):
-    """A class node with a known key characteristic: \d, \D, \w, \W, etc"""
+    r"""A class node with a known key characteristic: \d, \D, \w, \W, etc"""
 
     # TODO: This should be an enum
     class_type: str
@@ -61,8 +75,11 @@ class QuantifierNode(ASTNode):
     # The lazy match will have 2 matches, one for each group of characters between quotes.
     # False for lazy qunatifiers: (*?, +?, ??, {n,m}?)
     greedy: bool = True
+    # Possessive quantifiers (*+, ++, ?+, {n,m}+) are greedy and never give back a repetition
+    possessive: bool = False
 
-    def __repr__(self):
+    def symbol(self) -> str:
+        """The quantifier as written in a pattern"""
         q = None
         if self.min_count == 0 and self.max_count == 1:
             q = "?"
@@ -75,8 +92,12 @@ class QuantifierNode(ASTNode):
 
         if not self.greedy:
             q += "?"
+        elif self.possessive:
+            q += "+"
+        return q
 
-        return f"Quantifier({self.child} {q})"
+    def __repr__(self):
+        return f"Quantifier({self.child} {self.symbol()})"
 
 
 @dataclass
@@ -116,6 +137,16 @@ class NonCapturingGroupNode(ASTNode):
         return f"NonCapturingGroup({self.child})"
 
 
+@dataclass
+class AtomicGroupNode(ASTNode):
+    """`(?>...)`: the first match of the child is kept, its alternatives are never tried"""
+
+    child: ASTNode
+
+    def __repr__(self):
+        return f"AtomicGroup({self.child})"
+
+
 @dataclass
 class BackreferenceNode(ASTNode):
     # Referencing previous captured group through indexing: \1, \2, etc
@@ -153,3 +184,57 @@ class LookbehindNode(ASTNode):
     def __repr__(self):
         prefix = "?<=" if self.positive else "?<!"
         return f"Lookbehind({prefix}{self.child})"
+
+
+def child_nodes(node: ASTNode) -> list[ASTNode]:
+    """Returns the direct children of `node`, in pattern order"""
+    if isinstance(node, ConcatNode):
+        return list(node.children)
+    if isinstance(node, AlternationNonde):
+        return list(node.alternatives)
+    if isinstance(
+        node,
+        (
+            QuantifierNode,
+            GroupNode,
+            NonCapturingGroupNode,
+            AtomicGroupNode,
+            LookaheadNode,
+            LookbehindNode,
+        ),
+    ):
+        return [node.child]
+    return []
+
+
+def walk(node: ASTNode) -> Iterator[ASTNode]:
+    """Yields `node` and all of its descendants, depth first"""
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        yield current
+        stack.extend(reversed(child_nodes(current)))
+
+
+def format_tree(node: ASTNode, indent: int = 0) -> str:
+    """Human readable listing of the tree under `node`, one node per line"""
+    if isinstance(node, ConcatNode):
+        label = "Concat"
+    elif isinstance(node, AlternationNonde):
+        label = "Alternation"
+    elif isinstance(node, QuantifierNode):
+        label = f"Quantifier({node.symbol()})"
+    elif isinstance(node, GroupNode):
+        label = f"Group#{node.group_number}"
+    elif isinstance(node, NonCapturingGroupNode):
+        label = "NonCapturingGroup"
+    elif isinstance(node, AtomicGroupNode):
+        label = "AtomicGroup"
+    elif isinstance(node, (LookaheadNode, LookbehindNode)):
+        label = f"{type(node).__name__[:-4]}({'positive' if node.positive else 'negative'})"
+    else:
+        label = repr(node)
+
+    lines = ["  " * indent + label]
+    lines.extend(format_tree(child, indent + 1) for child in child_nodes(node))
+    return "\n".join(lines)
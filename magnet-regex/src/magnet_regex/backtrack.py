@@ -0,0 +1,469 @@
+"""Backtracking interpreter for the compiled program.
+
+Runs one thread at a time and keeps the alternatives it did not take on an explicit stack, next to
+the slot values to restore when it backtracks past a SAVE. This is the only engine that can run
+backreferences and atomic groups.
+
+On its own, backtracking takes exponential time on ambiguous patterns such as `(a|aa)*c`, which
+reach the same instruction at the same position along many paths and fail from there every time.
+Once a run has backtracked enough to suggest that, the backtracker starts recording the states it
+enters at join points (instructions with more than one way in). Entering a recorded state again
+means it was explored already and failed, since a success would have ended the run, so the path
+is cut. Each state is then explored once, and the run takes polynomial time.
+
+Loops that repeat a single character test, such as `[0-9]+`, `[a-z]*` or `.*`, skip the SPLIT they
+would go through for every character. A greedy one scans for the longest run and keeps one stack
+entry, which steps back a character each time it is resumed; a lazy one grows by a character each
+time. Either way, a long run costs no stack entry per character. Runs that use the memo go
+through those loops one character at a time, like any other.
+
+What happens from a state depends on its instruction and position, and also on the slots the
+rest of the program reads: the groups of later backreferences, and the MARK registers of the
+loops it is in. A liveness analysis finds those slots for every join point. States that read
+none are recorded in a bitset of join points by positions, the others in a set that includes the
+slot values. The memo never changes which match is found, and it is only used when the bitset
+fits in `MEMO_MAX_BYTES`; longer texts are backtracked plainly.
+"""
+
+from typing import Optional
+
+from magnet_regex.budget import NEVER, Budget
+from magnet_regex.compiler import (
+    ANY,
+    ASSERT,
+    ATOMIC,
+    BACKREF,
+    CHAR,
+    CHECK,
+    JMP,
+    LOOK,
+    MARK,
+    MATCH,
+    SAVE,
+    SET,
+    SPLIT,
+    Program,
+)
+
+# Stack entries below every restore entry (-1 - slot), for the loops in `Program.tight_loops`.
+# (_GREEDY - split, pos) resumes after a greedy loop that last stopped at `pos`, with the entry
+# (_BOUND, start) right under it holding where the loop started. (_LAZY - split, pos) resumes
+# after a lazy loop one character further than `pos`.
+_GREEDY = -(1 << 40)
+_LAZY = -(1 << 50)
+_BOUND = -(1 << 60)
+
+
+def join_points(program: Program) -> tuple[list[int], list[tuple[int, ...]]]:
+    """Numbers the join points of `program`: the rank of each instruction with more than one
+    predecessor, -1 for the others. Also returns, for every instruction, the slots that what runs
+    from there can read before writing them."""
+    ops, xs, ys, args = program.ops, program.x, program.y, program.args
+    successors: list[tuple[int, ...]] = []
+    predecessors = [0] * len(ops)
+    for pc, op in enumerate(ops):
+        if op == SPLIT:
+            successors.append((xs[pc], ys[pc]))
+        elif op == JMP:
+            successors.append((xs[pc],))
+        elif op == CHECK:
+            successors.append((pc + 1, xs[pc]))
+        elif op == MATCH:
+            successors.append(())
+        else:
+            successors.append((pc + 1,))
+        for successor in successors[pc]:
+            predecessors[successor] += 1
+
+    ranks = []
+    join_count = 0
+    for count in predecessors:
+        if count > 1:
+            ranks.append(join_count)
+            join_count += 1
+        else:
+            ranks.append(-1)
+
+    # Backwards liveness, iterated until nothing changes since loops feed back into themselves
+    live: list[frozenset[int]] = [frozenset()] * len(ops)
+    changed = True
+    while changed:
+        changed = False
+        for pc in range(len(ops) - 1, -1, -1):
+            op = ops[pc]
+            reads = frozenset().union(*(live[successor] for successor in successors[pc]))
+            if op == SAVE or op == MARK:
+                reads -= {args[pc]}
+            elif op == CHECK:
+                reads |= {args[pc]}
+            elif op == BACKREF and 2 * args[pc] + 1 < program.slot_count:
+                reads |= {2 * args[pc], 2 * args[pc] + 1}
+            elif op == LOOK or op == ATOMIC:
+                reads |= live[xs[pc]]
+            if reads != live[pc]:
+                live[pc] = reads
+                changed = True
+
+    return ranks, [tuple(sorted(reads)) for reads in live]
+
+
+class _Memo:
+    """The states entered during one call to `match` or `search`, which starts at `base`"""
+
+    __slots__ = ("base", "stride", "bits", "keyed", "backtracks")
+
+    def __init__(self, base: int, stride: int):
+        self.base = base
+        self.stride = stride
+        # Allocated once a run has backtracked enough to be worth it, and then kept for the
+        # following start positions
+        self.bits: Optional[bytearray] = None
+        self.keyed: set[tuple[int, ...]] = set()
+        # Backtracks from the current start position
+        self.backtracks = 0
+
+
+class Backtracker:
+    # Largest bitset of join points by positions, in bytes. Past it, runs are not memoized.
+    MEMO_MAX_BYTES = 4 * 1024 * 1024
+    # Backtracks from a single start position before states are recorded. Runs that stay under
+    # it are cheap anyway, and recording would only slow them down.
+    MEMO_AFTER_BACKTRACKS = 1024
+
+    def __init__(
+        self,
+        program: Program,
+        flags: Optional[dict[str, bool]] = None,
+        memoize: bool = True,
+    ):
+        self.program = program
+        self.flags = flags or {}
+        self.ignore_case = self.flags.get("ignorecase", False)
+        self.multiline = self.flags.get("multiline", False)
+        self.newline = program.newline
+        self.word_chars = program.word_chars
+        self.memoize = memoize
+        self._ranks, self._live = join_points(program)
+        self._join_count = len(self._ranks) - self._ranks.count(-1)
+        # Whether the last call recorded states, for tests and diagnostics
+        self.memoized = False
+
+    def _memo(self, text: str, start: int) -> Optional[_Memo]:
+        stride = len(text) + 1 - start
+        if not self.memoize or self._join_count * stride > 8 * self.MEMO_MAX_BYTES:
+            return None
+        return _Memo(start, stride)
+
+    def match(
+        self, text: str, start: int = 0, budget: Optional[Budget] = None
+    ) -> Optional[list[int]]:
+        """Runs the program anchored at `start`. Returns the capture slots of the match, where
+        unset slots are -1, or None."""
+        return self._match(text, start, self._memo(text, start), budget)
+
+    def search(
+        self, text: str, start: int = 0, budget: Optional[Budget] = None
+    ) -> Optional[list[int]]:
+        """Finds the leftmost match starting at or after `start`"""
+        # What failed from one start fails from the next ones too, they share the memo
+        memo = self._memo(text, start)
+        for pos in range(start, len(text) + 1):
+            slots = self._match(text, pos, memo, budget)
+            if slots is not None:
+                return slots
+        return None
+
+    def _match(
+        self, text: str, start: int, memo: Optional[_Memo], budget: Optional[Budget]
+    ) -> Optional[list[int]]:
+        program = self.program
+        slots = [-1] * (program.slot_count + program.register_count)
+        if memo is not None:
+            memo.backtracks = 0
+        found = self._run(program.start, text, start, slots, memo=memo, budget=budget)
+        self.memoized = memo is not None and memo.bits is not None
+        if found is None:
+            return None
+        return slots[: program.slot_count]
+
+    def _seen(self, memo: _Memo, pc: int, pos: int, slots: list[int]) -> bool:
+        """Whether the state was entered before, and records it otherwise"""
+        live = self._live[pc]
+        if live:
+            key = (pc, pos, *[slots[slot] for slot in live])
+            if key in memo.keyed:
+                return True
+            # Past the budget, new states are explored without being recorded
+            if len(memo.keyed) < self.MEMO_MAX_BYTES // 64:
+                memo.keyed.add(key)
+            return False
+
+        index = self._ranks[pc] * memo.stride + pos - memo.base
+        bit = 1 << (index & 7)
+        bits = memo.bits
+        if bits[index >> 3] & bit:
+            return True
+        bits[index >> 3] |= bit
+        return False
+
+    def _run(
+        self,
+        pc: int,
+        text: str,
+        pos: int,
+        slots: list[int],
+        end: Optional[int] = None,
+        memo: Optional[_Memo] = None,
+        budget: Optional[Budget] = None,
+    ) -> Optional[int]:
+        """Runs from `pc` at `pos` until a MATCH, which must be at `end` when given. Returns the
+        end position; `slots` is updated in place and left untouched on failure. States are
+        recorded in `memo`, and steps charged to `budget`, when given."""
+        program = self.program
+        ops, xs, ys, args = program.ops, program.x, program.y, program.args
+        runs = program.literal_runs
+        tight = program.tight_loops
+        newline = self.newline
+        length = len(text)
+        ranks = self._ranks
+        # Set once the memo is in use
+        bits = memo.bits if memo is not None else None
+        # Steps since the last report to the budget, and how many it allows before the next one
+        steps = 0
+        grant = budget.grant() if budget is not None else NEVER
+        # Alternatives to resume from, as (pc, pos), and slots to restore, as (-1 - slot, value)
+        stack: list[tuple[int, int]] = []
+
+        while True:
+            op = ops[pc]
+
+            if bits is not None and ranks[pc] >= 0 and self._seen(memo, pc, pos, slots):
+                # Explored from here already, and failed
+                pass
+            elif op == CHAR:
+                run = runs[pc]
+                if run is not None:
+                    # The whole literal at once
+                    if text.startswith(run, pos):
+                        pc += len(run)
+                        pos += len(run)
+                        continue
+                elif pos < length and text[pos] == args[pc]:
+                    pc += 1
+                    pos += 1
+                    continue
+            elif op == SET:
+                if pos < length:
+                    chars, negated = args[pc]
+                    char = text[pos]
+                    if (char in chars) != negated:
+                        pc += 1
+                        pos += 1
+                        continue
+            elif op == ANY:
+                if pos < length and (args[pc] or text[pos] != newline):
+                    pc += 1
+                    pos += 1
+                    continue
+            elif op == SPLIT:
+                # Once the memo is in use, loops go through their states one by one again, so
+                # that each is recorded: scanning a run from every position it can be entered at
+                # would take quadratic time
+                greedy = tight[pc] if bits is None else None
+                if greedy is None:
+                    stack.append((ys[pc], pos))
+                    pc = xs[pc]
+                    steps += 1
+                elif greedy:
+                    stop = self._scan(pc + 1, text, pos, length)
+                    if stop > pos:
+                        stack.append((_BOUND, pos))
+                        stack.append((_GREEDY - pc, stop))
+                    steps += stop - pos + 1
+                    pc += 3
+                    pos = stop
+                else:
+                    stack.append((_LAZY - pc, pos))
+                    pc += 3
+                    steps += 1
+                if steps >= grant:
+                    grant = budget.charge(steps, pos)
+                    steps = 0
+                continue
+            elif op == JMP:
+                pc = xs[pc]
+                continue
+            elif op == SAVE or op == MARK:
+                slot = args[pc]
+                stack.append((-1 - slot, slots[slot]))
+                slots[slot] = pos
+                pc += 1
+                continue
+            elif op == CHECK:
+                # An iteration that consumed nothing is the last one
+                pc = pc + 1 if slots[args[pc]] != pos else xs[pc]
+                continue
+            elif op == ASSERT:
+                if self._check_anchor(args[pc], text, pos):
+                    pc += 1
+                    continue
+            elif op == LOOK:
+                before = slots[:]
+                found = self._check_lookaround(pc, text, pos, slots, budget)
+                positive = args[pc][1]
+                if found and positive:
+                    # Captures made inside a positive lookaround are kept, remember how to undo
+                    # them if we backtrack past it
+                    for slot, value in enumerate(before):
+                        if slots[slot] != value:
+                            stack.append((-1 - slot, value))
+                else:
+                    slots[:] = before
+                if found == positive:
+                    pc += 1
+                    continue
+            elif op == ATOMIC:
+                before = slots[:]
+                # Only the body's first match is tried, the alternatives it left are dropped with
+                # the inner run's stack
+                found = self._run(xs[pc], text, pos, slots, budget=budget)
+                if found is not None:
+                    for slot, value in enumerate(before):
+                        if slots[slot] != value:
+                            stack.append((-1 - slot, value))
+                    pc += 1
+                    pos = found
+                    continue
+            elif op == BACKREF:
+                new_pos = self._match_backref(args[pc], text, pos, slots)
+                if new_pos is not None:
+                    pc += 1
+                    pos = new_pos
+                    continue
+            elif op == MATCH:
+                if end is None or pos == end:
+                    if budget is not None:
+                        budget.charge(steps, pos)
+                    return pos
+
+            # Failure, resume from the latest alternative
+            steps += 1
+            if steps >= grant:
+                grant = budget.charge(steps, pos)
+                steps = 0
+            while True:
+                if not stack:
+                    if budget is not None:
+                        budget.charge(steps, pos)
+                    return None
+                pc, pos = stack.pop()
+                if pc >= 0:
+                    break
+                if pc > _GREEDY:
+                    slots[-1 - pc] = pos
+                elif pc > _LAZY:
+                    # One character shorter, down to where the loop started
+                    pos -= 1
+                    if pos > stack[-1][1]:
+                        stack.append((pc, pos))
+                    else:
+                        stack.pop()
+                    pc = _GREEDY - pc + 3
+                    break
+                elif pos < length:
+                    # One character longer, if it passes the loop's test
+                    test = _LAZY - pc + 1
+                    op, arg, char = ops[test], args[test], text[pos]
+                    if op == CHAR:
+                        passed = char == arg
+                    elif op == SET:
+                        passed = (char in arg[0]) != arg[1]
+                    else:
+                        passed = arg or char != newline
+                    if passed:
+                        stack.append((pc, pos + 1))
+                        pc = test + 2
+                        pos += 1
+                        break
+
+            if memo is not None and bits is None:
+                memo.backtracks += 1
+                if memo.backtracks > self.MEMO_AFTER_BACKTRACKS:
+                    memo.bits = bits = bytearray((self._join_count * memo.stride + 7) // 8)
+
+    def _scan(self, pc: int, text: str, pos: int, stop: int) -> int:
+        """Where the run of characters from `pos` that pass the test at `pc` ends, at most
+        `stop`"""
+        op, arg = self.program.ops[pc], self.program.args[pc]
+        if op == CHAR:
+            while pos < stop and text[pos] == arg:
+                pos += 1
+        elif op == SET:
+            chars, negated = arg
+            while pos < stop and (text[pos] in chars) != negated:
+                pos += 1
+        elif arg:
+            # Dotall
+            pos = stop
+        elif isinstance(text, str):
+            found = text.find(self.newline, pos, stop)
+            pos = stop if found < 0 else found
+        else:
+            newline = self.newline
+            while pos < stop and text[pos] != newline:
+                pos += 1
+        return pos
+
+    def _check_anchor(self, anchor_type: str, text: str, pos: int) -> bool:
+        length = len(text)
+        if anchor_type == "^":
+            return pos == 0 or (self.multiline and text[pos - 1] == self.newline)
+        elif anchor_type == "$":
+            return pos == length or (self.multiline and text[pos] == self.newline)
+
+        before_is_word = pos > 0 and text[pos - 1] in self.word_chars
+        after_is_word = pos < length and text[pos] in self.word_chars
+        if anchor_type == "b":
+            return before_is_word != after_is_word
+        return before_is_word == after_is_word
+
+    def _check_lookaround(
+        self, pc: int, text: str, pos: int, slots: list[int], budget: Optional[Budget]
+    ) -> bool:
+        """Whether the lookaround body at `pc` matches, ignoring its polarity. The body's captures
+        are left in `slots`."""
+        ahead, _, min_width, max_width = self.program.args[pc]
+        body = self.program.x[pc]
+
+        if ahead:
+            return self._run(body, text, pos, slots, budget=budget) is not None
+
+        # Going backwards from the current position, the body has to end exactly here, so it
+        # starts within its width of it. The first start that matches ends the check.
+        lowest = 0 if max_width is None else max(0, pos - max_width)
+        return any(
+            self._run(body, text, start, slots, end=pos, budget=budget) is not None
+            for start in range(pos - min_width, lowest - 1, -1)
+        )
+
+    def _match_backref(
+        self, group_number: int, text: str, pos: int, slots: list[int]
+    ) -> Optional[int]:
+        if 2 * group_number + 1 >= self.program.slot_count:
+            return None
+        group_start, group_end = slots[2 * group_number], slots[2 * group_number + 1]
+        if group_start < 0 or group_end < 0:
+            return None
+
+        captured = text[group_start:group_end]
+        end_pos = pos + len(captured)
+        if end_pos > len(text):
+            return None
+
+        text_slice = text[pos:end_pos]
+        if self.ignore_case:
+            if self.program.binary:
+                # Slices of a memoryview have no lower()
+                captured, text_slice = bytes(captured), bytes(text_slice)
+            return end_pos if text_slice.lower() == captured.lower() else None
+        return end_pos if text_slice == captured else None
@@ -0,0 +1,11 @@
+"""Benchmarks of the engines against each other and Python's `re`.
+
+    python -m magnet_regex.bench run -o results.json
+    python -m magnet_regex.bench compare before.json results.json
+
+`corpora` generates the texts, `catalog` lists the patterns and `runner` measures them.
+"""
+
+from magnet_regex.bench.catalog import CATALOG, Case
+from magnet_regex.bench.corpora import CORPORA
+from magnet_regex.bench.runner import ENGINES, compare, run, run_case
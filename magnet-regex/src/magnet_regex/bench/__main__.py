@@ -0,0 +1,86 @@
+import argparse
+import json
+import sys
+
+from magnet_regex.bench.catalog import CATALOG
+from magnet_regex.bench.corpora import DEFAULT_SEED
+from magnet_regex.bench.runner import (
+    DEFAULT_REPEAT,
+    DEFAULT_SIZE,
+    DEFAULT_TIMEOUT,
+    ENGINES,
+    LATENCY_SAMPLES,
+    compare,
+    run,
+)
+
+
+def _show(result: dict):
+    line = f"{result['case']:24} {result['engine']:9} "
+    if result["status"] != "ok":
+        line += result["status"]
+    else:
+        line += (
+            f"{result['throughput_mb_s']:>9} MB/s  compile {result['compile_ms']:>8} ms  "
+            f"p50 {result['latency_us'].get('p50')} us  peak {result['peak_kib']} KiB  "
+            f"{result['matches']} matches"
+        )
+    print(line, file=sys.stderr)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m magnet_regex.bench")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks and write the results as JSON")
+    run_parser.add_argument("-o", "--output", help="file to write, standard output by default")
+    run_parser.add_argument("--size", type=int, default=DEFAULT_SIZE, help="characters per text")
+    run_parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    run_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    run_parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT)
+    run_parser.add_argument("--latency-samples", type=int, default=LATENCY_SAMPLES)
+    run_parser.add_argument("--engine", action="append", choices=ENGINES, help="repeatable")
+    run_parser.add_argument("--case", action="append", help="case name, repeatable")
+    run_parser.add_argument("--kind", action="append", help="case kind, repeatable")
+
+    compare_parser = commands.add_parser(
+        "compare", help="list the metrics that got worse between two runs"
+    )
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+
+    args = parser.parse_args(argv)
+    if args.command == "compare":
+        with open(args.old) as old, open(args.new) as new:
+            changes = compare(json.load(old), json.load(new), args.threshold)
+        print(json.dumps(changes, indent=2, ensure_ascii=False))
+        return 1 if changes else 0
+
+    cases = [
+        case
+        for case in CATALOG
+        if (args.case is None or case.name in args.case)
+        and (args.kind is None or case.kind in args.kind)
+    ]
+    results = run(
+        cases,
+        args.engine or ENGINES,
+        args.size,
+        args.seed,
+        args.repeat,
+        args.timeout,
+        args.latency_samples,
+        progress=_show,
+    )
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""The patterns the benchmarks run, each against the corpus it was written for.
+
+They are grouped by what they exercise: plain literals, classes, alternations of keywords, nested
+quantifiers, backreferences, lookarounds, and the ReDoS classics, which make a backtracker take
+time exponential in the length of the text and are run over short inputs only.
+"""
+
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    pattern: str
+    # A key of `corpora.CORPORA`
+    corpus: str
+    kind: str
+    flags: dict[str, bool] = field(default_factory=dict)
+    # The size of the text, in characters, when the case needs its own rather than the run's
+    size: Optional[int] = None
+
+
+# The length of the run of a's the ReDoS classics get. Python's `re` needs about two seconds for
+# `(a+)+$` at 24, and ten times less at 20.
+PATHOLOGICAL_SIZE = 20
+
+# The lexer has no escapes for code points, so the NULs and newlines in classes are the characters
+# themselves, in plain strings rather than raw ones. Commas are escaped, as they would start a
+# repetition count.
+CATALOG = [
+    Case("literal-error", r"ERROR", "logs", "literal"),
+    Case("literal-dna", r"GATTACA", "dna", "literal"),
+    Case("literal-unicode", r"日本", "unicode", "literal"),
+    Case("class-digits", r"\d+", "csv", "class"),
+    Case("class-capitalized", r"[A-Z][a-z]+", "csv", "class"),
+    Case("class-cyrillic", r"[а-яё]+", "unicode", "class"),
+    Case("class-non-ascii", "[^\x00-\x7f]+", "unicode", "class"),
+    Case("ipv4", r"\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}", "logs", "class"),
+    Case("email", r"[\w.]+@\w+\.\w+", "csv", "class"),
+    Case("keywords-methods", r"GET|POST|PUT|DELETE|PATCH", "logs", "alternation"),
+    Case("keywords-ignorecase", r"error|warn", "logs", "alternation", {"ignorecase": True}),
+    Case("key-value", r"(\w+)=(\w+)", "logs", "captures"),
+    Case("csv-record", "^(?:[^\\,\n]*\\,)*[^\\,\n]*$", "csv", "nested", {"multiline": True}),
+    Case("dna-codons", r"(?:[ACGT]{3})*TAA", "dna", "nested"),
+    Case("dotted-numbers", r"(?:\d+\.)+\d+", "logs", "nested"),
+    Case("backref-double-char", r"(\w)\1", "unicode", "backreference"),
+    Case("backref-repeated-word", r"\b(\w+) \1\b", "unicode", "backreference"),
+    Case("lookbehind-user", r"(?<=user=)\w+", "logs", "lookaround"),
+    Case("lookahead-ms", r"\d+(?=ms)", "logs", "lookaround"),
+    Case("lookbehind-decimal", r"(?<![\w.])\d+\.\d+", "csv", "lookaround"),
+    Case("redos-nested-plus", r"(a+)+$", "pathological", "redos", size=PATHOLOGICAL_SIZE),
+    Case("redos-overlap", r"(a|aa)+$", "pathological", "redos", size=PATHOLOGICAL_SIZE),
+    Case("redos-same-branch", r"(a|a)*b", "pathological", "redos", size=PATHOLOGICAL_SIZE),
+    Case("redos-star-star", r"(?:a*)*b", "pathological", "redos", size=PATHOLOGICAL_SIZE),
+]
@@ -0,0 +1,111 @@
+"""Reproducible texts to benchmark against.
+
+Every generator takes a size in characters and a seed, and returns the same text for the same
+arguments on every machine and Python version: they only draw from their own `random.Random`.
+Texts are made of whole lines, cut at the first line boundary past the size.
+"""
+
+import random
+import string
+from typing import Callable
+
+DEFAULT_SEED = 1234
+
+LEVELS = ("DEBUG", "INFO", "INFO", "INFO", "WARN", "ERROR")
+METHODS = ("GET", "GET", "GET", "POST", "PUT", "DELETE", "PATCH")
+RESOURCES = ("users", "items", "orders", "carts", "search", "health")
+NAMES = ("alice", "bob", "carol", "dave", "erin", "frank", "grace", "heidi", "ivan", "judy")
+DOMAINS = ("example.com", "mail.test", "corp.example.org")
+
+# Words of the scripts the Unicode corpus mixes, from Latin-1 accents to CJK and emoji
+SCRIPTS = (
+    "aàáâäåæçèéêëìíîïñòóôöøùúûüýÿ",
+    "αβγδεζηθικλμνξοπρστυφχψω",
+    "абвгдеёжзийклмнопрстуфхцчшщъыьэюя",
+    "אבגדהוזחטיכלמנסעפצקרשת",
+    "日本語中文字漢字的一是不了人我在有他这为之",
+    "😀😂🙂🚀🌍🎉🔥✨",
+)
+
+
+def _lines(size: int, seed: int, line: Callable[[random.Random], str]) -> str:
+    rng = random.Random(seed)
+    lines = []
+    length = 0
+    while length < size:
+        text = line(rng)
+        lines.append(text)
+        length += len(text) + 1
+    return "\n".join(lines) + "\n"
+
+
+def _log_line(rng: random.Random) -> str:
+    timestamp = (
+        f"2026-{rng.randint(1, 12):02}-{rng.randint(1, 28):02}T"
+        f"{rng.randint(0, 23):02}:{rng.randint(0, 59):02}:{rng.randint(0, 59):02}Z"
+    )
+    path = f"/api/v{rng.randint(1, 3)}/{rng.choice(RESOURCES)}/{rng.randint(1, 99999)}"
+    ip = ".".join(str(rng.randint(1, 254)) for _ in range(4))
+    return (
+        f"{timestamp} {rng.choice(LEVELS)} [worker-{rng.randint(1, 16)}] {rng.choice(METHODS)} "
+        f"{path} {rng.choice((200, 200, 200, 201, 204, 301, 404, 500))} {rng.randint(1, 999)}ms "
+        f"user={rng.choice(NAMES)} ip={ip}"
+    )
+
+
+def logs(size: int, seed: int = DEFAULT_SEED) -> str:
+    """Web server access logs, one request per line"""
+    return _lines(size, seed, _log_line)
+
+
+def _csv_line(rng: random.Random) -> str:
+    name = rng.choice(NAMES)
+    return ",".join(
+        (
+            str(rng.randint(1, 10**6)),
+            name.title(),
+            f"{name}.{rng.randint(1, 99)}@{rng.choice(DOMAINS)}",
+            f"{rng.randint(0, 9999)}.{rng.randint(0, 99):02}",
+            f"2026-{rng.randint(1, 12):02}-{rng.randint(1, 28):02}",
+            rng.choice(("paid", "pending", "refunded")),
+        )
+    )
+
+
+def csv(size: int, seed: int = DEFAULT_SEED) -> str:
+    """Comma separated records: id, name, email, amount, date, status"""
+    return _lines(size, seed, _csv_line)
+
+
+def dna(size: int, seed: int = DEFAULT_SEED) -> str:
+    """Random nucleotides, in lines of 60 like a FASTA file"""
+    return _lines(size, seed, lambda rng: "".join(rng.choices("ACGT", k=60)))
+
+
+def _unicode_line(rng: random.Random) -> str:
+    words = []
+    for _ in range(rng.randint(3, 12)):
+        alphabet = rng.choice(SCRIPTS + (string.ascii_lowercase,) * 2)
+        words.append("".join(rng.choices(alphabet, k=rng.randint(1, 9))))
+    return " ".join(words)
+
+
+def unicode(size: int, seed: int = DEFAULT_SEED) -> str:
+    """Words of random letters from several scripts, ASCII, Latin-1, Greek, Cyrillic, Hebrew, CJK,
+    and emoji outside the BMP"""
+    return _lines(size, seed, _unicode_line)
+
+
+def pathological(size: int, seed: int = DEFAULT_SEED) -> str:
+    """A run of `size` a's that a `!` keeps from matching, the input of the ReDoS classics. Kept
+    short: a backtracker, Python's `re` included, takes time exponential in its length."""
+    return "a" * size + "!"
+
+
+CORPORA: dict[str, Callable[[int, int], str]] = {
+    "logs": logs,
+    "csv": csv,
+    "dna": dna,
+    "unicode": unicode,
+    "pathological": pathological,
+}
@@ -0,0 +1,284 @@
+"""Runs the catalog against each engine and Python's `re`, and compares two runs.
+
+For every case and engine, a run reports:
+
+- `compile_ms`: the best time to go from the pattern string to something that matches (lexing,
+  parsing, optimizing and compiling for our engines, `re.compile` with its cache purged for `re`)
+- `throughput_mb_s`: the UTF-8 size of the text over the best time to find every match in it
+- `latency_us`: percentiles of one `search` call over single lines of the text
+- `peak_kib`: the peak of the memory allocated while compiling and finding every match, from
+  `tracemalloc`, which only sees allocations made through Python
+- `matches`: how many matches were found, which should be the same for every engine
+
+A case an engine cannot run is reported with the status "unsupported", and one that takes longer
+than the timeout with "timeout". `re` has no timeout, the ReDoS cases are kept short for it.
+
+The results are plain JSON, and `compare` lists the metrics that got worse between two of them.
+"""
+
+import platform
+import re
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from importlib import metadata
+from typing import Callable, Iterable, Optional
+
+from magnet_regex.bench.catalog import CATALOG, Case
+from magnet_regex.bench.corpora import CORPORA, DEFAULT_SEED
+from magnet_regex.budget import MatchBudgetExceeded
+from magnet_regex.lexer import Lexer
+from magnet_regex.matcher import Matcher
+from magnet_regex.parser import Parser
+
+ENGINES = Matcher.ENGINES + ("re",)
+DEFAULT_SIZE = 256 * 1024
+DEFAULT_REPEAT = 3
+# Seconds one timing of one case can take, on our engines
+DEFAULT_TIMEOUT = 10.0
+# Lines timed one by one for the latency percentiles
+LATENCY_SAMPLES = 1000
+PERCENTILES = (50, 90, 99)
+
+# Python's `re` reads the patterns the same way, with our flags and our ASCII-only classes
+RE_FLAGS = {"ignorecase": re.IGNORECASE, "multiline": re.MULTILINE, "dotall": re.DOTALL}
+
+# The metrics `compare` looks at, and whether a larger value is better
+METRICS = {
+    "compile_ms": False,
+    "throughput_mb_s": True,
+    "latency_us.p50": False,
+    "latency_us.p99": False,
+    "peak_kib": False,
+}
+
+
+def _compiler(case: Case, engine: str) -> Callable[[], object]:
+    """Returns a function building what matches `case` with `engine`"""
+    if engine == "re":
+        flags = re.ASCII
+        for name, enabled in case.flags.items():
+            if enabled:
+                flags |= RE_FLAGS.get(name, 0)
+
+        def build():
+            re.purge()
+            return re.compile(case.pattern, flags)
+
+        return build
+
+    return lambda: Matcher(Parser(Lexer(case.pattern).tokenize()).parse(), case.flags, engine)
+
+
+def _counter(engine: str, timeout: float) -> Callable[[object, str], int]:
+    """Returns a function counting the matches of a compiled pattern in a text"""
+    if engine == "re":
+        return lambda compiled, text: sum(1 for _ in compiled.finditer(text))
+    return lambda compiled, text: compiled.count(text, timeout=timeout)
+
+
+def _searcher(engine: str, timeout: float) -> Callable[[object, str], object]:
+    if engine == "re":
+        return lambda compiled, text: compiled.search(text)
+    return lambda compiled, text: compiled.search(text, timeout=timeout)
+
+
+def _best(repeat: int, run: Callable[[], object]) -> tuple[float, object]:
+    """The shortest of `repeat` timings of `run`, in seconds, and what it returned"""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _percentiles(samples: list[float]) -> dict[str, float]:
+    samples = sorted(samples)
+    if not samples:
+        return {}
+    found = {
+        f"p{p}": round(samples[min(len(samples) - 1, len(samples) * p // 100)], 3)
+        for p in PERCENTILES
+    }
+    found["max"] = round(samples[-1], 3)
+    return found
+
+
+def _sample_lines(text: str, count: int) -> list[str]:
+    """`count` lines spread evenly over the text"""
+    lines = text.splitlines() or [text]
+    step = max(1, len(lines) // count)
+    return lines[::step][:count]
+
+
+def run_case(
+    case: Case,
+    text: str,
+    engine: str,
+    repeat: int = DEFAULT_REPEAT,
+    timeout: float = DEFAULT_TIMEOUT,
+    latency_samples: int = LATENCY_SAMPLES,
+) -> dict:
+    """Measures one case with one engine over `text`"""
+    result = {
+        "case": case.name,
+        "kind": case.kind,
+        "corpus": case.corpus,
+        "pattern": case.pattern,
+        "flags": sorted(name for name, enabled in case.flags.items() if enabled),
+        "engine": engine,
+        "text_chars": len(text),
+        "status": "ok",
+    }
+    build = _compiler(case, engine)
+    count = _counter(engine, timeout)
+    search = _searcher(engine, timeout)
+    try:
+        compile_time, compiled = _best(repeat, build)
+    except ValueError as error:
+        # The engine cannot run the pattern, e.g. the DFA with a backreference
+        result.update(status="unsupported", error=str(error))
+        return result
+
+    size = len(text.encode("utf-8"))
+    try:
+        seconds, matches = _best(repeat, lambda: count(compiled, text))
+
+        latencies = []
+        for line in _sample_lines(text, latency_samples):
+            start = time.perf_counter_ns()
+            search(compiled, line)
+            latencies.append((time.perf_counter_ns() - start) / 1000)
+
+        tracemalloc.start()
+        try:
+            count(build(), text)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    except MatchBudgetExceeded as error:
+        result.update(status="timeout", error=str(error))
+        return result
+
+    result.update(
+        compile_ms=round(compile_time * 1000, 4),
+        seconds=round(seconds, 6),
+        throughput_mb_s=round(size / seconds / 1e6, 3) if seconds > 0 else None,
+        latency_us=_percentiles(latencies),
+        peak_kib=round(peak / 1024, 1),
+        matches=matches,
+    )
+    return result
+
+
+def _version() -> str:
+    try:
+        return metadata.version("magnet-regex")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def run(
+    cases: Optional[Iterable[Case]] = None,
+    engines: Iterable[str] = ENGINES,
+    size: int = DEFAULT_SIZE,
+    seed: int = DEFAULT_SEED,
+    repeat: int = DEFAULT_REPEAT,
+    timeout: float = DEFAULT_TIMEOUT,
+    latency_samples: int = LATENCY_SAMPLES,
+    progress: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    """Runs every case of the catalog (or `cases`) with every engine. Returns the results, with
+    what they were measured on, ready to be dumped as JSON. `progress` is called with each result
+    as soon as it is known."""
+    engines = list(engines)
+    unknown = set(engines) - set(ENGINES)
+    if unknown:
+        raise ValueError(f"Unknown engines {sorted(unknown)}, expected some of {ENGINES}")
+    if repeat <= 0:
+        raise ValueError(f"Repeat must be positive, got {repeat}")
+
+    texts: dict[tuple[str, int], str] = {}
+    results = []
+    for case in CATALOG if cases is None else cases:
+        key = (case.corpus, case.size or size)
+        if key not in texts:
+            texts[key] = CORPORA[case.corpus](key[1], seed)
+        for engine in engines:
+            result = run_case(case, texts[key], engine, repeat, timeout, latency_samples)
+            results.append(result)
+            if progress is not None:
+                progress(result)
+
+    return {
+        "meta": {
+            "magnet_regex": _version(),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "size": size,
+            "seed": seed,
+            "repeat": repeat,
+            "timeout": timeout,
+            "argv": sys.argv,
+        },
+        "results": results,
+    }
+
+
+def _metric(result: dict, name: str) -> Optional[float]:
+    value = result
+    for part in name.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def compare(old: dict, new: dict, threshold: float = 0.1) -> list[dict]:
+    """Returns the changes between two runs: every metric of a case and engine measured in both
+    that got worse by more than `threshold` (a fraction of the old value), a status that changed,
+    and a match count that changed"""
+    before = {(r["case"], r["engine"]): r for r in old["results"]}
+    changes = []
+    for result in new["results"]:
+        key = (result["case"], result["engine"])
+        previous = before.get(key)
+        if previous is None:
+            continue
+        where = {"case": key[0], "engine": key[1]}
+        if previous["status"] != result["status"]:
+            changes.append(
+                {**where, "metric": "status", "old": previous["status"], "new": result["status"]}
+            )
+            continue
+        if previous.get("matches") != result.get("matches"):
+            changes.append(
+                {
+                    **where,
+                    "metric": "matches",
+                    "old": previous.get("matches"),
+                    "new": result.get("matches"),
+                }
+            )
+        for name, larger_is_better in METRICS.items():
+            old_value, new_value = _metric(previous, name), _metric(result, name)
+            if not old_value or new_value is None:
+                continue
+            change = (new_value - old_value) / old_value
+            if (-change if larger_is_better else change) > threshold:
+                changes.append(
+                    {
+                        **where,
+                        "metric": name,
+                        "old": old_value,
+                        "new": new_value,
+                        "change": round(change, 4),
+                    }
+                )
+    return changes
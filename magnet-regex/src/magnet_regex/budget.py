@@ -0,0 +1,92 @@
+"""Limits on the work of a match call: a step budget, a deadline and a cancellation token.
+
+The engines count their steps in a local variable and only report to the budget every
+`Budget.CHECK_INTERVAL` steps or so, and when they return. Checking the deadline and the token
+costs a clock read every thousand steps, and calls without limits never create a budget at all.
+
+What a step is depends on the engine: one branch taken or backtracked into for the backtracker,
+one thread advanced over a character for the Pike VM, one character for the DFA.
+"""
+
+import sys
+import time
+from typing import Optional
+
+# The step an engine without a budget never reaches
+NEVER = sys.maxsize
+
+
+class MatchBudgetExceeded(Exception):
+    """Raised when a match call runs out of steps or time, or is cancelled"""
+
+    def __init__(self, reason: str, steps: int, position: int):
+        super().__init__(f"Matching stopped ({reason}) after {steps} steps, at position {position}")
+        # "max_steps", "timeout" or "cancelled"
+        self.reason = reason
+        self.steps = steps
+        # Where the engine was in the text when it stopped
+        self.position = position
+
+
+class CancellationToken:
+    """Shared between a match call and whoever may want to stop it, from another thread"""
+
+    __slots__ = ("cancelled",)
+
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Budget:
+    """The limits of one match call, and the steps spent so far by every engine it ran"""
+
+    CHECK_INTERVAL = 1024
+
+    def __init__(
+        self,
+        max_steps: Optional[int] = None,
+        timeout: Optional[float] = None,
+        cancel: Optional[CancellationToken] = None,
+    ):
+        if max_steps is not None and max_steps < 0:
+            raise ValueError(f"Maximum steps must be positive, got {max_steps}")
+        if timeout is not None and timeout < 0:
+            raise ValueError(f"Timeout must be positive, got {timeout}")
+        self.max_steps = max_steps
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.cancel = cancel
+        self.steps = 0
+
+    @classmethod
+    def create(
+        cls,
+        max_steps: Optional[int] = None,
+        timeout: Optional[float] = None,
+        cancel: Optional[CancellationToken] = None,
+    ) -> Optional["Budget"]:
+        """Returns a budget for the limits given, None when there are none"""
+        if max_steps is None and timeout is None and cancel is None:
+            return None
+        return cls(max_steps, timeout, cancel)
+
+    def grant(self) -> int:
+        """How many steps an engine may take before it reports back"""
+        if self.max_steps is None:
+            return self.CHECK_INTERVAL
+        # One step past the limit, so that going over it is noticed
+        return max(1, min(self.CHECK_INTERVAL, self.max_steps - self.steps + 1))
+
+    def charge(self, steps: int, position: int) -> int:
+        """Adds `steps` to the steps spent, and raises `MatchBudgetExceeded` when a limit is
+        reached. Returns the next grant."""
+        self.steps += steps
+        if self.max_steps is not None and self.steps > self.max_steps:
+            raise MatchBudgetExceeded("max_steps", self.steps, position)
+        if self.cancel is not None and self.cancel.cancelled:
+            raise MatchBudgetExceeded("cancelled", self.steps, position)
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise MatchBudgetExceeded("timeout", self.steps, position)
+        return self.grant()
@@ -0,0 +1,118 @@
+"""Compiled character classes.
+
+A class is compiled once, from the code point ranges the parser collected, into the operand of a
+SET instruction. Case folding is applied here, by adding every character that compares equal to
+a member when both are lowercased, so the engines never lowercase the text.
+
+Small classes are expanded into a frozenset, the fastest membership test CPython has. Large ones,
+such as `[\\u0100-\\uffff]`, would take megabytes that way, and become a `CharClass` instead: an int
+bitmap for ASCII and a sorted table of the other ranges, searched with bisect.
+"""
+
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from typing import Union
+
+# Classes with at most this many members are expanded into a frozenset
+MAX_EXPANDED = 256
+
+# Inclusive (first, last) code point ranges
+Ranges = list[tuple[int, int]]
+
+
+def normalize(ranges: Ranges) -> Ranges:
+    """Sorts `ranges` and merges the ones that overlap or touch"""
+    merged: Ranges = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+@lru_cache(maxsize=None)
+def _case_table() -> tuple[list[int], list[str]]:
+    """The code points that lowercase to something else, in order, and their lowercase. Built the
+    first time a class is folded."""
+    codes, lowers = [], []
+    # No code point past the Adlam block has a case mapping
+    for code in range(0x1E950):
+        char = chr(code)
+        lower = char.lower()
+        if lower != char:
+            codes.append(code)
+            lowers.append(lower)
+    return codes, lowers
+
+
+def _contains(ranges: Ranges, code: int) -> bool:
+    i = bisect_right(ranges, (code, 0x10FFFF)) - 1
+    return i >= 0 and code <= ranges[i][1]
+
+
+def fold(ranges: Ranges) -> Ranges:
+    """Adds to the normalized `ranges` every character whose lowercase is the lowercase of a
+    member, which is how ignorecase compares characters"""
+    codes, lowers = _case_table()
+    added = []
+    # The lowercase of the members that have one, the others are their own lowercase
+    lowered = set()
+    for first, last in ranges:
+        for i in range(bisect_left(codes, first), bisect_right(codes, last)):
+            lowered.add(lowers[i])
+            if len(lowers[i]) == 1:
+                added.append(ord(lowers[i]))
+    for code, lower in zip(codes, lowers):
+        if lower in lowered or (len(lower) == 1 and _contains(ranges, ord(lower))):
+            added.append(code)
+    return normalize(ranges + [(code, code) for code in added])
+
+
+class CharClass:
+    """Membership test for a large class"""
+
+    __slots__ = ("ascii", "starts", "ends")
+
+    def __init__(self, ranges: Ranges):
+        # Bit n is set when chr(n) is a member
+        self.ascii = 0
+        # The ranges above ASCII, split in two lists so that bisect runs on plain ints
+        self.starts: list[int] = []
+        self.ends: list[int] = []
+        for first, last in normalize(ranges):
+            if first < 128:
+                top = min(last, 127)
+                self.ascii |= ((1 << (top - first + 1)) - 1) << first
+                first = top + 1
+            if first <= last:
+                self.starts.append(first)
+                self.ends.append(last)
+
+    def __contains__(self, char: str) -> bool:
+        code = ord(char)
+        if code < 128:
+            return self.ascii >> code & 1 == 1
+        i = bisect_right(self.starts, code) - 1
+        return i >= 0 and code <= self.ends[i]
+
+    def __len__(self):
+        ranges = sum(last - first + 1 for first, last in zip(self.starts, self.ends))
+        return bin(self.ascii).count("1") + ranges
+
+    def __repr__(self):
+        shown = [f"{first:#x}-{last:#x}" for first, last in zip(self.starts, self.ends)]
+        if self.ascii:
+            shown.insert(0, f"ascii={self.ascii:#x}")
+        return f"CharClass({', '.join(shown)})"
+
+
+def compile_class(ranges: Ranges, ignore_case: bool = False) -> Union[frozenset, CharClass]:
+    """Returns the members of a class, as a frozenset of characters or a `CharClass`. Either one
+    supports `char in members`."""
+    ranges = normalize(ranges)
+    if ignore_case:
+        ranges = fold(ranges)
+    if sum(last - first + 1 for first, last in ranges) <= MAX_EXPANDED:
+        return frozenset(chr(code) for first, last in ranges for code in range(first, last + 1))
+    return CharClass(ranges)
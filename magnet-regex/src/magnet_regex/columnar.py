@@ -0,0 +1,275 @@
+"""Matching a whole column of strings at once, with NumPy arrays in and out.
+
+`match_array` and `search_array` take a NumPy array of strings (dtype `U`), of bytes (dtype `S`)
+or of objects, or a column in Arrow's layout: a buffer of bytes with every value packed end to
+end, and the n + 1 offsets where they start and end. They return a boolean mask, or the start and
+end of each row's match, and of its groups, as int arrays.
+
+Before any engine runs, rows that cannot match are ruled out for the whole column at once. The
+characters a match can start with (the first character class of the pattern) are turned into a
+256 entry lookup table, which maps every byte or code point of the buffer to a boolean in one
+vectorized indexing operation, and the characters of the required literal, when the pattern has
+one, are compared against the buffer the same way. A searched row survives when it has a possible
+first character and every character of the literal; a matched one when its first character is
+possible. Only the surviving rows go through the matcher, one at a time. Patterns that can match
+the empty string have no first characters, and every row goes through the matcher.
+
+Code points above 255 are past the lookup table: rows holding some are kept, unless the first
+class is known to hold none of them. Packed buffers are matched as bytes, without decoding.
+
+NumPy is an optional dependency, installed with the `numpy` extra.
+"""
+
+from typing import Optional, Union
+
+try:
+    import numpy as np
+except ImportError as error:
+    raise ImportError("magnet_regex.columnar needs NumPy, install magnet-regex[numpy]") from error
+
+from magnet_regex.compiler import (
+    ANY,
+    ASSERT,
+    CHAR,
+    CHECK,
+    JMP,
+    LOOK,
+    MARK,
+    SAVE,
+    SET,
+    SPLIT,
+    CharClass,
+    Program,
+)
+from magnet_regex.matcher import Matcher
+from magnet_regex.parallel import OUTPUTS
+
+# At most this many characters of the required literal are compared against the buffer, each one
+# costs a pass over it
+MAX_LITERAL_PASSES = 4
+
+# A column in Arrow's layout: the packed values, and the offsets where each one starts and ends
+Packed = tuple[object, object]
+Column = Union["np.ndarray", Packed]
+
+
+def first_chars(program: Program) -> Optional[tuple["np.ndarray", bool]]:
+    """Returns the characters a match can start with, as a lookup table over code points (or byte
+    values) 0-255 and whether a larger code point can start one. None when a match can be empty,
+    or starts with something the analysis does not follow (a backreference or an atomic group)."""
+    table = np.zeros(256, dtype=bool)
+    wide = False
+    seen = set()
+    stack = [program.start]
+    while stack:
+        pc = stack.pop()
+        if pc in seen:
+            continue
+        seen.add(pc)
+
+        op, arg = program.ops[pc], program.args[pc]
+        if op == SPLIT:
+            stack.append(program.y[pc])
+            stack.append(program.x[pc])
+        elif op == JMP:
+            stack.append(program.x[pc])
+        elif op == CHECK:
+            stack.append(program.x[pc])
+            stack.append(pc + 1)
+        elif op in (SAVE, MARK, ASSERT, LOOK):
+            # Zero width, and assuming they hold only widens the table
+            stack.append(pc + 1)
+        elif op == CHAR:
+            code = arg if program.binary else ord(arg)
+            if code < 256:
+                table[code] = True
+            else:
+                wide = True
+        elif op == SET:
+            chars, negated = arg
+            if program.binary:
+                members = np.zeros(256, dtype=bool)
+                members[list(chars)] = True
+            else:
+                members = np.array([chr(code) in chars for code in range(256)])
+                large = isinstance(chars, CharClass) or any(ord(char) > 255 for char in chars)
+                wide = wide or negated or large
+            table |= members != negated
+        elif op == ANY:
+            members = np.ones(256, dtype=bool)
+            if not arg:
+                members[ord("\n")] = False
+            table |= members
+            wide = True
+        else:
+            # MATCH, BACKREF or ATOMIC
+            return None
+    return table, wide
+
+
+def _column(
+    values: Column,
+) -> tuple["np.ndarray", Optional["np.ndarray"], Optional["np.ndarray"], list]:
+    """Returns the column as one flat array of code points or bytes, the offsets where each row
+    starts and ends in it (None when there is no buffer to scan), and the rows as the matcher
+    takes them"""
+    if isinstance(values, tuple):
+        data, offsets = values
+        codes = np.frombuffer(data, dtype=np.uint8)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        starts, ends = offsets[:-1], offsets[1:]
+        view = memoryview(codes)
+        rows = [view[start:end] for start, end in zip(starts.tolist(), ends.tolist())]
+        return codes, starts, ends, rows
+
+    values = np.asarray(values)
+    if values.ndim != 1:
+        raise ValueError(f"Expected a one dimensional column, got shape {values.shape}")
+    if values.dtype.kind == "O":
+        return np.zeros(0, dtype=np.uint8), None, None, values.tolist()
+    if values.dtype.kind not in "US":
+        raise TypeError(f"Expected strings, bytes or objects, got an array of {values.dtype}")
+
+    values = np.ascontiguousarray(values)
+    wide = values.dtype.kind == "U"
+    codes = values.view(np.uint32 if wide else np.uint8)
+    width = len(codes) // len(values) if len(values) else 0
+    rows = values.tolist()
+    # Values are padded with NULs to the width of the dtype, which the rows leave out
+    starts = np.arange(len(values), dtype=np.int64) * width
+    lengths = np.fromiter(map(len, rows), dtype=np.int64, count=len(rows))
+    return codes, starts, starts + lengths, rows
+
+
+def _contains(mask: "np.ndarray", starts: "np.ndarray", ends: "np.ndarray") -> "np.ndarray":
+    """Whether each row, mask[start:end], has a True in it"""
+    counts = np.concatenate(([0], np.cumsum(mask, dtype=np.int64)))
+    return counts[ends] > counts[starts]
+
+
+def candidates(
+    matcher: Matcher,
+    codes: "np.ndarray",
+    starts: "np.ndarray",
+    ends: "np.ndarray",
+    anchored: bool,
+) -> "np.ndarray":
+    """Returns which rows, codes[start:end], may match, from the prefilters run over the whole
+    buffer. `matcher` is the one for the kind of rows the buffer holds."""
+    survivors = np.ones(len(starts), dtype=bool)
+    nonempty = ends > starts
+
+    first = first_chars(matcher.program)
+    if first is not None:
+        table, wide = first
+        possible = table[np.minimum(codes, 255)]
+        if wide and codes.dtype != np.uint8:
+            possible |= codes > 255
+        if anchored:
+            survivors &= nonempty
+            survivors[nonempty] &= possible[starts[nonempty]]
+        else:
+            survivors &= _contains(possible, starts, ends)
+
+    prefilter = matcher.prefilter
+    if prefilter is None or prefilter.ignore_case:
+        return survivors
+    literal = prefilter.literal
+    literal = list(literal) if isinstance(literal, bytes) else list(map(ord, literal))
+    if anchored and prefilter.is_prefix:
+        # The literal starts every match, its first characters are compared in place
+        survivors &= ends - starts >= len(literal)
+        for i, code in enumerate(literal[:MAX_LITERAL_PASSES]):
+            rows = np.flatnonzero(survivors)
+            survivors[rows] = codes[starts[rows] + i] == code
+    elif not anchored:
+        for code in list(dict.fromkeys(literal))[:MAX_LITERAL_PASSES]:
+            survivors &= _contains(codes == code, starts, ends)
+    return survivors
+
+
+class MatchColumns:
+    """The matches of a column: `mask` tells which rows matched, and `slots[i]` holds the capture
+    offsets of row i's match, -1 where the row or the group did not match. With output "span"
+    there are only the slots of group 0."""
+
+    def __init__(self, rows: list, mask: "np.ndarray", slots: "np.ndarray"):
+        self._rows = rows
+        self.mask = mask
+        self.slots = slots
+
+    @property
+    def starts(self) -> "np.ndarray":
+        return self.slots[:, 0]
+
+    @property
+    def ends(self) -> "np.ndarray":
+        return self.slots[:, 1]
+
+    def span(self, n: int = 0) -> tuple["np.ndarray", "np.ndarray"]:
+        """The starts and ends of group `n` in every row"""
+        if not 0 <= n < self.slots.shape[1] // 2:
+            raise IndexError(f"No group {n}, the columns have {self.slots.shape[1] // 2 - 1}")
+        return self.slots[:, 2 * n], self.slots[:, 2 * n + 1]
+
+    def group(self, n: int = 0) -> "np.ndarray":
+        """The text of group `n` in every row, as an array of objects, None where it did not take
+        part in the match. Groups of binary rows are bytes."""
+        starts, ends = self.span(n)
+        column = np.full(len(self._rows), None, dtype=object)
+        for i in np.flatnonzero(starts >= 0).tolist():
+            text = self._rows[i][starts[i] : ends[i]]
+            column[i] = text if isinstance(text, (str, bytes)) else bytes(text)
+        return column
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __repr__(self):
+        return f"<MatchColumns rows={len(self)} matched={int(self.mask.sum())}>"
+
+
+def _run(matcher: Matcher, values: Column, anchored: bool, output: str):
+    if output not in OUTPUTS:
+        raise ValueError(f"Unknown output {output!r}, expected one of {OUTPUTS}")
+    codes, starts, ends, rows = _column(values)
+    if starts is None:
+        # Objects, with nothing to scan: every row that is not None goes through the matcher
+        survivors = np.array([row is not None for row in rows], dtype=bool)
+    elif rows:
+        # Bytes and packed buffers are scanned as bytes, strings as code points
+        kind, _ = matcher.for_haystack(b"" if codes.dtype == np.uint8 else "")
+        survivors = candidates(kind, codes, starts, ends, anchored)
+    else:
+        survivors = np.zeros(0, dtype=bool)
+    surviving = np.flatnonzero(survivors).tolist()
+
+    if output == "bool":
+        mask = np.zeros(len(rows), dtype=bool)
+        for i in surviving:
+            mask[i] = matcher.is_match(rows[i], anchored)
+        return mask
+
+    slot_count = 2 if output == "span" else matcher.program.slot_count
+    slots = np.full((len(rows), slot_count), -1, dtype=np.int64)
+    find = matcher.match if anchored else matcher.search
+    for i in surviving:
+        match = find(rows[i])
+        if match is not None:
+            slots[i] = match.span() if output == "span" else match.slots()
+    return MatchColumns(rows, slots[:, 0] >= 0, slots)
+
+
+def match_array(
+    matcher: Matcher, values: Column, output: str = "match"
+) -> Union["np.ndarray", MatchColumns]:
+    """Matches the pattern at the start of every row of `values`. Returns the `MatchColumns` of
+    the column, or with output "bool", only the boolean mask, which skips the capture engine."""
+    return _run(matcher, values, True, output)
+
+
+def search_array(
+    matcher: Matcher, values: Column, output: str = "match"
+) -> Union["np.ndarray", MatchColumns]:
+    """Like `match_array`, with the leftmost match anywhere in each row"""
+    return _run(matcher, values, False, output)
@@ -0,0 +1,622 @@
+"""Lowers the parser's AST into a flat bytecode `Program`, the IR shared by every engine.
+
+Lexer -> Parser -> Compiler -> Program. Each instruction is one entry in a set of parallel lists:
+an opcode, two jump targets `x` and `y`, and an operand `arg`. Jump targets are instruction
+indexes (pc), so the engines never look at the AST, and nothing is decided by type dispatch or
+string compares while matching: predefined classes, case folding and the dot's newline rule are
+all resolved here.
+
+A pattern can also be compiled for binary haystacks (bytes, bytearray, memoryview, mmap), which
+yield ints when indexed. Literal characters then stand for the byte with the same code point, and
+the operands of CHAR and SET hold those ints instead of one character strings.
+
+The layout is Thompson's: a SPLIT prefers `x` over `y`, which is what gives the leftmost-first
+semantics (a greedy quantifier prefers looping, a lazy one prefers leaving, an alternation prefers
+its first branch).
+"""
+
+import string
+from typing import Optional
+
+from magnet_regex.ast_node import (
+    ASTNode,
+    AlternationNonde,
+    AnchorNode,
+    AtomicGroupNode,
+    BackreferenceNode,
+    CharClassNode,
+    CharNode,
+    ConcatNode,
+    DotNode,
+    GroupNode,
+    LiteralNode,
+    LookaheadNode,
+    LookbehindNode,
+    NonCapturingGroupNode,
+    PredefinedClassNode,
+    QuantifierNode,
+    walk,
+)
+from magnet_regex.charclass import CharClass, Ranges, compile_class
+
+# Opcodes
+# Consumes exactly the character in `arg`
+CHAR = 0
+# Consumes one character from a set. `arg` is a tuple (chars, negated), where `chars` is a frozenset
+# or a `CharClass`, with the case variants of the members already in it under ignorecase
+SET = 1
+# Consumes any character. `arg` is True when the newline is also accepted (dotall)
+ANY = 2
+# Fork, `x` is preferred over `y`
+SPLIT = 3
+# Jumps to `x`
+JMP = 4
+# Records the current position in slot `arg`
+SAVE = 5
+# Zero width anchor, `arg` is the anchor type: '^', '$', 'b' or 'B'
+ASSERT = 6
+# Zero width lookaround. The body starts at `x` and ends with its own MATCH, `arg` is a tuple
+# (ahead, positive, min_width, max_width), with the width of what the body matches. A lookbehind
+# body can only start that far back; max_width is None when it is unbounded.
+LOOK = 7
+# Matches the text captured by group `arg`
+BACKREF = 8
+# Records the position where an iteration of a loop starts, in slot `arg`
+MARK = 9
+# Leaves the loop, for `x` right after it, when the iteration started with the MARK for slot `arg`
+# did not consume anything, and goes on with the loop otherwise. Like in `re`, an empty iteration
+# is the last one, the rest of the pattern runs after it. Every engine follows this rule, the
+# backtracker with the position in the slot, the automata with the MARKs they went through since
+# they last consumed a character. Without it a backtracker would loop forever on `(a*)*`.
+CHECK = 10
+# Accepting instruction, `arg` is the index of the pattern that matched (None in a lookaround body)
+MATCH = 11
+# Atomic group. The body starts at `x` and ends with its own MATCH; its first match is kept, and
+# its other alternatives are never tried
+ATOMIC = 12
+
+OPCODE_NAMES = {
+    CHAR: "CHAR",
+    SET: "SET",
+    ANY: "ANY",
+    SPLIT: "SPLIT",
+    JMP: "JMP",
+    SAVE: "SAVE",
+    ASSERT: "ASSERT",
+    LOOK: "LOOK",
+    BACKREF: "BACKREF",
+    MARK: "MARK",
+    CHECK: "CHECK",
+    MATCH: "MATCH",
+    ATOMIC: "ATOMIC",
+}
+
+# Instructions that consume one character of the text
+CONSUMING = frozenset((CHAR, SET, ANY))
+
+DIGIT_CHARS = frozenset(string.digits)
+WORD_CHARS = frozenset(string.ascii_letters + string.digits + "_")
+WHITESPACE_CHARS = frozenset(" \t\n\r\f\v")
+
+# Maps each predefined class to its character set and whether it is negated
+PREDEFINED_CLASSES = {
+    "d": (DIGIT_CHARS, False),
+    "D": (DIGIT_CHARS, True),
+    "w": (WORD_CHARS, False),
+    "W": (WORD_CHARS, True),
+    "s": (WHITESPACE_CHARS, False),
+    "S": (WHITESPACE_CHARS, True),
+}
+
+# The same for binary haystacks, as byte values
+WORD_BYTES = frozenset(map(ord, WORD_CHARS))
+PREDEFINED_BYTE_CLASSES = {
+    name: (frozenset(map(ord, chars)), negated)
+    for name, (chars, negated) in PREDEFINED_CLASSES.items()
+}
+
+
+class Program:
+    """A compiled pattern. Instruction `pc` is (ops[pc], x[pc], y[pc], args[pc])."""
+
+    __slots__ = (
+        "ops",
+        "x",
+        "y",
+        "args",
+        "start",
+        "unanchored_start",
+        "slot_count",
+        "register_count",
+        "has_backrefs",
+        "has_lookarounds",
+        "has_assertions",
+        "has_atomic_groups",
+        "binary",
+        "newline",
+        "word_chars",
+        "literal_runs",
+        "tight_loops",
+        "nodes",
+    )
+
+    def __init__(self):
+        # Plain lists rather than `array`s: indexing a list is about twice as fast, and the engines
+        # index these in their innermost loops
+        self.ops: list[int] = []
+        self.x: list[int] = []
+        self.y: list[int] = []
+        self.args: list = []
+        # Entry for anchored runs
+        self.start = 0
+        # Entry for unanchored runs: a lazy `.*?` loop in front of `start`
+        self.unanchored_start = 0
+        # Two slots per group, group 0 included: [2 * n] is the start, [2 * n + 1] the end
+        self.slot_count = 2
+        # Extra slots, after the group slots, used by MARK / CHECK
+        self.register_count = 0
+        self.has_backrefs = False
+        self.has_lookarounds = False
+        self.has_assertions = False
+        # Atomic groups and possessive quantifiers
+        self.has_atomic_groups = False
+        # Compiled for binary haystacks, where the text is indexed as ints
+        self.binary = False
+        # What the anchors compare the text against, "\n" and WORD_CHARS or their byte values
+        self.newline = "\n"
+        self.word_chars = WORD_CHARS
+        # For each CHAR followed by more CHARs, the text of the whole run, so that a backtracker
+        # can test it in one `str.startswith`. None elsewhere, and for binary programs.
+        self.literal_runs: list[Optional[str]] = []
+        # For each SPLIT heading a `*` loop over one character test, `L: SPLIT; test; JMP L`,
+        # whether the loop is greedy, so that a backtracker can run it without going through the
+        # SPLIT once per character. None elsewhere.
+        self.tight_loops: list[Optional[bool]] = []
+        # The innermost AST node each instruction was compiled from, for profiles. None for the
+        # instructions around the pattern: the unanchored prefix, SAVE 0 / SAVE 1 and MATCH.
+        self.nodes: list[Optional[ASTNode]] = []
+
+    def __len__(self):
+        return len(self.ops)
+
+    @property
+    def group_count(self) -> int:
+        return self.slot_count // 2 - 1
+
+    def emit(self, op: int, x: int = -1, y: int = -1, arg=None) -> int:
+        self.ops.append(op)
+        self.x.append(x)
+        self.y.append(y)
+        self.args.append(arg)
+        self.nodes.append(None)
+        return len(self.ops) - 1
+
+    def dump(self) -> str:
+        """Human readable listing of the program, one instruction per line"""
+        lines = []
+        for pc, op in enumerate(self.ops):
+            line = f"{pc:4} {OPCODE_NAMES[op]:8}"
+            if op == SPLIT:
+                line += f" {self.x[pc]}, {self.y[pc]}"
+            elif op == JMP or op == LOOK or op == ATOMIC or op == CHECK:
+                line += f" {self.x[pc]}"
+
+            arg = self.args[pc]
+            if op == SET:
+                chars, negated = arg
+                if isinstance(chars, CharClass):
+                    shown = repr(chars)
+                else:
+                    shown = "".join(sorted(map(chr, chars) if self.binary else chars)[:10])
+                    shown += "..." if len(chars) > 10 else ""
+                line += f" [{'^' if negated else ''}{shown}]"
+            elif arg is not None:
+                line += f" {arg!r}"
+            if pc == self.start:
+                line += "  <- start"
+            lines.append(line.rstrip())
+        return "\n".join(lines)
+
+
+def accepts(program: Program, pc: int, char: str) -> bool:
+    """Whether the consuming instruction at `pc` accepts `char`"""
+    op = program.ops[pc]
+    if op == CHAR:
+        return char == program.args[pc]
+    elif op == SET:
+        chars, negated = program.args[pc]
+        return (char in chars) != negated
+    elif op == ANY:
+        return program.args[pc] or char != program.newline
+    return False
+
+
+def supports_pikevm(program: Program, ast: ASTNode) -> bool:
+    """The Pike VM handles every construct except backreferences, which need the text captured
+    so far and therefore cannot be simulated with a bounded set of states, and atomic groups,
+    whose alternatives are dropped in an order only a backtracker follows. Captures inside a
+    lookaround are also left to the backtracker, because the Pike VM runs lookaround bodies
+    without capture slots."""
+    if program.has_backrefs or program.has_atomic_groups:
+        return False
+    for node in walk(ast):
+        if isinstance(node, (LookaheadNode, LookbehindNode)):
+            if any(isinstance(inner, GroupNode) for inner in walk(node.child)):
+                return False
+    return True
+
+
+def supports_dfa(program: Program) -> bool:
+    """A DFA state only remembers the previous character, which is enough for anchors but not
+    for lookarounds, so those are left to the Pike VM as well"""
+    return not (program.has_backrefs or program.has_atomic_groups or program.has_lookarounds)
+
+
+def nullable(node: ASTNode) -> bool:
+    """Whether `node` can match the empty string"""
+    if isinstance(node, (CharNode, DotNode, CharClassNode, PredefinedClassNode)):
+        return False
+    elif isinstance(node, LiteralNode):
+        return not node.text
+    elif isinstance(node, QuantifierNode):
+        return node.min_count == 0 or nullable(node.child)
+    elif isinstance(node, ConcatNode):
+        return all(nullable(child) for child in node.children)
+    elif isinstance(node, AlternationNonde):
+        return any(nullable(alt) for alt in node.alternatives)
+    elif isinstance(node, (GroupNode, NonCapturingGroupNode, AtomicGroupNode)):
+        return nullable(node.child)
+    # Anchors, lookarounds and backreferences (the group may have captured nothing)
+    return True
+
+
+def width(node: ASTNode, lookaheads: bool = False) -> tuple[int, Optional[int]]:
+    """The minimum and maximum number of characters `node` can match, the maximum is None when
+    it is unbounded. With `lookaheads`, the maximum also covers the characters lookaheads
+    inspect past the end of what they are attached to."""
+    if isinstance(node, (CharNode, DotNode, CharClassNode, PredefinedClassNode)):
+        return 1, 1
+    elif isinstance(node, LiteralNode):
+        return len(node.text), len(node.text)
+    elif isinstance(node, QuantifierNode):
+        child_min, child_max = width(node.child, lookaheads)
+        if node.max_count == 0:
+            return 0, 0
+        if node.max_count is None or child_max is None:
+            return node.min_count * child_min, None
+        return node.min_count * child_min, node.max_count * child_max
+    elif isinstance(node, ConcatNode):
+        low, high = 0, 0
+        for child in node.children:
+            child_min, child_max = width(child, lookaheads)
+            low += child_min
+            high = None if high is None or child_max is None else high + child_max
+        return low, high
+    elif isinstance(node, AlternationNonde):
+        widths = [width(alt, lookaheads) for alt in node.alternatives]
+        highs = [high for _, high in widths]
+        return min(low for low, _ in widths), None if None in highs else max(highs)
+    elif isinstance(node, (GroupNode, NonCapturingGroupNode, AtomicGroupNode)):
+        return width(node.child, lookaheads)
+    elif isinstance(node, BackreferenceNode):
+        return 0, None
+    elif isinstance(node, LookaheadNode) and lookaheads:
+        return 0, width(node.child, lookaheads)[1]
+    # Anchors and lookarounds
+    return 0, 0
+
+
+def reverse(node: ASTNode) -> ASTNode:
+    """The tree that matches the reversed text of whatever `node` matches. Sequences are
+    reversed, `^` and `$` trade places and so do lookaheads and lookbehinds. Groups lose their
+    number, a reverse scan only locates matches. Backreferences and atomic groups have no reverse
+    and raise ValueError."""
+    if isinstance(node, LiteralNode):
+        return LiteralNode(node.text[::-1])
+    elif isinstance(node, ConcatNode):
+        return ConcatNode([reverse(child) for child in reversed(node.children)])
+    elif isinstance(node, AlternationNonde):
+        return AlternationNonde([reverse(alt) for alt in node.alternatives])
+    elif isinstance(node, QuantifierNode):
+        if node.possessive:
+            raise ValueError("Possessive quantifiers cannot be reversed")
+        return QuantifierNode(reverse(node.child), node.min_count, node.max_count, node.greedy)
+    elif isinstance(node, (GroupNode, NonCapturingGroupNode)):
+        return NonCapturingGroupNode(reverse(node.child))
+    elif isinstance(node, AnchorNode):
+        mirrored = {"^": "$", "$": "^"}
+        return AnchorNode(mirrored.get(node.anchor_type, node.anchor_type))
+    elif isinstance(node, LookaheadNode):
+        return LookbehindNode(reverse(node.child), node.positive)
+    elif isinstance(node, LookbehindNode):
+        return LookaheadNode(reverse(node.child), node.positive)
+    elif isinstance(node, (AtomicGroupNode, BackreferenceNode)):
+        raise ValueError(f"{node!r} cannot be reversed")
+    # Single characters read the same both ways
+    return node
+
+
+class Compiler:
+    def __init__(self, flags: Optional[dict[str, bool]] = None, binary: bool = False):
+        self.flags = flags or {}
+        self.ignore_case = self.flags.get("ignorecase", False)
+        self.dotall = self.flags.get("dotall", False)
+        # Lookbehinds of unbounded width try every start back to the beginning of the text, which
+        # makes a search quadratic, so they have to be asked for
+        self.unbounded_lookbehind = self.flags.get("unbounded_lookbehind", False)
+        self.binary = binary
+        self.program = Program()
+        if binary:
+            self.program.binary = True
+            self.program.newline = ord("\n")
+            self.program.word_chars = WORD_BYTES
+        self.group_count = 0
+        # Lookaround and atomic group bodies are emitted after the main MATCH: (LOOK or ATOMIC pc,
+        # body node, whether the body is a node of its own or stands in for the owner's)
+        self._pending_bodies: list[tuple[int, ASTNode, bool]] = []
+
+    def compile(self, ast: ASTNode) -> Program:
+        return self.compile_set([ast])
+
+    def compile_set(self, asts: list[ASTNode]) -> Program:
+        """Compiles several patterns into one program, where the MATCH ending pattern `i` has
+        `i` as its operand. Their group numbers are not remapped, so only the automata, which
+        ignore captures, can run a program with more than one pattern."""
+        program = self.program
+        # Counted on the AST, groups under a {0} quantifier still get their (unset) slots
+        self.group_count = max(
+            (node.group_number for ast in asts for node in walk(ast) if isinstance(node, GroupNode)),
+            default=0,
+        )
+
+        # Unanchored prefix: L: SPLIT start, any; any: ANY; JMP L
+        program.unanchored_start = program.emit(SPLIT)
+        any_pc = program.emit(ANY, arg=True)
+        program.emit(JMP, x=program.unanchored_start)
+
+        # One pattern after the other, each entered from its own SPLIT in the fan out:
+        # SPLIT p0, next; p0: SAVE 0 ... MATCH 0; next: SPLIT p1, ...; last: SAVE 0 ... MATCH n
+        program.start = len(program)
+        for index, ast in enumerate(asts):
+            split = None
+            if index < len(asts) - 1:
+                split = program.emit(SPLIT, x=len(program) + 1)
+            program.emit(SAVE, arg=0)
+            self._compile(ast)
+            program.emit(SAVE, arg=1)
+            program.emit(MATCH, arg=index)
+            if split is not None:
+                program.y[split] = len(program)
+
+        program.x[program.unanchored_start] = program.start
+        program.y[program.unanchored_start] = any_pc
+
+        while self._pending_bodies:
+            body_pc, body, stand_in = self._pending_bodies.pop(0)
+            program.x[body_pc] = len(program)
+            if stand_in:
+                self._compile_node(body)
+            else:
+                self._compile(body)
+            program.emit(MATCH)
+            # The rest of the body belongs to the lookaround or group that owns it
+            for pc in range(program.x[body_pc], len(program)):
+                if program.nodes[pc] is None:
+                    program.nodes[pc] = program.nodes[body_pc]
+
+        program.slot_count = 2 * (self.group_count + 1)
+        # MARK / CHECK were emitted with register numbers, move them after the group slots
+        for pc, op in enumerate(program.ops):
+            if op == MARK or op == CHECK:
+                program.args[pc] += program.slot_count
+
+        program.literal_runs = [None] * len(program)
+        if not self.binary:
+            for pc in range(len(program) - 2, -1, -1):
+                if program.ops[pc] == CHAR and program.ops[pc + 1] == CHAR:
+                    rest = program.literal_runs[pc + 1] or program.args[pc + 1]
+                    program.literal_runs[pc] = program.args[pc] + rest
+
+        program.tight_loops = [None] * len(program)
+        ops, xs, ys = program.ops, program.x, program.y
+        for pc in range(len(program) - 2):
+            if ops[pc] == SPLIT and ops[pc + 1] in CONSUMING and ops[pc + 2] == JMP:
+                if xs[pc + 2] == pc and {xs[pc], ys[pc]} == {pc + 1, pc + 3}:
+                    program.tight_loops[pc] = xs[pc] == pc + 1
+
+        return program
+
+    def _compile(self, node: ASTNode):
+        first = len(self.program)
+        self._compile_node(node)
+        # Children were compiled first, and claimed their own instructions
+        nodes = self.program.nodes
+        for pc in range(first, len(nodes)):
+            if nodes[pc] is None:
+                nodes[pc] = node
+
+    def _compile_node(self, node: ASTNode):
+        program = self.program
+
+        if self.binary and isinstance(node, (CharNode, CharClassNode, PredefinedClassNode)):
+            self._compile_bytes(node)
+        elif isinstance(node, CharNode):
+            variants = compile_class([(ord(node.char),) * 2], self.ignore_case)
+            if len(variants) > 1:
+                program.emit(SET, arg=(variants, False))
+            else:
+                program.emit(CHAR, arg=node.char)
+        elif isinstance(node, LiteralNode):
+            for char in node.text:
+                self._compile_node(CharNode(char))
+        elif isinstance(node, DotNode):
+            program.emit(ANY, arg=self.dotall)
+        elif isinstance(node, CharClassNode):
+            chars = compile_class(_class_ranges(node), self.ignore_case)
+            program.emit(SET, arg=(chars, node.negated))
+        elif isinstance(node, PredefinedClassNode):
+            program.emit(SET, arg=PREDEFINED_CLASSES[node.class_type])
+        elif isinstance(node, QuantifierNode) and node.possessive:
+            # The same as an atomic group around the greedy quantifier
+            program.has_atomic_groups = True
+            atomic_pc = program.emit(ATOMIC)
+            greedy = QuantifierNode(node.child, node.min_count, node.max_count)
+            self._pending_bodies.append((atomic_pc, greedy, True))
+        elif isinstance(node, QuantifierNode):
+            self._compile_quantifier(node)
+        elif isinstance(node, ConcatNode):
+            for child in node.children:
+                self._compile(child)
+        elif isinstance(node, AlternationNonde):
+            self._compile_alternation(node.alternatives)
+        elif isinstance(node, GroupNode):
+            self.group_count = max(self.group_count, node.group_number)
+            program.emit(SAVE, arg=2 * node.group_number)
+            self._compile(node.child)
+            program.emit(SAVE, arg=2 * node.group_number + 1)
+        elif isinstance(node, NonCapturingGroupNode):
+            self._compile(node.child)
+        elif isinstance(node, AnchorNode):
+            program.has_assertions = True
+            program.emit(ASSERT, arg=node.anchor_type)
+        elif isinstance(node, AtomicGroupNode):
+            program.has_atomic_groups = True
+            # The body is compiled after the main pattern, like a lookaround's
+            atomic_pc = program.emit(ATOMIC)
+            self._pending_bodies.append((atomic_pc, node.child, False))
+        elif isinstance(node, (LookaheadNode, LookbehindNode)):
+            program.has_lookarounds = True
+            ahead = isinstance(node, LookaheadNode)
+            min_width, max_width = width(node.child)
+            if not ahead and max_width is None and not self.unbounded_lookbehind:
+                raise ValueError(
+                    f"Lookbehind {node!r} can match any number of characters. Bound its width, or "
+                    "set the unbounded_lookbehind flag to search back to the start of the text."
+                )
+            look_pc = program.emit(LOOK, arg=(ahead, node.positive, min_width, max_width))
+            self._pending_bodies.append((look_pc, node.child, False))
+        elif isinstance(node, BackreferenceNode):
+            program.has_backrefs = True
+            program.emit(BACKREF, arg=node.group_number)
+        else:
+            raise ValueError("Unhandled node")
+
+    def _compile_bytes(self, node: ASTNode):
+        """Character tests for binary haystacks. Only ASCII letters fold, like `bytes.lower`, and
+        the folding is done here by putting both cases in the set."""
+        program = self.program
+
+        if isinstance(node, CharNode):
+            value = ord(node.char)
+            if value > 0xFF:
+                raise ValueError(f"{node.char!r} cannot match a byte, only code points up to 255 do")
+            variants = _byte_variants(value) if self.ignore_case else {value}
+            if len(variants) == 1:
+                program.emit(CHAR, arg=value)
+            else:
+                program.emit(SET, arg=(frozenset(variants), False))
+        elif isinstance(node, CharClassNode):
+            # Characters above 255 never match a byte, they are left out
+            values = set()
+            for first, last in _class_ranges(node):
+                for value in range(first, min(last, 0xFF) + 1):
+                    values |= _byte_variants(value) if self.ignore_case else {value}
+            program.emit(SET, arg=(frozenset(values), node.negated))
+        else:
+            program.emit(SET, arg=PREDEFINED_BYTE_CLASSES[node.class_type])
+
+    def _compile_alternation(self, alternatives: list[ASTNode]):
+        program = self.program
+        if len(alternatives) == 1:
+            self._compile(alternatives[0])
+            return
+
+        # SPLIT L1, next; L1: alt; JMP end; next: SPLIT L2, ...; last alt; end:
+        jumps = []
+        for alt in alternatives[:-1]:
+            split = program.emit(SPLIT)
+            program.x[split] = len(program)
+            self._compile(alt)
+            jumps.append(program.emit(JMP))
+            program.y[split] = len(program)
+        self._compile(alternatives[-1])
+
+        for jump in jumps:
+            program.x[jump] = len(program)
+
+    def _split(self, greedy: bool) -> int:
+        """Emits a SPLIT whose preferred edge enters the body right after it. The edge leaving
+        the loop is patched by `_patch_exit` once the end is known."""
+        split = self.program.emit(SPLIT)
+        if greedy:
+            self.program.x[split] = split + 1
+        else:
+            self.program.y[split] = split + 1
+        return split
+
+    def _patch_exit(self, split: int, greedy: bool, target: int):
+        if greedy:
+            self.program.y[split] = target
+        else:
+            self.program.x[split] = target
+
+    def _compile_quantifier(self, node: QuantifierNode):
+        program = self.program
+
+        # Mandatory copies
+        for _ in range(node.min_count):
+            self._compile(node.child)
+
+        if node.max_count is None:
+            # L: SPLIT body, end; body: [MARK] child [CHECK end]; JMP L; end:
+            guard = nullable(node.child)
+            loop = self._split(node.greedy)
+            if guard:
+                register = program.register_count
+                program.register_count += 1
+                program.emit(MARK, arg=register)
+            self._compile(node.child)
+            if guard:
+                check = program.emit(CHECK, arg=register)
+            program.emit(JMP, x=loop)
+            self._patch_exit(loop, node.greedy, len(program))
+            if guard:
+                program.x[check] = len(program)
+        else:
+            # Optional copies for everything above the minimum, all leaving to the same end:
+            # x{2,4} == xx(x(x)?)?
+            splits = []
+            for _ in range(node.max_count - node.min_count):
+                splits.append(self._split(node.greedy))
+                self._compile(node.child)
+            for split in splits:
+                self._patch_exit(split, node.greedy, len(program))
+
+
+def _byte_variants(value: int) -> set[int]:
+    byte = bytes((value,))
+    return {byte.lower()[0], byte.upper()[0]}
+
+
+def _class_ranges(node: CharClassNode) -> Ranges:
+    """The members of a class node as code point ranges"""
+    ranges = [(ord(char), ord(char)) for char in node.chars]
+    return ranges + [(ord(first), ord(last)) for first, last in node.ranges]
+
+
+def compile_program(
+    ast: ASTNode, flags: Optional[dict[str, bool]] = None, binary: bool = False
+) -> Program:
+    return Compiler(flags, binary).compile(ast)
+
+
+def compile_reverse(
+    ast: ASTNode, flags: Optional[dict[str, bool]] = None, binary: bool = False
+) -> Program:
+    """The program for the reversed pattern, see `reverse`, which a DFA runs right to left from
+    the end of a match to find its start"""
+    return Compiler(flags, binary).compile(reverse(ast))
+
+
+def compile_set(asts: list[ASTNode], flags: Optional[dict[str, bool]] = None) -> Program:
+    return Compiler(flags).compile_set(asts)
@@ -0,0 +1,480 @@
+"""Lazy DFA: determinizes the compiled program on the fly, while scanning the text.
+
+A DFA state is the ordered list of instructions alive at a position, plus what the assertions need to
+know about the previous character. Transitions are computed the first time they are taken and then
+cached, so the steady state of a scan is one dictionary lookup per character.
+
+The cache is bounded. When it grows past its capacity, every state is dropped and the scan carries
+on from the current state, rebuilding what it needs. If a single scan keeps flushing without
+getting much work out of the states it builds, the DFA gives up with `DFACacheThrashing` and the
+caller falls back to the Pike VM.
+
+The DFA only reports where matches end, which is what leftmost-first semantics needs: instructions
+are kept in priority order, and everything with a lower priority than an accepting state is
+dropped, the same way the Pike VM cuts off its threads.
+
+Where the match starts is found by a second DFA, over the program of the reversed pattern: once
+the forward scan has found where the leftmost-first match ends, the reverse DFA scans right to left
+from there, and the last offset where a reversed match ends is the leftmost start. No match can
+start further left than it, or the forward scan would have reported that one.
+"""
+
+from typing import Optional
+
+from magnet_regex.budget import Budget
+from magnet_regex.compiler import (
+    ASSERT,
+    CHECK,
+    CONSUMING,
+    JMP,
+    MARK,
+    MATCH,
+    SPLIT,
+    Program,
+    accepts,
+)
+
+# Rough cost of the cache entries, in bytes, used to enforce the capacity
+STATE_BYTES = 160
+PC_BYTES = 8
+TRANSITION_BYTES = 64
+
+
+def _follow(program: Program, pc: int, empty: int) -> tuple[int, int]:
+    """The instruction after the zero width `pc` that a closure goes on with, and the MARK
+    registers of the iterations that consumed nothing it carries there. Such an iteration leaves
+    its loop at the CHECK. Instructions are seen once per set of registers, since where they go
+    depends on it."""
+    op = program.ops[pc]
+    if op == MARK:
+        return pc + 1, empty | 1 << program.args[pc]
+    if op == CHECK:
+        bit = 1 << program.args[pc]
+        if empty & bit:
+            return program.x[pc], empty & ~bit
+    return pc + 1, empty
+
+
+class DFACacheThrashing(Exception):
+    """Raised when the state cache is too small for the text being scanned"""
+
+
+class DFAState:
+    __slots__ = ("core", "context", "matched", "transitions")
+
+    def __init__(self, core: tuple[int, ...], context, matched: bool):
+        # Instructions entered at this position, in priority order, before following epsilon
+        # instructions
+        self.core = core
+        # What the assertions know about the previous character, None if the pattern has none
+        self.context = context
+        # True if a match ended right before the character that led to this state
+        self.matched = matched
+        # Character (None for the end of the text) to next state
+        self.transitions: dict[Optional[str], "DFAState"] = {}
+
+
+class LazyDFA:
+    DEFAULT_CACHE_CAPACITY = 2 * 1024 * 1024
+    # Whether instructions with a lower priority than a match are dropped. A scan that looks for
+    # every match rather than the leftmost-first one keeps them.
+    LEFTMOST_FIRST = True
+    # A scan gives up after this many flushes, unless each built state served enough characters
+    MAX_FLUSHES = 3
+    MIN_CHARS_PER_STATE = 10
+
+    def __init__(
+        self,
+        program: Program,
+        flags: Optional[dict[str, bool]] = None,
+        cache_capacity: int = DEFAULT_CACHE_CAPACITY,
+        reverse: Optional[Program] = None,
+    ):
+        self.program = program
+        self.flags = flags or {}
+        self.multiline = self.flags.get("multiline", False)
+        self.newline = program.newline
+        self.word_chars = program.word_chars
+        self.cache_capacity = cache_capacity
+        self._uses_context = program.has_assertions
+
+        self._states: dict[tuple, DFAState] = {}
+        self._start_states: dict[tuple, DFAState] = {}
+        self._cache_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.flushes = 0
+        self.gave_up = 0
+
+        # Per scan bookkeeping for the thrashing heuristic
+        self._scan_flushes = 0
+        self._scan_built = 0
+
+        # Finds where matches start, from the program of the reversed pattern (see
+        # `compile_reverse`). Without it, starts are found by anchored forward scans.
+        self.reverse: Optional[ReverseDFA] = None
+        if reverse is not None:
+            self.reverse = ReverseDFA(reverse, flags, cache_capacity)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "flushes": self.flushes,
+            "gave_up": self.gave_up,
+            "states": len(self._states),
+            "cache_bytes": self._cache_bytes,
+            "cache_capacity": self.cache_capacity,
+        }
+
+    def find_end(
+        self,
+        text: str,
+        pos: int = 0,
+        anchored: bool = False,
+        budget: Optional[Budget] = None,
+    ) -> Optional[int]:
+        """Returns the end of the leftmost-first match starting at `pos` (anchored) or anywhere
+        after it, None if there is no match"""
+        self._scan_flushes = 0
+        self._scan_built = 0
+        length = len(text)
+        misses = self.misses
+
+        state = self._start_state(text, pos, anchored)
+        last_end = None
+        steps = 0
+        # With a budget, the text is scanned in blocks of as many characters as it grants, and
+        # charged after each one, so the loop over the characters has nothing more to check
+        charged = 0
+        block_start = pos
+        stop = length if budget is None else min(length, pos + budget.grant())
+
+        while True:
+            for i in range(block_start, stop):
+                char = text[i]
+                next_state = state.transitions.get(char)
+                if next_state is None:
+                    next_state = self._transition(state, char, i - pos)
+                steps += 1
+
+                if next_state.matched:
+                    last_end = i
+                if not next_state.core:
+                    break
+                state = next_state
+            else:
+                if stop < length:
+                    block = stop - block_start
+                    charged += block
+                    block_start = stop
+                    stop = min(length, stop + budget.charge(block, stop))
+                    continue
+                # Assertions such as `$` are only settled once we know the text ends here
+                next_state = state.transitions.get(None)
+                if next_state is None:
+                    next_state = self._transition(state, None, length - pos)
+                steps += 1
+                if next_state.matched:
+                    last_end = length
+            break
+
+        self.hits += steps - (self.misses - misses)
+        if budget is not None:
+            budget.charge(steps - charged, min(pos + steps, length))
+        return last_end
+
+    def search(
+        self, text: str, pos: int = 0, budget: Optional[Budget] = None
+    ) -> Optional[tuple[int, int]]:
+        """Returns the span of the leftmost-first match at or after `pos`"""
+        end = self.find_end(text, pos, budget=budget)
+        if end is None:
+            return None
+        if self.reverse is not None:
+            return self.reverse.find_start(text, end, pos, budget), end
+
+        # The forward scan proved there is a match ending at `end`. Its start is the first offset
+        # where an anchored scan matches, and most of those attempts die after a few characters.
+        for start in range(pos, end + 1):
+            anchored_end = self.find_end(text, start, anchored=True, budget=budget)
+            if anchored_end is not None:
+                return start, anchored_end
+
+        return None
+
+    def _context_at(self, text: str, pos: int):
+        if not self._uses_context:
+            return None
+        if pos == 0:
+            return (True, False, False)
+        prev = text[pos - 1]
+        return (False, prev == self.newline, prev in self.word_chars)
+
+    def _start_state(self, text: str, pos: int, anchored: bool) -> DFAState:
+        context = self._context_at(text, pos)
+        key = (anchored, context)
+        state = self._start_states.get(key)
+        if state is None:
+            entry = self.program.start if anchored else self.program.unanchored_start
+            state = self._intern((entry,), context, False)
+            self._start_states[key] = state
+        return state
+
+    def _intern(self, core: tuple[int, ...], context, matched: bool) -> DFAState:
+        key = (core, context, matched)
+        state = self._states.get(key)
+        if state is None:
+            state = DFAState(core, context, matched)
+            self._states[key] = state
+            self._cache_bytes += STATE_BYTES + PC_BYTES * len(core)
+            self._scan_built += 1
+        return state
+
+    def _transition(self, state: DFAState, char: Optional[str], scanned: int) -> DFAState:
+        self.misses += 1
+
+        if self._cache_bytes > self.cache_capacity:
+            self._flush(state, scanned)
+
+        consuming, matched = self._closure(state, char)
+
+        next_core = []
+        if char is not None:
+            # Consuming instructions are distinct, and so are the instructions right after them
+            next_core = [pc + 1 for pc in consuming if accepts(self.program, pc, char)]
+
+        if self._uses_context and char is not None:
+            context = (False, char == self.newline, char in self.word_chars)
+        else:
+            context = None if not self._uses_context else state.context
+
+        next_state = self._intern(tuple(next_core), context, matched)
+        state.transitions[char] = next_state
+        self._cache_bytes += TRANSITION_BYTES
+        return next_state
+
+    def _flush(self, current: DFAState, scanned: int):
+        self.flushes += 1
+        self._scan_flushes += 1
+
+        if (
+            self._scan_flushes > self.MAX_FLUSHES
+            and scanned < self.MIN_CHARS_PER_STATE * self._scan_built
+        ):
+            self.gave_up += 1
+            raise DFACacheThrashing(
+                f"DFA cache flushed {self._scan_flushes} times after {scanned} characters"
+            )
+
+        for cached in self._states.values():
+            cached.transitions.clear()
+        self._states.clear()
+        self._start_states.clear()
+        self._cache_bytes = 0
+
+        # Keep the state the scan is in, so that its new transition is cached as well
+        key = (current.core, current.context, current.matched)
+        self._states[key] = current
+        self._cache_bytes += STATE_BYTES + PC_BYTES * len(current.core)
+
+    def _closure(self, state: DFAState, char: Optional[str]) -> tuple[list[int], bool]:
+        """Follows the epsilon instructions from the core of `state`, with `char` as the next
+        character. Returns the consuming instructions in priority order and whether a match ends
+        here."""
+        program = self.program
+        ops = program.ops
+        consuming = []
+        matched = False
+        seen = set()
+        # Along with each instruction, the bits of the MARK registers of the loop iterations that
+        # started at this position, as in the Pike VM
+        stack = [(pc, 0) for pc in reversed(state.core)]
+
+        while stack:
+            entry = stack.pop()
+            if entry in seen:
+                continue
+            seen.add(entry)
+            pc, empty = entry
+
+            op = ops[pc]
+            if op == SPLIT:
+                stack.append((program.y[pc], empty))
+                stack.append((program.x[pc], empty))
+            elif op == JMP:
+                stack.append((program.x[pc], empty))
+            elif op == ASSERT:
+                if self._check_anchor(program.args[pc], state.context, char):
+                    stack.append((pc + 1, empty))
+            elif op == MATCH:
+                if not self.LEFTMOST_FIRST:
+                    matched = True
+                    continue
+                # Whatever is left on the stack has a lower priority than this match
+                return consuming, True
+            elif op in CONSUMING:
+                consuming.append(pc)
+            else:
+                # SAVE, MARK and CHECK, captures are left to the Pike VM
+                stack.append(_follow(program, pc, empty))
+
+        return consuming, matched
+
+    def _check_anchor(self, anchor_type: str, context, char: Optional[str]) -> bool:
+        at_start, prev_is_newline, prev_is_word = context
+        if anchor_type == "^":
+            return at_start or (self.multiline and prev_is_newline)
+        elif anchor_type == "$":
+            return char is None or (self.multiline and char == self.newline)
+
+        next_is_word = char is not None and char in self.word_chars
+        if anchor_type == "b":
+            return prev_is_word != next_is_word
+        return prev_is_word == next_is_word
+
+
+class ReverseDFA(LazyDFA):
+    """Lazy DFA over the program of the reversed pattern, see `compile_reverse`. It reads the text
+    right to left, so what its assertions call the previous character is the one after the
+    position, and the next character is the one before it.
+
+    It looks for every offset where a reversed match ends rather than for the leftmost-first one,
+    and reports the one furthest to the left."""
+
+    LEFTMOST_FIRST = False
+
+    def find_start(
+        self, text: str, end: int, pos: int = 0, budget: Optional[Budget] = None
+    ) -> Optional[int]:
+        """Returns the leftmost offset, at or after `pos`, where a match ending at `end` starts,
+        None if there is none"""
+        self._scan_flushes = 0
+        self._scan_built = 0
+        misses = self.misses
+
+        state = self._start_state(text, end, anchored=True)
+        first_start = None
+        steps = 0
+
+        # The character before `pos` is only read for the assertions at `pos`, a match found
+        # after it starts at `pos`
+        for i in range(end - 1, max(pos, 1) - 2, -1):
+            char = text[i]
+            next_state = state.transitions.get(char)
+            if next_state is None:
+                next_state = self._transition(state, char, end - i)
+            steps += 1
+
+            if next_state.matched:
+                first_start = i + 1
+            if not next_state.core or i < pos:
+                break
+            state = next_state
+        else:
+            # Reached the start of the text
+            next_state = state.transitions.get(None)
+            if next_state is None:
+                next_state = self._transition(state, None, end - pos)
+            steps += 1
+            if next_state.matched:
+                first_start = 0
+
+        self.hits += steps - (self.misses - misses)
+        # Charged in one go, the forward scan just read the same characters under the budget
+        if budget is not None:
+            budget.charge(steps, max(pos, end - steps))
+        return first_start
+
+    def _context_at(self, text: str, pos: int):
+        if not self._uses_context:
+            return None
+        if pos == len(text):
+            return (True, False, False)
+        prev = text[pos]
+        return (False, prev == self.newline, prev in self.word_chars)
+
+
+class SetDFA(LazyDFA):
+    """Lazy DFA over a program compiled from several patterns, see `compile_set`. It reports every
+    pattern that matches somewhere in the text, so no instruction is ever cut off: a state is
+    marked with the patterns whose match ends right before the character that led to it."""
+
+    def __init__(
+        self,
+        program: Program,
+        flags: Optional[dict[str, bool]] = None,
+        cache_capacity: int = LazyDFA.DEFAULT_CACHE_CAPACITY,
+    ):
+        super().__init__(program, flags, cache_capacity)
+        self.pattern_count = sum(
+            1 for pc, op in enumerate(program.ops) if op == MATCH and program.args[pc] is not None
+        )
+
+    def scan(self, text: str, stop_at_first: bool = False) -> set[int]:
+        """Returns the indexes of the patterns matching somewhere in `text`. The scan stops as soon
+        as every pattern matched, or after the first match with `stop_at_first`."""
+        self._scan_flushes = 0
+        self._scan_built = 0
+        length = len(text)
+        misses = self.misses
+
+        state = self._start_state(text, 0, anchored=False)
+        found: set[int] = set()
+        steps = 0
+
+        for i in range(length):
+            char = text[i]
+            next_state = state.transitions.get(char)
+            if next_state is None:
+                next_state = self._transition(state, char, i)
+            steps += 1
+
+            if next_state.matched:
+                found |= next_state.matched
+                if stop_at_first or len(found) == self.pattern_count:
+                    break
+            state = next_state
+        else:
+            next_state = state.transitions.get(None)
+            if next_state is None:
+                next_state = self._transition(state, None, length)
+            steps += 1
+            found |= next_state.matched
+
+        self.hits += steps - (self.misses - misses)
+        return found
+
+    def _closure(self, state: DFAState, char: Optional[str]) -> tuple[list[int], frozenset[int]]:
+        program = self.program
+        ops = program.ops
+        consuming = []
+        matched = set()
+        seen = set()
+        stack = [(pc, 0) for pc in reversed(state.core)]
+
+        while stack:
+            entry = stack.pop()
+            if entry in seen:
+                continue
+            seen.add(entry)
+            pc, empty = entry
+
+            op = ops[pc]
+            if op == SPLIT:
+                stack.append((program.y[pc], empty))
+                stack.append((program.x[pc], empty))
+            elif op == JMP:
+                stack.append((program.x[pc], empty))
+            elif op == ASSERT:
+                if self._check_anchor(program.args[pc], state.context, char):
+                    stack.append((pc + 1, empty))
+            elif op == MATCH:
+                matched.add(program.args[pc])
+            elif op in CONSUMING:
+                consuming.append(pc)
+            else:
+                stack.append(_follow(program, pc, empty))
+
+        return consuming, frozenset(matched)
@@ -0,0 +1,520 @@
+"""Opt-in instrumentation: where a pattern spends its time, per node of its tree.
+
+A `Profile` passed to a `Matcher` makes it run the pattern through `ProfiledBacktracker`, a copy
+of the backtracker's loop that counts as it goes. It counts, for every instruction, how often it
+was entered, how often it failed, how often a run backtracked into the alternative it left on the
+stack (for the SPLIT of a quantifier or an alternation; a lazy loop only backtracks once it cannot
+grow), and the time spent on it. It also records how deep lookaround and atomic group bodies
+nested, and how large the backtracking stack grew. The instructions are mapped back to the AST
+nodes they were compiled from (`Program.nodes`), so the counts can be read against the pattern.
+
+The backtracker is the engine whose cost depends on the shape of the pattern; the automata take
+time linear in the text whatever the pattern is. Matchers built without a profile run the plain
+backtracker, whose loop has no counting in it at all, so instrumentation costs nothing when it is
+off. The copy in `ProfiledBacktracker._run` has to be kept in step with `Backtracker._run`.
+
+Times are measured with a clock read per instruction, which is many times slower than the
+instructions themselves: they are only meaningful relative to each other.
+
+Hooks added with `Profile.add_hook` are called after every match call with the totals of that
+call, to forward them to a metrics system.
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from magnet_regex.ast_node import (
+    ASTNode,
+    AlternationNonde,
+    AnchorNode,
+    AtomicGroupNode,
+    BackreferenceNode,
+    CharClassNode,
+    CharNode,
+    ConcatNode,
+    DotNode,
+    GroupNode,
+    LiteralNode,
+    LookaheadNode,
+    LookbehindNode,
+    NonCapturingGroupNode,
+    PredefinedClassNode,
+    QuantifierNode,
+    walk,
+)
+from magnet_regex.backtrack import _BOUND, _GREEDY, _LAZY, Backtracker, _Memo
+from magnet_regex.budget import NEVER, Budget
+from magnet_regex.compiler import (
+    ANY,
+    ASSERT,
+    ATOMIC,
+    BACKREF,
+    CHAR,
+    CHECK,
+    JMP,
+    LOOK,
+    MARK,
+    MATCH,
+    SAVE,
+    SET,
+    SPLIT,
+    Program,
+)
+
+# What a hook receives after each call: the totals of the call, see `Profile._finish_call`
+Hook = Callable[[dict], None]
+
+# The alternative a SPLIT leaves on the profiled stack also holds the SPLIT, as
+# `y + split * _ORIGIN`
+_ORIGIN = 1 << 32
+
+
+@dataclass
+class NodeStats:
+    """The counts of the instructions compiled from one node, its children's excluded"""
+
+    node: ASTNode
+    entered: int = 0
+    failed: int = 0
+    # Alternatives left by the node's SPLITs that were resumed
+    backtracks: int = 0
+    time_ns: int = 0
+
+
+class _Counters:
+    """The counts of one program, indexed by instruction"""
+
+    __slots__ = ("program", "nodes", "entered", "failed", "backtracks", "time_ns")
+
+    def __init__(self, program: Program, nodes: list[Optional[ASTNode]]):
+        self.program = program
+        # The node of each instruction, in the tree of the profile
+        self.nodes = nodes
+        size = len(program)
+        self.entered = [0] * size
+        self.failed = [0] * size
+        self.backtracks = [0] * size
+        self.time_ns = [0] * size
+
+
+class Profile:
+    """Counts collected by the matchers it is passed to, over all their calls until `reset`"""
+
+    def __init__(self, hook: Optional[Hook] = None):
+        self._hooks: list[Hook] = [] if hook is None else [hook]
+        # One per program the profile was attached to, the str and binary ones of a matcher
+        self._counters: list[_Counters] = []
+        self.ast: Optional[ASTNode] = None
+        self.reset()
+
+    def reset(self):
+        for counters in self._counters:
+            counters.__init__(counters.program, counters.nodes)
+        self.calls = 0
+        # Deepest nesting of lookaround and atomic group bodies, 1 for the pattern alone
+        self.max_depth = 0
+        # Most entries on a backtracking stack
+        self.max_stack = 0
+
+    def add_hook(self, hook: Hook):
+        self._hooks.append(hook)
+
+    def _attach(self, program: Program, ast: ASTNode) -> _Counters:
+        nodes = program.nodes
+        if self.ast is None:
+            self.ast = ast
+        elif ast is not self.ast:
+            # The matcher for the other kind of haystack optimizes the tree again, into equal
+            # nodes that are not the same objects
+            if ast != self.ast:
+                raise ValueError("A profile can only follow one pattern")
+            same = dict(zip(map(id, walk(ast)), walk(self.ast)))
+            nodes = [None if node is None else same[id(node)] for node in nodes]
+        counters = _Counters(program, nodes)
+        self._counters.append(counters)
+        return counters
+
+    def _totals(self) -> dict:
+        totals = {"entered": 0, "failed": 0, "backtracks": 0, "time_ns": 0}
+        for counters in self._counters:
+            for name in totals:
+                totals[name] += sum(getattr(counters, name))
+        return totals
+
+    def _finish_call(self, before: dict, depth: int, stack: int):
+        """Records the end of a call that started with the totals `before`, and hands what it
+        did to the hooks"""
+        self.calls += 1
+        self.max_depth = max(self.max_depth, depth)
+        self.max_stack = max(self.max_stack, stack)
+        if not self._hooks:
+            return
+        call = {name: value - before[name] for name, value in self._totals().items()}
+        call.update(max_depth=depth, max_stack=stack)
+        for hook in self._hooks:
+            hook(call)
+
+    def nodes(self) -> list[NodeStats]:
+        """The counts of every node of the pattern that ran, in pattern order. The instructions
+        around the pattern (its unanchored prefix, SAVE 0 and MATCH) are left out."""
+        stats: dict[int, NodeStats] = {}
+        for counters in self._counters:
+            for pc, node in enumerate(counters.nodes):
+                if node is None:
+                    continue
+                entry = stats.get(id(node))
+                if entry is None:
+                    entry = stats[id(node)] = NodeStats(node)
+                entry.entered += counters.entered[pc]
+                entry.failed += counters.failed[pc]
+                entry.backtracks += counters.backtracks[pc]
+                entry.time_ns += counters.time_ns[pc]
+        if self.ast is None:
+            return []
+        order = {id(node): rank for rank, node in enumerate(walk(self.ast))}
+        return sorted(stats.values(), key=lambda entry: order.get(id(entry.node), len(order)))
+
+    def report(self, top: int = 10) -> str:
+        """The pattern, as the engines run it, with the `top` nodes that took the most time
+        marked under it and their counts"""
+        if self.ast is None:
+            return "(nothing profiled)"
+        spans: dict[int, tuple[int, int]] = {}
+        parts: list[str] = []
+        _render(self.ast, parts, spans)
+        pattern = "".join(parts)
+
+        nodes = self.nodes()
+        total = sum(entry.time_ns for entry in nodes) or 1
+        hot = sorted(nodes, key=lambda entry: entry.time_ns, reverse=True)[:top]
+        lines = [
+            pattern,
+            f"{self.calls} calls, max depth {self.max_depth}, max stack {self.max_stack}",
+        ]
+        for entry in hot:
+            start, end = spans.get(id(entry.node), (0, len(pattern)))
+            marker = " " * start + "^" * max(1, end - start)
+            lines.append(
+                f"{marker:{len(pattern)}}  {100 * entry.time_ns / total:5.1f}%  "
+                f"entered {entry.entered}, failed {entry.failed}, "
+                f"backtracks {entry.backtracks}  {pattern[start:end]}"
+            )
+        return "\n".join(lines)
+
+
+# Characters escaped when a pattern is written back
+_METACHARS = set("\\^$.|?*+()[]{},")
+
+
+def _render(node: ASTNode, parts: list[str], spans: dict[int, tuple[int, int]]):
+    """Writes `node` back as a pattern into `parts`, recording where each node is in it"""
+    start = sum(map(len, parts))
+
+    def wrap(prefix: str, child: ASTNode, suffix: str = ")"):
+        parts.append(prefix)
+        _render(child, parts, spans)
+        parts.append(suffix)
+
+    if isinstance(node, CharNode):
+        parts.append("\\" + node.char if node.char in _METACHARS else node.char)
+    elif isinstance(node, LiteralNode):
+        parts.append("".join("\\" + c if c in _METACHARS else c for c in node.text))
+    elif isinstance(node, DotNode):
+        parts.append(".")
+    elif isinstance(node, CharClassNode):
+        ranges = "".join(f"{first}-{last}" for first, last in node.ranges)
+        chars = "".join("\\" + c if c in "\\]^-," else c for c in sorted(node.chars))
+        parts.append(f"[{'^' if node.negated else ''}{ranges}{chars}]")
+    elif isinstance(node, PredefinedClassNode):
+        parts.append("\\" + node.class_type)
+    elif isinstance(node, QuantifierNode):
+        child = node.child
+        if isinstance(child, (ConcatNode, AlternationNonde, QuantifierNode)) or (
+            isinstance(child, LiteralNode) and len(child.text) > 1
+        ):
+            wrap("(?:", child)
+        else:
+            _render(child, parts, spans)
+        if (node.min_count, node.max_count) in ((0, 1), (0, None), (1, None)):
+            symbol = {1: "?", None: "*"}[node.max_count] if node.min_count == 0 else "+"
+        elif node.min_count == node.max_count:
+            symbol = f"{{{node.min_count}}}"
+        else:
+            symbol = f"{{{node.min_count},{'' if node.max_count is None else node.max_count}}}"
+        parts.append(symbol + ("?" if not node.greedy else "+" if node.possessive else ""))
+    elif isinstance(node, ConcatNode):
+        for child in node.children:
+            if isinstance(child, AlternationNonde):
+                wrap("(?:", child)
+            else:
+                _render(child, parts, spans)
+    elif isinstance(node, AlternationNonde):
+        for i, alternative in enumerate(node.alternatives):
+            if i:
+                parts.append("|")
+            _render(alternative, parts, spans)
+    elif isinstance(node, GroupNode):
+        wrap("(", node.child)
+    elif isinstance(node, NonCapturingGroupNode):
+        wrap("(?:", node.child)
+    elif isinstance(node, AtomicGroupNode):
+        wrap("(?>", node.child)
+    elif isinstance(node, LookaheadNode):
+        wrap("(?=" if node.positive else "(?!", node.child)
+    elif isinstance(node, LookbehindNode):
+        wrap("(?<=" if node.positive else "(?<!", node.child)
+    elif isinstance(node, BackreferenceNode):
+        parts.append(f"\\{node.group_number}")
+    elif isinstance(node, AnchorNode):
+        parts.append(node.anchor_type if node.anchor_type in "^$" else "\\" + node.anchor_type)
+    spans[id(node)] = (start, sum(map(len, parts)))
+
+
+class ProfiledBacktracker(Backtracker):
+    """The backtracker, counting what each instruction does into a `Profile`. `_run` is the same
+    loop as `Backtracker._run`, with the counting added, and has to be kept in step with it."""
+
+    def __init__(
+        self,
+        program: Program,
+        flags: Optional[dict[str, bool]],
+        profile: Profile,
+        ast: ASTNode,
+    ):
+        super().__init__(program, flags)
+        self.profile = profile
+        self._counters = profile._attach(program, ast)
+        # The instruction the clock is running for, and since when
+        self._timed_pc = program.start
+        self._since = 0
+        self._depth = 0
+        self._max_depth = 0
+        self._max_stack = 0
+
+    def _profiled(self, call: Callable[[], Optional[list[int]]]) -> Optional[list[int]]:
+        profile = self.profile
+        before = profile._totals() if profile._hooks else None
+        self._max_depth = self._max_stack = 0
+        self._timed_pc = self.program.start
+        self._since = time.perf_counter_ns()
+        try:
+            return call()
+        finally:
+            self._tick(self._timed_pc)
+            profile._finish_call(before, self._max_depth, self._max_stack)
+
+    def match(
+        self, text: str, start: int = 0, budget: Optional[Budget] = None
+    ) -> Optional[list[int]]:
+        return self._profiled(lambda: super(ProfiledBacktracker, self).match(text, start, budget))
+
+    def search(
+        self, text: str, start: int = 0, budget: Optional[Budget] = None
+    ) -> Optional[list[int]]:
+        return self._profiled(lambda: super(ProfiledBacktracker, self).search(text, start, budget))
+
+    def _tick(self, pc: int):
+        """Charges the time since the last tick to the instruction that ran, and starts the clock
+        for `pc`"""
+        now = time.perf_counter_ns()
+        self._counters.time_ns[self._timed_pc] += now - self._since
+        self._timed_pc = pc
+        self._since = now
+
+    def _run(
+        self,
+        pc: int,
+        text: str,
+        pos: int,
+        slots: list[int],
+        end: Optional[int] = None,
+        memo: Optional[_Memo] = None,
+        budget: Optional[Budget] = None,
+    ) -> Optional[int]:
+        # Lookaround and atomic group bodies run one level deeper
+        self._depth += 1
+        self._max_depth = max(self._max_depth, self._depth)
+        try:
+            return self._profiled_run(pc, text, pos, slots, end, memo, budget)
+        finally:
+            self._depth -= 1
+
+    def _profiled_run(self, pc, text, pos, slots, end, memo, budget) -> Optional[int]:
+        program = self.program
+        ops, xs, ys, args = program.ops, program.x, program.y, program.args
+        runs = program.literal_runs
+        tight = program.tight_loops
+        newline = self.newline
+        length = len(text)
+        ranks = self._ranks
+        counters = self._counters
+        entered, failed, backtracks = counters.entered, counters.failed, counters.backtracks
+        bits = memo.bits if memo is not None else None
+        steps = 0
+        grant = budget.grant() if budget is not None else NEVER
+        # As in `Backtracker._run`, with the SPLIT of each alternative folded in, see `_ORIGIN`
+        stack: list[tuple[int, int]] = []
+
+        while True:
+            op = ops[pc]
+            self._tick(pc)
+            entered[pc] += 1
+            if len(stack) > self._max_stack:
+                self._max_stack = len(stack)
+
+            if bits is not None and ranks[pc] >= 0 and self._seen(memo, pc, pos, slots):
+                pass
+            elif op == CHAR:
+                run = runs[pc]
+                if run is not None:
+                    if text.startswith(run, pos):
+                        for inner in range(pc + 1, pc + len(run)):
+                            entered[inner] += 1
+                        pc += len(run)
+                        pos += len(run)
+                        continue
+                elif pos < length and text[pos] == args[pc]:
+                    pc += 1
+                    pos += 1
+                    continue
+            elif op == SET:
+                if pos < length:
+                    chars, negated = args[pc]
+                    char = text[pos]
+                    if (char in chars) != negated:
+                        pc += 1
+                        pos += 1
+                        continue
+            elif op == ANY:
+                if pos < length and (args[pc] or text[pos] != newline):
+                    pc += 1
+                    pos += 1
+                    continue
+            elif op == SPLIT:
+                greedy = tight[pc] if bits is None else None
+                if greedy is None:
+                    stack.append((ys[pc] + pc * _ORIGIN, pos))
+                    pc = xs[pc]
+                    steps += 1
+                elif greedy:
+                    stop = self._scan(pc + 1, text, pos, length)
+                    # The loop's test ran once per character, and failed on the last one
+                    entered[pc + 1] += stop - pos + 1
+                    failed[pc + 1] += 1
+                    if stop > pos:
+                        stack.append((_BOUND, pos))
+                        stack.append((_GREEDY - pc, stop))
+                    steps += stop - pos + 1
+                    pc += 3
+                    pos = stop
+                else:
+                    stack.append((_LAZY - pc, pos))
+                    pc += 3
+                    steps += 1
+                if steps >= grant:
+                    grant = budget.charge(steps, pos)
+                    steps = 0
+                continue
+            elif op == JMP:
+                pc = xs[pc]
+                continue
+            elif op == SAVE or op == MARK:
+                slot = args[pc]
+                stack.append((-1 - slot, slots[slot]))
+                slots[slot] = pos
+                pc += 1
+                continue
+            elif op == CHECK:
+                pc = pc + 1 if slots[args[pc]] != pos else xs[pc]
+                continue
+            elif op == ASSERT:
+                if self._check_anchor(args[pc], text, pos):
+                    pc += 1
+                    continue
+            elif op == LOOK:
+                before = slots[:]
+                found = self._check_lookaround(pc, text, pos, slots, budget)
+                positive = args[pc][1]
+                if found and positive:
+                    for slot, value in enumerate(before):
+                        if slots[slot] != value:
+                            stack.append((-1 - slot, value))
+                else:
+                    slots[:] = before
+                if found == positive:
+                    pc += 1
+                    continue
+            elif op == ATOMIC:
+                before = slots[:]
+                found = self._run(xs[pc], text, pos, slots, budget=budget)
+                if found is not None:
+                    for slot, value in enumerate(before):
+                        if slots[slot] != value:
+                            stack.append((-1 - slot, value))
+                    pc += 1
+                    pos = found
+                    continue
+            elif op == BACKREF:
+                new_pos = self._match_backref(args[pc], text, pos, slots)
+                if new_pos is not None:
+                    pc += 1
+                    pos = new_pos
+                    continue
+            elif op == MATCH:
+                if end is None or pos == end:
+                    if budget is not None:
+                        budget.charge(steps, pos)
+                    return pos
+
+            failed[pc] += 1
+            steps += 1
+            if steps >= grant:
+                grant = budget.charge(steps, pos)
+                steps = 0
+            while True:
+                if not stack:
+                    if budget is not None:
+                        budget.charge(steps, pos)
+                    return None
+                pc, pos = stack.pop()
+                if pc >= 0:
+                    split, pc = divmod(pc, _ORIGIN)
+                    backtracks[split] += 1
+                    break
+                if pc > _GREEDY:
+                    slots[-1 - pc] = pos
+                elif pc > _LAZY:
+                    backtracks[_GREEDY - pc] += 1
+                    pos -= 1
+                    if pos > stack[-1][1]:
+                        stack.append((pc, pos))
+                    else:
+                        stack.pop()
+                    pc = _GREEDY - pc + 3
+                    break
+                else:
+                    test = _LAZY - pc + 1
+                    passed = False
+                    if pos < length:
+                        op, arg, char = ops[test], args[test], text[pos]
+                        if op == CHAR:
+                            passed = char == arg
+                        elif op == SET:
+                            passed = (char in arg[0]) != arg[1]
+                        else:
+                            passed = arg or char != newline
+                        entered[test] += 1
+                        failed[test] += not passed
+                    if passed:
+                        stack.append((pc, pos + 1))
+                        pc = test + 2
+                        pos += 1
+                        break
+                    # Only a loop that cannot grow any more backtracks
+                    backtracks[_LAZY - pc] += 1
+
+            if memo is not None and bits is None:
+                memo.backtracks += 1
+                if memo.backtracks > self.MEMO_AFTER_BACKTRACKS:
+                    memo.bits = bits = bytearray((self._join_count * memo.stride + 7) // 8)
@@ -71,36 +71,44 @@ class TokenType(int, Enum):
     WORD = 19  # \w - Matches any word character (alphanumeric and underscore) == [a-zA-Z0-9_]
     NON_WORD = 20  # \W - Matches any non-word character (alphanumeric and underscore) == [^a-zA-Z0-9_]
     WHITESPACE = 21  # \s - Matches any whitespace character == [ \t\n\r\f\v].
-    NON_WHITESPACE = 21  # \S - Matches any non-whitespace character == [^ \t\n\r\f\v].
+    NON_WHITESPACE = 22  # \S - Matches any non-whitespace character == [^ \t\n\r\f\v].
 
     # Word boundary - Matches the position between a word character (\w) and a non-word character
     # (\W) or the start/end of a string.
     # Example: \bcat\b matches "cat" in "The cat sat" but does not match "cat" in "tomcat".
-    WORD_BOUNDARY = 22  # \b
-    NON_WORD_BOUNDARY = 23  # \B
+    WORD_BOUNDARY = 23  # \b
+    NON_WORD_BOUNDARY = 24  # \B
 
     # Backreferences
     # Matches the exact text that was previously captured by a capturing group ((...)). \1 refers to
     # the first group, \2 to the second group, etc.
     # Example: (\w)\1 matches any repeated character, like "oo" in "look" or "ll" in "hello"
-    BACKREF = 24  # \1, \2, etc.
+    BACKREF = 25  # \1, \2, etc.
 
     # Lookahead / Lookbehind markers -> Like peek for regex
     # Example: (?= -> Password(?=.*[0-9]) checks if the password contains at least one digit.
     # "Password123" and "Password abc 123" will match.
-    LOOKAHEAD_POS = 25  # (?=
+    LOOKAHEAD_POS = 26  # (?=
     # Example: (?= -> Password(?!.*[0-9]) checks if the password does not contain any digit.
     # "Password123" and "Password abc 123" will not match.
-    LOOKAHEAD_NEG = 26  # (?!
+    LOOKAHEAD_NEG = 27  # (?!
     # Example (?<=abc) checks if the string contains "abc" before the current position.
-    LOOKBEHIND_POS = 27  # (?<=
+    LOOKBEHIND_POS = 28  # (?<=
     # Example (?<!abc) checks if the string does not contain "abc" before the current position.
-    LOOKBEHIND_NEG = 28  # (?<!
+    LOOKBEHIND_NEG = 29  # (?<!
     # Example (?:http|https):// groups "http" and "https" for the | operatior, but you can't
     # reference it as a captured group with \1
-    NON_CAPTURING = 29  # (?:
+    NON_CAPTURING = 30  # (?:
 
-    EOF = 30
+    # Atomic group -> once its content matched, the match is kept and never backtracked into.
+    # Example: (?>a+)b fails on "aaa" without trying the shorter runs of a's.
+    ATOMIC = 31  # (?>
+    # Possessive modifier, a `+` right after a quantifier: *+, ++, ?+, {n,m}+. Like an atomic
+    # group around the quantifier, it takes as many repetitions as it can and never gives one back.
+    # Example: ".*+" can never match, the .*+ also takes the closing quote.
+    POSSESSIVE = 32
+
+    EOF = 33
 
 
 @dataclass
@@ -134,7 +142,18 @@ class Lexer:
                 tokens.append(Token(TokenType.STAR, curr_char, start_pos))
                 self.advance()
             elif curr_char == "+":
-                tokens.append(Token(TokenType.PLUS, curr_char, start_pos))
+                if tokens and self._ends_quantifier(tokens[-1]):
+                    if len(tokens) > 1 and tokens[-1].t_type == TokenType.QUESTION and (
+                        self._ends_quantifier(tokens[-2])
+                    ):
+                        # The `?` is the lazy modifier of the quantifier before it
+                        raise ValueError(
+                            f"Multiple repeat at position {start_pos}: a lazy quantifier cannot "
+                            "also be possessive"
+                        )
+                    tokens.append(Token(TokenType.POSSESSIVE, curr_char, start_pos))
+                else:
+                    tokens.append(Token(TokenType.PLUS, curr_char, start_pos))
                 self.advance()
             elif curr_char == "?":
                 tokens.append(Token(TokenType.QUESTION, curr_char, start_pos))
@@ -198,6 +217,16 @@ class Lexer:
         self.pos += 1
         return char
 
+    def _ends_quantifier(self, token: Token) -> bool:
+        """Whether `token`, the one before the current `+`, can end a quantifier, which makes the
+        `+` the possessive modifier. Escaped quantifier characters are CHAR tokens."""
+        return token.t_type in (
+            TokenType.STAR,
+            TokenType.PLUS,
+            TokenType.QUESTION,
+            TokenType.RBRACE,
+        )
+
     def _handle_escape(self) -> Optional[Token]:
         start_pos = self.pos
         _escape = self.advance()
@@ -270,6 +299,9 @@ class Lexer:
             if curr_char == ":":
                 self.advance()
                 return Token(TokenType.NON_CAPTURING, "(?:", start_pos)
+            elif curr_char == ">":
+                self.advance()
+                return Token(TokenType.ATOMIC, "(?>", start_pos)
             elif curr_char == "=":
                 self.advance()
                 return Token(TokenType.LOOKAHEAD_POS, "(?=", start_pos)
@@ -1,422 +1,476 @@
-from dataclasses import dataclass
-import string
-from typing import Optional
-from magnet_regex.ast_node import ASTNode, AlternationNonde, AnchorNode, BackreferenceNode, CharClassNode, CharNode, ConcatNode, DotNode, GroupNode, LookaheadNode, LookbehindNode, NonCapturingGroupNode, PredefinedClassNode, QuantifierNode
+import mmap
+from itertools import islice
+from typing import Callable, Iterator, Optional, Union
+from magnet_regex.ast_node import ASTNode
+from magnet_regex.backtrack import Backtracker
+from magnet_regex.budget import Budget, CancellationToken
+from magnet_regex.compiler import (
+    compile_program,
+    compile_reverse,
+    supports_dfa,
+    supports_pikevm,
+)
+from magnet_regex.dfa import DFACacheThrashing, LazyDFA
+from magnet_regex.instrument import Profile, ProfiledBacktracker
+from magnet_regex.optimizer import optimize
+from magnet_regex.pikevm import PikeVM
+from magnet_regex.planner import (
+    LINE_STARTS,
+    SCAN,
+    START,
+    SUFFIX_WINDOW,
+    WORD_BOUNDARIES,
+    build_plan,
+)
+from magnet_regex.prefilter import build_prefilter
+
+# What the matchers accept as text. Binary haystacks are matched byte by byte, without decoding.
+Haystack = Union[str, bytes, bytearray, memoryview, mmap.mmap]
 
 
-@dataclass
 class Match:
-    """Represents a match over the text"""
-    start: int
-    end: int
-    text: str
-    # Contains the groups, mapping the group number to the captured text
-    groups: dict[int, Optional[int]]
-
-    def group(self, n: int = 0) -> Optional[str]:
-        """Retrieves the group based on its index"""
-        # If index is zero (\0), we return the entire match
+    """A match over the text. It keeps a reference to the haystack and the flat capture offsets
+    reported by the engine, and only slices the text when a group is asked for.
+
+    Over a binary haystack, groups are memoryview slices of it, no bytes are copied. They keep the
+    haystack exported, so an mmap cannot be closed while they are alive.
+
+    The groups may also be left to `captures`, which runs the capture engine over the match and
+    returns every slot. It is only called the first time a group other than 0 is asked for."""
+
+    __slots__ = ("start", "end", "_haystack", "_slots", "_offset", "_captures")
+
+    def __init__(
+        self,
+        haystack: Haystack,
+        slots: list[int],
+        offset: int = 0,
+        captures: Optional[Callable[[], list[int]]] = None,
+    ):
+        # Capture offsets, [2 * n] and [2 * n + 1] for group n (group 0 being the whole match),
+        # -1 when the group did not take part in the match. Only group 0 until `captures` ran.
+        self._haystack = haystack
+        self._slots = slots
+        self._captures = captures
+        # Added to every reported position, when the haystack is a window of a larger text
+        self._offset = offset
+        self.start = slots[0] + offset
+        self.end = slots[1] + offset
+
+    @property
+    def string(self) -> Haystack:
+        """The haystack the match was found in"""
+        return self._haystack
+
+    @property
+    def text(self) -> Union[str, memoryview]:
+        return self.group(0)
+
+    def _all_slots(self) -> list[int]:
+        if self._captures is not None:
+            self._slots = self._captures()
+            self._captures = None
+        return self._slots
+
+    def slots(self) -> list[int]:
+        """The start and end of every group, group 0 first, flat: [2 * n] and [2 * n + 1] for
+        group n, -1 for the groups that did not take part in the match"""
+        offset = self._offset
+        return [slot + offset if slot >= 0 else -1 for slot in self._all_slots()]
+
+    def shifted(self, offset: int) -> "Match":
+        """The same match with every position `offset` further, for a match found in a window
+        of a larger text that starts there"""
+        return Match(self._haystack, self._slots, self._offset + offset, self._captures)
+
+    def _group_count(self) -> int:
+        return len(self._all_slots()) // 2 - 1
+
+    def _bounds(self, n: int) -> tuple[int, int]:
         if n == 0:
-            return self.text
-        return self.group.get(n)
+            return self._slots[0], self._slots[1]
+        if not 0 <= n <= self._group_count():
+            raise IndexError(f"No group {n}, the pattern has {self._group_count()}")
+        return self._slots[2 * n], self._slots[2 * n + 1]
+
+    def group(self, n: int = 0) -> Optional[Union[str, memoryview]]:
+        """Retrieves the text of group `n`, None when it did not take part in the match"""
+        start, end = self._bounds(n)
+        if start < 0 or end < 0:
+            return None
+        haystack = self._haystack
+        if not isinstance(haystack, str):
+            haystack = memoryview(haystack)
+        return haystack[start:end]
+
+    def span(self, n: int = 0) -> tuple[int, int]:
+        """Start and end of group `n`, (-1, -1) when it did not take part in the match"""
+        start, end = self._bounds(n)
+        if start < 0 or end < 0:
+            return -1, -1
+        return start + self._offset, end + self._offset
+
+    def groups(self, default=None) -> tuple:
+        """The text of every group, `default` for the ones that did not take part in the match"""
+        return tuple(
+            default if text is None else text
+            for text in map(self.group, range(1, self._group_count() + 1))
+        )
+
+    def __repr__(self):
+        return f"<Match span=({self.start}, {self.end}) text={self.text!r}>"
 
 
 class Matcher:
-    def __init__(self, ast: ASTNode, flags: Optional[dict[str, bool]] = None):
-        self.ast = ast
+    # Engines that can be requested explicitly. "auto" uses the lazy DFA to locate matches and the
+    # Pike VM for captures whenever the pattern allows it, and falls back to the backtracker
+    # otherwise.
+    ENGINES = ("auto", "dfa", "pikevm", "backtrack")
+    # Once the prefilter has produced this many candidate starts, it is dropped for the rest of the
+    # search if they were on average closer than PREFILTER_MIN_SKIP characters apart: an engine's
+    # own unanchored scan is cheaper than restarting at every candidate then
+    PREFILTER_MIN_CANDIDATES = 16
+    PREFILTER_MIN_SKIP = 8
+
+    def __init__(
+        self,
+        ast: ASTNode,
+        flags: Optional[dict[str, bool]] = None,
+        engine: str = "auto",
+        dfa_cache_capacity: int = LazyDFA.DEFAULT_CACHE_CAPACITY,
+        binary: bool = False,
+        profile: Optional[Profile] = None,
+    ):
+        # The engines run the optimized tree, which matches the same way
+        self.ast = optimize(ast)
         self.flags = flags or {}
-
-        # Flags
-        self.ignore_case = self.flags.get("ignorecase", False)
-        self.multiline = self.flags.get("multiline", False)
-        self.dotall = self.flags.get("dotall", False)
-
-        # State during matching
-        self.text = ""
-        self.length = 0
-        self.captures: dict[int, Optional[str]] = {}
-
-        self._init_char_classes()
-
-    def _init_char_classes(self):
-        self.digit_chars = set("0123456789")
-        lowercase_letters = [chr(l) for l in range(ord("a"), ord("z") + 1)]
-        uppercase_letters = [chr(l) for l in range(ord("A"), ord("Z") + 1)]
-        self.word_chars = set(lowercase_letters + uppercase_letters + list(self.digit_chars) + ["_"])
-        # OR
-        self.word_chars = set(string.ascii_letters + string.digits + "_")
-        self.whitespace_chars = set(" \t\n\r\f\v")
-
-    def match(self, text: str, start: int = 0) -> Optional[Match]:
-        # Resetting previous state
-        self.text = text
-        self.length = len(text)
-        self.captures = {}
-
-        end_pos = self._match_node(self.ast, start)
-
-        if end_pos is not None:
-            return Match(
-                start=start,
-                end=end_pos,
-                text=text[start:end_pos],
-                groups=self.captures.copy(),
+        # Compiled for bytes, bytearray, memoryview and mmap haystacks rather than str. Either
+        # kind is accepted, the matcher for the other one is built the first time it is needed.
+        self.binary = binary
+        self._options = (engine, dfa_cache_capacity, profile)
+        self._other_kind: Optional[Matcher] = None
+
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}, expected one of {self.ENGINES}")
+        if profile is not None:
+            # Profiles count what the backtracker does, see instrument.py
+            if engine not in ("auto", "backtrack"):
+                raise ValueError(f"Profiles run the backtrack engine, not the {engine} engine")
+            engine = "backtrack"
+
+        # Every engine runs the same compiled program
+        self.program = compile_program(self.ast, self.flags, binary)
+
+        if engine in ("dfa", "pikevm") and not supports_pikevm(self.program, self.ast):
+            raise ValueError(
+                f"The {engine} engine cannot run patterns with backreferences or atomic groups"
             )
-        return None
-
-    def search(self, text: str) -> Optional[Match]:
-        self.text = text
-        self.length = len(text)
-
-        for start in range(len(text) + 1):
-            self.captures = {}
-            end_pos = self._match_node(self.ast, start)
+        if engine == "dfa" and not supports_dfa(self.program):
+            raise ValueError("The dfa engine cannot run patterns with lookarounds")
 
-            if end_pos is not None:
-                return Match(
-                    start=start,
-                    end=end_pos,
-                    text=text[start:end_pos],
-                    groups=self.captures.copy(),
-                )
-        return None
-
-    def findall(self, text: str) -> list[Match]:
-        self.text = text
-        self.length = len(text)
-        matches = []
-        pos = 0
-
-        while pos <= len(text):
-            self.captures = {}
-            end_pos = self._match_node(self.ast, pos)
-
-            if end_pos is not None:
-                match = Match(
-                    start=pos,
-                    end=end_pos,
-                    text=text[pos:end_pos],
-                    groups=self.captures.copy(),
-                )
-                matches.append(match)
-                pos = end_pos if end_pos > pos else pos + 1
-            else:
-                pos += 1
-        return matches
-
-    def _match_node(self, node: ASTNode, pos: int) -> Optional[int]:
-        """Dispatches the call to the appropriate handler based on node type and return the first
-        integer offset after the match, if the node matches"""
-        if isinstance(node, CharNode):
-            return self._match_char(node, pos)
-        elif isinstance(node, DotNode):
-            return self._match_dot(node, pos)
-        elif isinstance(node, CharClassNode):
-            return self._match_char_class(node, pos)
-        elif isinstance(node, PredefinedClassNode):
-            return self._match_predefined_class(node, pos)
-        elif isinstance(node, QuantifierNode):
-            return self._match_quantifier(node, pos)
-        elif isinstance(node, ConcatNode):
-            return self._match_concat(node, pos)
-        elif isinstance(node, AlternationNonde):
-            return self._match_alternation(node, pos)
-        elif isinstance(node, GroupNode):
-            return self._match_group(node, pos)
-        elif isinstance(node, NonCapturingGroupNode):
-            return self._match_non_capturing_group(node, pos)
-        elif isinstance(node, BackreferenceNode):
-            return self._match_backref(node, pos)
-        elif isinstance(node, AnchorNode):
-            return self._match_anchor(node, pos)
-        elif isinstance(node, LookaheadNode):
-            return self._match_lookahead(node, pos)
-        elif isinstance(node, LookbehindNode):
-            return self._match_lookbehind(node, pos)
+        if profile is None:
+            self.backtracker = Backtracker(self.program, self.flags)
         else:
-            raise ValueError("Unhandled node")
-
-    def _match_char(self, node: CharNode, pos: int) -> Optional[int]:
-        if pos >= self.length:
-            return None
-
-        text_char = self.text[pos]
-        pattern_char = node.char
-
-        if self.ignore_case:
-            text_char = text_char.lower()
-            pattern_char = pattern_char.lower()
-
-        if text_char == pattern_char:
-            return pos + 1
-
-        return None
-
-    def _match_dot(self, node: DotNode, pos: int) -> Optional[int]:
-        """Dot matches any character, except newline. It also matches newline when the dotall
-        option is enabled."""
-        if pos >= self.length:
-            return None
-
-        char = self.text[pos]
-
-        if not self.dotall and char == '\n':
-            return None
-        return pos + 1
-
-    def _match_char_class(self, node: CharClassNode, pos: int) -> Optional[int]:
-        if pos >= self.length:
-            return None
-
-        char = self.text[pos]
-        chars = node.chars
-        if self.ignore_case:
-            char = char.lower()
-            chars = set(char.lower for char in chars)
-
-        char_belongs = char in chars
-
-        if self.ignore_case:
-            char = char.lower()
-
-        if node.negated != char_belongs:
-            return pos + 1
+            self.backtracker = ProfiledBacktracker(self.program, self.flags, profile, self.ast)
+        # The linear time engines, None when matching goes through the backtracker
+        self.pikevm: Optional[PikeVM] = None
+        self.dfa: Optional[LazyDFA] = None
+        # Whether the pattern has capture groups, which only the Pike VM can report
+        self._has_groups = self.program.group_count > 0
+        # Jumps to the occurrences of a literal every match contains, None when there is none
+        self.prefilter = build_prefilter(self.ast, self.flags, binary)
+
+        if engine != "backtrack" and supports_pikevm(self.program, self.ast):
+            self.pikevm = PikeVM(self.program, self.flags)
+            if engine != "pikevm" and supports_dfa(self.program):
+                # The reversed pattern finds where the matches start
+                reverse = compile_reverse(self.ast, self.flags, binary)
+                self.dfa = LazyDFA(self.program, self.flags, dfa_cache_capacity, reverse)
+
+        if self.dfa is not None:
+            self.engine = "dfa"
+        elif self.pikevm is not None:
+            self.engine = "pikevm"
         else:
-            return None
-
-    def _match_predefined_class(self, node: PredefinedClassNode, pos: int) -> Optional[int]:
-        if pos >= self.length:
-            return None
-
-        char = self.text[pos]
-        matched = False
-
-        if node.class_type == 'd':
-            matched = char in self.digit_chars
-        elif node.class_type == "D":
-            matched = char not in self.digit_chars
-        elif node.class_type == 'w':
-            matched = char in self.word_chars
-        elif node.class_type == 'W':
-            matched = char not in self.word_chars
-        elif node.class_type == 's':
-            matched = char in self.whitespace_chars
-        elif node.class_type == 'S':
-            matched = char not in self.whitespace_chars
-
-        if matched:
-            return pos + 1
-
-        return None
-
-    def _match_quantifier(self, node: QuantifierNode, pos: int) -> Optional[int]:
-        # Holds the first index offset after each match of the child node. It will be further filtered
-        matches = []
-        # Cursor to move along the text to collect all possible matches
-        current_pos = pos
-        count = 0
-
-        while True:
-            # If we reach or exceeded the max count, break out of the loop
-            if node.max_count and count >= node.max_count:
-                break
-
-            next_pos = self._match_node(node.child, current_pos)
-
-            if next_pos is None or next_pos == current_pos:
-                break
-            count += 1
-
-            current_pos = next_pos
-            matches.append(current_pos)
-
-        # If we have a star quantifier, a minimum of 0 is also a valid match
-        valid_matches = [pos] if node.min_count == 0 else []
-        valid_matches.extend(
-            # Only consider matches that fulfill minimum count
-            [m for i, m in enumerate(matches, 1) if i >= node.min_count]
-        )
-
-        if not valid_matches:
-            return None
-
-        if node.greedy:
-            return valid_matches[-1]
+            self.engine = "backtrack"
+
+        # The offsets a search tries, from the anchors the pattern starts or ends with
+        backtracking = self.engine == "backtrack"
+        self.plan = build_plan(self.ast, self.flags, binary, backtracking)
+
+    def for_haystack(self, text: Haystack) -> tuple["Matcher", Haystack]:
+        """Returns the matcher for the kind of haystack `text` is, and the haystack as the
+        engines index it"""
+        if isinstance(text, str):
+            if not self.binary:
+                return self, text
         else:
-            return valid_matches[0]
-
-    def _match_concat(self, node: ConcatNode, pos: int) -> Optional[int]:
-        if not node.children:
-            return pos
-
-        return self._match_concat_recursive(node.children, 0, pos)
-
-    def _match_concat_recursive(
-        self, children: list[ASTNode], child_idx: int, pos: int
-    ) -> Optional[int]:
-        """Match the text starting at position `pos` recursively against the `children` nodes"""
-        # If we matched up to `child_idx` and it it greater than the children node count, we have
-        # a concat match and we return
-        if child_idx >= len(children):
-            return pos
-
-        child = children[child_idx]
-
-        if isinstance(child, QuantifierNode):
-            # Holds the first index offset after each match of the child node. It will be further filtered
-            matches = []
-            # Cursor to move along the text to collect all possible matches
-            current_pos = pos
-            count = 0
-
-            while True:
-                # If we reach or exceeded the max count, break out of the loop
-                if child.max_count and count >= child.max_count:
-                    break
-
-                next_pos = self._match_node(child.child, current_pos)
-
-                if next_pos is None or next_pos == current_pos:
-                    break
-                count += 1
-
-                current_pos = next_pos
-                matches.append(current_pos)
-
-            # If we have a star quantifier, a minimum of 0 is also a valid match
-            valid_matches = [pos] if child.min_count == 0 else []
-            valid_matches.extend(
-                # Only consider matches that fulfill minimum count
-                [m for i, m in enumerate(matches, 1) if i >= child.min_count]
+            if isinstance(text, memoryview) and (text.format != "B" or text.ndim != 1):
+                text = text.cast("B")
+            if self.binary:
+                return self, text
+
+        if self._other_kind is None:
+            engine, dfa_cache_capacity, profile = self._options
+            self._other_kind = Matcher(
+                self.ast, self.flags, engine, dfa_cache_capacity, not self.binary, profile
             )
-
-            if not valid_matches:
-                return None
-
-            # Refactor with match_quantifier until this point
-            if child.greedy:
-                valid_matches.reverse()
-
-            # Try all the possible matches for the quantifier
-            for match_end in valid_matches:
-                # move forward in the children's list
-                result_idx = self._match_concat_recursive(
-                    children, child_idx + 1, match_end
+            self._other_kind._other_kind = self
+        return self._other_kind, text
+
+    def _find(
+        self, text: str, start: int, anchored: bool, budget: Optional[Budget] = None
+    ) -> Optional[Match]:
+        """Runs the best engine for the pattern. The DFA finds where the match is, and the Pike VM
+        only runs over that span, once a group is asked for."""
+        if self.pikevm is None:
+            if anchored:
+                slots = self.backtracker.match(text, start, budget)
+            else:
+                slots = self.backtracker.search(text, start, budget)
+            return Match(text, slots) if slots is not None else None
+
+        if self.dfa is not None:
+            try:
+                if anchored:
+                    end = self.dfa.find_end(text, start, anchored=True, budget=budget)
+                    span = (start, end) if end is not None else None
+                else:
+                    span = self.dfa.search(text, start, budget)
+            except DFACacheThrashing:
+                # The cache is too small for this text, the Pike VM takes over for this call
+                pass
+            else:
+                if span is None:
+                    return None
+                if not self._has_groups:
+                    return Match(text, list(span))
+                # Without the budget: it may be long gone, and the span was scanned already
+                first, last = span
+                return Match(
+                    text, list(span), captures=lambda: self.pikevm.match(text, first, end=last)
                 )
-                if result_idx is not None:
-                    return result_idx
 
-            return None
+        if anchored:
+            slots = self.pikevm.match(text, start, budget)
         else:
-            next_pos = self._match_node(child, pos)
-            if next_pos is None:
+            slots = self.pikevm.search(text, start, budget)
+        return Match(text, slots) if slots is not None else None
+
+    def _scan(self, text: str, start: int, budget: Optional[Budget] = None) -> Optional[Match]:
+        """Finds the leftmost match starting at or after `start`, only trying the offsets the
+        start plan allows"""
+        plan = self.plan
+        if plan.kind == SCAN:
+            return self._find(text, start, anchored=False, budget=budget)
+        if plan.kind == SUFFIX_WINDOW:
+            # Nothing before the window can match, the engines scan the rest as usual
+            first, last = plan.window(len(text))
+            if start > last:
                 return None
-            # If we reached this point, we matched and we go to the next child
-            return self._match_concat_recursive(children, child_idx + 1, next_pos)
-
-    def _match_alternation(self, node: AlternationNonde, pos: int) -> Optional[int]:
-        for alt in node.alternatives:
-            end_pos = self._match_node(alt, pos)
+            return self._find(text, max(start, first), anchored=False, budget=budget)
 
-            if end_pos is not None:
-                return end_pos
+        for candidate in plan.starts(text, start):
+            match = self._find(text, candidate, anchored=True, budget=budget)
+            if match is not None:
+                return match
         return None
 
-    def _match_group(self, node: GroupNode, pos: int) -> Optional[int]:
-        # Save the old capture in case we need to backtrack
-        old_capture = self.captures.get(node.group_number)
-
-        end_pos = self._match_node(node.child, pos)
-
-        # If we matched, we store the capture
-        if end_pos is not None:
-            self.captures[node.group_number] = self.text[pos:end_pos]
-            return end_pos
-        # Should this be in backreference
-        else:
-            if old_capture is not None:
-                self.captures[node.group_number] = old_capture
-            elif node.group_number in self.captures:
-                del self.captures[node.group_number]
+    def _haystack(self, text: str) -> Optional[str]:
+        """The string the prefilter scans for `text`, or None when there is no prefilter"""
+        if self.prefilter is None:
             return None
-
-    def _match_non_capturing_group(self, node: NonCapturingGroupNode, pos: int) -> Optional[int]:
-        end_pos = self._match_node(node.child, pos)
-
-        return end_pos
-
-    def _match_backref(self, node: BackreferenceNode, pos: int) -> Optional[int]:
-        captured = self.captures.get(node.group_number)
-
-        if captured is None:
+        return self.prefilter.haystack(text)
+
+    def _search(
+        self,
+        text: str,
+        start: int,
+        haystack: Optional[str],
+        budget: Optional[Budget] = None,
+    ) -> Optional[Match]:
+        """Finds the leftmost match starting at or after `start`. With a prefilter, the engines
+        only run anchored at the starts allowed by the occurrences of the required literal, and by
+        the start plan."""
+        plan = self.plan
+        if haystack is None or plan.kind in (START, SUFFIX_WINDOW):
+            # Those plans leave fewer starts than any prefilter would
+            return self._scan(text, start, budget)
+
+        prefilter = self.prefilter
+        # Whether the plan rules out some of the prefilter's candidates
+        listed = plan.kind in (LINE_STARTS, WORD_BOUNDARIES)
+        # Every start before `pos` was ruled out already
+        pos = start
+        hit = start + prefilter.min_offset
+        candidates = 0
+        while True:
+            hit = prefilter.find(haystack, hit)
+            if hit < 0:
+                return None
+            if prefilter.max_offset is None:
+                # The literal is there, but the match can start anywhere before it
+                return self._scan(text, pos, budget)
+
+            first = max(pos, hit - prefilter.max_offset)
+            last = hit - prefilter.min_offset
+            for candidate in range(first, last + 1):
+                candidates += 1
+                if (
+                    candidates >= self.PREFILTER_MIN_CANDIDATES
+                    and candidate - start < candidates * self.PREFILTER_MIN_SKIP
+                ):
+                    return self._scan(text, candidate, budget)
+                if listed and not plan.allows(text, candidate):
+                    continue
+
+                match = self._find(text, candidate, anchored=True, budget=budget)
+                if match is not None:
+                    return match
+            pos = max(pos, last + 1)
+            hit += 1
+
+    # Every public matching method takes the same optional limits, as keyword arguments. A call
+    # that runs out of `max_steps` engine steps or `timeout` seconds, or whose `cancel` token is
+    # cancelled, raises `MatchBudgetExceeded`. For `finditer` the limits cover the whole
+    # iteration, time spent by the caller between two matches included.
+
+    def match(
+        self,
+        text: Haystack,
+        start: int = 0,
+        *,
+        max_steps: Optional[int] = None,
+        timeout: Optional[float] = None,
+        cancel: Optional[CancellationToken] = None,
+    ) -> Optional[Match]:
+        matcher, text = self.for_haystack(text)
+        if not matcher.plan.allows(text, start):
             return None
-
-        end_pos = pos + len(captured)
-
-        if end_pos > self.length:
+        prefilter = matcher.prefilter
+        if prefilter is not None and not prefilter.may_match_at(text, start):
             return None
-
-        text_slice = self.text[pos:end_pos]
-
-        if self.ignore_case:
-            if text_slice.lower() == captured.lower():
-                return end_pos
+        budget = Budget.create(max_steps, timeout, cancel)
+        return matcher._find(text, start, anchored=True, budget=budget)
+
+    def search(
+        self,
+        text: Haystack,
+        *,
+        max_steps: Optional[int] = None,
+        timeout: Optional[float] = None,
+        cancel: Optional[CancellationToken] = None,
+    ) -> Optional[Match]:
+        matcher, text = self.for_haystack(text)
+        budget = Budget.create(max_steps, timeout, cancel)
+        return matcher._search(text, 0, matcher._haystack(text), budget)
+
+    def finditer(
+        self,
+        text: Haystack,
+        pos: int = 0,
+        endpos: Optional[int] = None,
+        *,
+        max_steps: Optional[int] = None,
+        timeout: Optional[float] = None,
+        cancel: Optional[CancellationToken] = None,
+    ) -> Iterator[Match]:
+        """Yields the non-overlapping matches in `text`, from left to right, as they are found.
+        Matching stops at `endpos` as if the text ended there: a str is cut with a copy of
+        text[:endpos], a binary haystack with a memoryview slice. Like in `re`, `pos` and `endpos`
+        are clamped to the text, and nothing is found when `endpos` is before `pos`."""
+        matcher, text = self.for_haystack(text)
+        length = len(text)
+        pos = min(max(pos, 0), length)
+        if endpos is not None and endpos < length:
+            endpos = max(endpos, 0)
+            text = text[:endpos] if isinstance(text, str) else memoryview(text)[:endpos]
+        budget = Budget.create(max_steps, timeout, cancel)
+        yield from Scanner(matcher, text, budget).matches(pos)
+
+    def findall(self, text: Haystack, **limits) -> list[Match]:
+        return list(self.finditer(text, **limits))
+
+    def is_match(self, text: Haystack, anchored: bool = False) -> bool:
+        """Whether the pattern matches at the start of `text` when `anchored`, or anywhere in it.
+        The DFA stops as soon as it reaches a match, without looking for where it starts or for
+        its groups."""
+        matcher, text = self.for_haystack(text)
+        if matcher.dfa is not None:
+            try:
+                return matcher.dfa.find_end(text, 0, anchored) is not None
+            except DFACacheThrashing:
+                pass
+        found = matcher.match(text) if anchored else matcher.search(text)
+        return found is not None
+
+    def scanner(self, text: Haystack, budget: Optional[Budget] = None) -> "Scanner":
+        """A `Scanner` over `text`, for searching it from any position"""
+        matcher, text = self.for_haystack(text)
+        return Scanner(matcher, text, budget)
+
+    def explain(self) -> str:
+        """How a search runs over the text: the engine, the start plan and the prefilter"""
+        plan = self.plan
+        lines = [f"engine: {self.engine}", f"start plan: {plan.kind}, {plan.reason}"]
+        prefilter = self.prefilter
+        if prefilter is None:
+            lines.append("prefilter: none")
         else:
-            if text_slice == captured:
-                return end_pos
-
-        return None
-
-    def _match_anchor(self, node: AnchorNode, pos: int) -> Optional[int]:
-        if node.anchor_type == "^":
-            if pos == 0:
-                return pos
-            if self.multiline and pos > 0 and self.text[pos-1] == "\n":
-                return pos
-            return None
-        elif node.anchor_type == "$":
-            print(node)
-            if pos == self.length:
-                return pos
-            if self.multiline and pos < self.length and self.text[pos] == '\n':
-                return pos
-            return None
-        elif node.anchor_type == "b":
-            before_is_word = pos > 0 and self.text[pos - 1] in self.word_chars
-            after_is_word = pos < self.length and self.text[pos] in self.word_chars
-
-            if before_is_word != after_is_word:
-                return pos
-            return None
-        elif node.anchor_type == "B":
-            before_is_word = pos > 0 and self.text[pos - 1] in self.word_chars
-            after_is_word = pos < self.length and self.text[pos] in self.word_chars
-
-            if before_is_word == after_is_word:
-                return pos
-            return None
-        return None
+            if prefilter.max_offset is None:
+                where = f"{prefilter.min_offset} or more"
+            elif prefilter.min_offset == prefilter.max_offset:
+                where = str(prefilter.min_offset)
+            else:
+                where = f"{prefilter.min_offset} to {prefilter.max_offset}"
+            line = f"prefilter: literal {prefilter.literal!r}, {where} characters after the start"
+            if plan.kind in (START, SUFFIX_WINDOW):
+                line += " (searches use the start plan instead)"
+            lines.append(line)
+        return "\n".join(lines)
 
-    def _match_lookahead(self, node: LookaheadNode, pos: int) -> Optional[int]:
-        end_pos = self._match_node(node.child, pos)
+    def count(self, text: Haystack, **limits) -> int:
+        """Number of non-overlapping matches in `text`"""
+        return sum(1 for _ in self.finditer(text, **limits))
 
-        matched = end_pos is not None
+    def first_n(self, text: Haystack, n: int, **limits) -> list[Match]:
+        """The first `n` matches in `text`, the search stops once they are found"""
+        return list(islice(self.finditer(text, **limits), n))
 
-        if matched == node.positive:
-            return pos
 
-        return None
+class Scanner:
+    """Searches one text from any position, for the modules that search windows of a larger
+    text or resume a search where they left it: streams and parallel workers. The text is
+    prepared for the prefilter once, on the first search, and the steps of every search are
+    charged to `budget`.
 
-    def _match_lookbehind(self, node: LookbehindNode, pos: int) -> Optional[int]:
-        found_match = False
+    `matcher` is the matcher for the kind of haystack `text` is, and `text` the haystack as its
+    engines index it, see `Matcher.scanner`."""
 
-        # Going backwards from the current position
-        for start in range(pos, -1, -1):
-            end_pos = self._match_node(node.child, start)
+    __slots__ = ("matcher", "text", "_budget", "_haystack", "_prepared")
 
-            if end_pos == pos:
-                found_match = True
-
-        if found_match == node.positive:
-            return pos
-        return None
\ No newline at end of file
+    def __init__(self, matcher: Matcher, text: Haystack, budget: Optional[Budget] = None):
+        self.matcher = matcher
+        self.text = text
+        self._budget = budget
+        self._haystack = None
+        self._prepared = False
+
+    def search(self, pos: int = 0) -> Optional[Match]:
+        """The leftmost match starting at or after `pos`"""
+        if not self._prepared:
+            self._haystack = self.matcher._haystack(self.text)
+            self._prepared = True
+        return self.matcher._search(self.text, pos, self._haystack, self._budget)
+
+    def matches(self, pos: int = 0, stop: Optional[int] = None) -> Iterator[Match]:
+        """Yields the non-overlapping matches from `pos` on that start before `stop` (anywhere by
+        default), the ones `finditer` finds after resuming at `pos`"""
+        stop = len(self.text) + 1 if stop is None else stop
+        while pos < stop:
+            # Searching from `pos` finds the same match as trying every start from `pos` onwards
+            match = self.search(pos)
+            if match is None or match.start >= stop:
+                return
+            yield match
+            pos = match.end if match.end > match.start else match.start + 1
@@ -0,0 +1,167 @@
+"""AST optimizer, run on the parser's tree before it is compiled.
+
+The parser builds a uniform tree: every alternation and every sequence gets a node, even with a
+single branch or item, so `abc` is three CharNodes in a ConcatNode in an AlternationNonde. This
+pass rewrites it into a smaller tree that matches exactly the same way:
+
+- single branch alternations, single item concats and non capturing groups are unwrapped, and
+  concats (alternations) nested directly in a concat (alternation) are flattened into it;
+- consecutive characters are merged into a LiteralNode;
+- a literal prefix shared by adjacent branches is factored out, `abc|abd` becomes `ab(?:c|d)`;
+- adjacent branches of a single character become one character class, `ab(?:c|d)` is `ab[cd]`;
+- atomic groups around something that matches in one way only, such as a literal, are unwrapped,
+  which leaves the pattern to the linear time engines when nothing else needs the backtracker.
+
+Branches are only merged or factored with their neighbours, and only on literal text, which can
+match in one way only. The order in which the alternatives are tried is unchanged, and so is the
+match found, captures included.
+"""
+
+from os.path import commonprefix
+
+from magnet_regex.ast_node import (
+    ASTNode,
+    AlternationNonde,
+    AnchorNode,
+    AtomicGroupNode,
+    CharClassNode,
+    CharNode,
+    ConcatNode,
+    DotNode,
+    GroupNode,
+    LiteralNode,
+    LookaheadNode,
+    LookbehindNode,
+    NonCapturingGroupNode,
+    PredefinedClassNode,
+    QuantifierNode,
+    format_tree,
+)
+
+# Nodes that can only match in one way at a given position, there is nothing to backtrack into
+_SINGLE_WAY = (AnchorNode, CharClassNode, CharNode, DotNode, LiteralNode, PredefinedClassNode)
+
+
+def optimize(node: ASTNode) -> ASTNode:
+    """Returns the optimized tree for `node`, which is left untouched"""
+    if isinstance(node, ConcatNode):
+        return _concat([optimize(child) for child in node.children])
+    elif isinstance(node, AlternationNonde):
+        return _alternation([optimize(alt) for alt in node.alternatives])
+    elif isinstance(node, NonCapturingGroupNode):
+        # Only there to group, which the tree does already
+        return optimize(node.child)
+    elif isinstance(node, QuantifierNode):
+        child = optimize(node.child)
+        if node.min_count == node.max_count == 1:
+            return _atomic(child) if node.possessive else child
+        return QuantifierNode(
+            child, node.min_count, node.max_count, node.greedy, node.possessive
+        )
+    elif isinstance(node, AtomicGroupNode):
+        return _atomic(optimize(node.child))
+    elif isinstance(node, GroupNode):
+        return GroupNode(optimize(node.child), node.group_number)
+    elif isinstance(node, (LookaheadNode, LookbehindNode)):
+        return type(node)(optimize(node.child), node.positive)
+    return node
+
+
+def debug_dump(node: ASTNode) -> str:
+    """The tree before and after the optimizations, for debugging"""
+    return f"before:\n{format_tree(node)}\nafter:\n{format_tree(optimize(node))}"
+
+
+def _atomic(child: ASTNode) -> ASTNode:
+    items = child.children if isinstance(child, ConcatNode) else [child]
+    if all(isinstance(item, _SINGLE_WAY) for item in items):
+        return child
+    return AtomicGroupNode(child)
+
+
+def _text(node: ASTNode):
+    """The text of a literal node, None for any other node"""
+    if isinstance(node, CharNode):
+        return node.char
+    elif isinstance(node, LiteralNode):
+        return node.text
+    return None
+
+
+def _literal(text: str) -> ASTNode:
+    if len(text) == 1:
+        return CharNode(text)
+    return LiteralNode(text) if text else ConcatNode([])
+
+
+def _concat(children: list[ASTNode]) -> ASTNode:
+    items: list[ASTNode] = []
+    for child in children:
+        for item in child.children if isinstance(child, ConcatNode) else [child]:
+            text = _text(item)
+            if text is not None and items and _text(items[-1]) is not None:
+                items[-1] = LiteralNode(_text(items[-1]) + text)
+            else:
+                items.append(item)
+    return items[0] if len(items) == 1 else ConcatNode(items)
+
+
+def _leading_text(node: ASTNode) -> str:
+    """The literal text `node` starts with"""
+    if isinstance(node, ConcatNode):
+        node = node.children[0] if node.children else node
+    return _text(node) or ""
+
+
+def _without_prefix(node: ASTNode, length: int) -> ASTNode:
+    """`node` minus the first `length` characters of its leading text"""
+    if isinstance(node, ConcatNode):
+        rest = _literal(_text(node.children[0])[length:])
+        return _concat([rest] + node.children[1:])
+    return _literal(_text(node)[length:])
+
+
+def _single_char(node: ASTNode) -> bool:
+    return isinstance(node, CharNode) or (isinstance(node, CharClassNode) and not node.negated)
+
+
+def _alternation(alternatives: list[ASTNode]) -> ASTNode:
+    branches: list[ASTNode] = []
+    for alt in alternatives:
+        branches.extend(alt.alternatives if isinstance(alt, AlternationNonde) else [alt])
+
+    # Factor the prefix shared by each run of adjacent branches that start with the same character
+    factored: list[ASTNode] = []
+    i = 0
+    while i < len(branches):
+        first = _leading_text(branches[i])[:1]
+        j = i + 1
+        while first and j < len(branches) and _leading_text(branches[j])[:1] == first:
+            j += 1
+        if j - i > 1:
+            prefix = commonprefix([_leading_text(branch) for branch in branches[i:j]])
+            tails = [_without_prefix(branch, len(prefix)) for branch in branches[i:j]]
+            factored.append(_concat([_literal(prefix), _alternation(tails)]))
+        else:
+            factored.append(branches[i])
+        i = j
+
+    # Merge runs of single character branches into a class
+    merged: list[ASTNode] = []
+    for branch in factored:
+        if _single_char(branch) and merged and _single_char(merged[-1]):
+            merged[-1] = _union(merged[-1], branch)
+        else:
+            merged.append(branch)
+    return merged[0] if len(merged) == 1 else AlternationNonde(merged)
+
+
+def _union(a: ASTNode, b: ASTNode) -> CharClassNode:
+    chars, ranges = set(), []
+    for node in (a, b):
+        if isinstance(node, CharNode):
+            chars.add(node.char)
+        else:
+            chars |= node.chars
+            ranges += node.ranges
+    return CharClassNode(chars, False, ranges)
@@ -0,0 +1,308 @@
+"""Matching on several CPU cores: one large text split into chunks, or many small texts.
+
+For `finditer_parallel`, the text is copied once into a `multiprocessing.shared_memory` block,
+which every worker of a process pool attaches to, so nothing large is pickled. It is split into
+chunks of start offsets, and each worker reports the matches that start in its chunk. It reads a
+window of the text around the chunk: the characters lookbehinds and anchors need before it, and
+after it the pattern's maximum width, lookaheads included, plus one for `$` and `\\b`. A match
+starting in the chunk is therefore found exactly as in the whole text.
+
+A worker searches its chunk from its first offset, while the sequential search may resume further
+on, after a match that crossed the boundary. Matches are merged in order: the ones starting before
+where the sequential search resumes are dropped, and when a worker started searching past that
+point, the few matches in between are found again by a search over the whole text. The result is
+the same as `Matcher.finditer`.
+
+Patterns without a maximum width (`.*`, `\\d+`, backreferences, unbounded lookbehinds) cannot be
+split that way, a match may need any amount of the text past its chunk. They are searched
+sequentially, in the calling process, and so are texts smaller than two chunks.
+
+Strings are stored as Latin-1 when they can be, with one byte per character, and as UTF-32
+otherwise, so that a window of characters is a slice of bytes. Binary haystacks are stored as is.
+
+`match_many` and `search_many` run the pattern over each text of an iterable, such as the records
+of a file. The records are sent to the workers in batches, a few batches ahead of the results
+being read, so the iterable can be longer than what fits in memory. Each worker builds its matcher
+once and reuses it for every record. Asking for booleans or spans rather than matches skips the
+work matches need: a boolean only needs the DFA to reach a match, and a span never runs the
+capture engine.
+
+The workers are started fresh rather than forked, so a script calling any of this needs the usual
+`if __name__ == "__main__":` guard of `multiprocessing`.
+"""
+
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from multiprocessing.shared_memory import SharedMemory
+from typing import Iterable, Iterator, Optional, Union
+
+from magnet_regex.ast_node import ASTNode, LookbehindNode, walk
+from magnet_regex.compiler import width
+from magnet_regex.matcher import Haystack, Match, Matcher, Scanner
+from magnet_regex.stream import scan_window
+
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+DEFAULT_BATCH_SIZE = 1024
+# What `match_many` and `search_many` report for each record
+OUTPUTS = ("match", "span", "bool")
+# Batches sent to the workers ahead of the one being read, per worker
+BATCHES_AHEAD = 2
+
+Result = Union[Optional[Match], Optional[tuple[int, int]], bool]
+
+# The state of a worker process, set by `_attach`
+_worker: dict = {}
+
+
+def _start_method() -> str:
+    """Workers are not forked from the caller, which may be running threads of its own"""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return "forkserver"
+    return "spawn"
+
+
+def is_bounded(matcher: Matcher) -> bool:
+    """Whether the pattern looks at a bounded number of characters around a match, which is what
+    splitting the text needs"""
+    if width(matcher.ast, lookaheads=True)[1] is None:
+        return False
+    return all(
+        width(node.child)[1] is not None
+        for node in walk(matcher.ast)
+        if isinstance(node, LookbehindNode)
+    )
+
+
+def _encode(text: str) -> tuple[bytes, str]:
+    """The bytes stored for `text` and the codec that reads them back, one character per byte
+    when possible, four otherwise"""
+    try:
+        return text.encode("latin-1"), "latin-1"
+    except UnicodeEncodeError:
+        return text.encode("utf-32-le"), "utf-32-le"
+
+
+def _attach(ast: ASTNode, flags: dict[str, bool], name: str, codec: Optional[str]):
+    """Pool initializer: attaches to the shared text and builds the worker's matcher once"""
+    _worker["memory"] = SharedMemory(name)
+    _worker["matcher"] = Matcher(ast, flags, binary=codec is None)
+    _worker["codec"] = codec
+
+
+def _scan_chunk(job: tuple[int, int, int, int]) -> list[list[int]]:
+    """Runs in a worker. Returns the capture slots, as offsets in the whole text, of the matches
+    found by searching from `start` that start before `stop`, reading text[low:high] only."""
+    low, start, stop, high = job
+    matcher, codec = _worker["matcher"], _worker["codec"]
+    buffer = _worker["memory"].buf
+    if codec is None:
+        window = buffer[low:high]
+    else:
+        size = 1 if codec == "latin-1" else 4
+        window = str(buffer[low * size : high * size], codec)
+
+    # The groups are computed here rather than in the parent
+    matches = matcher.scanner(window).matches(start - low, stop - low)
+    return [match.shifted(low).slots() for match in matches]
+
+
+def _catch_up(scanner: Scanner, pos: int, limit: int) -> Iterator[Match]:
+    """Yields the matches the sequential search finds from `pos` that start before `limit`.
+    Returns where it resumes, at least `limit`."""
+    for match in scanner.matches(pos, limit):
+        yield match
+        pos = match.end if match.end > match.start else match.start + 1
+    return max(pos, limit)
+
+
+def finditer_parallel(
+    matcher: Matcher,
+    text: Haystack,
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[Match]:
+    """Yields the same matches as `matcher.finditer(text)`, searched by `workers` processes
+    (one per CPU by default) over chunks of `chunk_size` offsets"""
+    if chunk_size <= 0:
+        raise ValueError(f"Chunk size must be positive, got {chunk_size}")
+    if workers is not None and workers <= 0:
+        raise ValueError(f"Number of workers must be positive, got {workers}")
+    workers = workers or os.cpu_count() or 1
+
+    matcher, text = matcher.for_haystack(text)
+    length = len(text)
+    if workers == 1 or length < 2 * chunk_size or not is_bounded(matcher):
+        yield from matcher.finditer(text)
+        return
+
+    ahead, behind = scan_window(matcher, 0)
+    codec = None
+    if isinstance(text, str):
+        data, codec = _encode(text)
+    else:
+        data = memoryview(text)
+    # Matches can start at the end of the text too
+    bounds = list(range(0, length + 1, chunk_size)) + [length + 1]
+    jobs = [
+        (max(0, start - behind), start, stop, min(length, stop - 1 + ahead))
+        for start, stop in zip(bounds, bounds[1:])
+    ]
+
+    # Also searches what the workers leave between their chunks
+    scanner = Scanner(matcher, text)
+    memory = SharedMemory(create=True, size=max(1, len(data)))
+    pool = None
+    try:
+        memory.buf[: len(data)] = data
+        del data
+        initargs = (matcher.ast, matcher.flags, memory.name, codec)
+        context = multiprocessing.get_context(_start_method())
+        pool = ProcessPoolExecutor(
+            workers, mp_context=context, initializer=_attach, initargs=initargs
+        )
+        pos = 0
+        for (_, start, stop, _), found in zip(jobs, pool.map(_scan_chunk, jobs)):
+            # Where the worker searched from, and resumed after each of its matches
+            resumed = start
+            for slots in found:
+                if pos < resumed:
+                    pos = yield from _catch_up(scanner, pos, resumed)
+                if slots[0] >= pos:
+                    match = Match(text, slots)
+                    yield match
+                    pos = match.end if match.end > match.start else match.start + 1
+                resumed = slots[1] if slots[1] > slots[0] else slots[0] + 1
+
+            # The worker found nothing else before `stop`
+            if pos < resumed:
+                pos = yield from _catch_up(scanner, pos, resumed)
+            pos = max(pos, stop)
+    finally:
+        # A caller that stops iterating early doesn't wait for the chunks left
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        memory.close()
+        memory.unlink()
+
+
+def _match_batch(matcher: Matcher, records: list[Haystack], anchored: bool, output: str) -> list:
+    """Runs the pattern over each record, anchored at its start or searching it, and returns a
+    Match (None without one), a span or a boolean for each"""
+    if output == "bool":
+        return [matcher.is_match(record, anchored) for record in records]
+    find = matcher.match if anchored else matcher.search
+    matches = map(find, records)
+    if output == "span":
+        return [None if match is None else match.span() for match in matches]
+    return list(matches)
+
+
+def _start_batches(ast: ASTNode, flags: dict[str, bool]):
+    """Pool initializer for `match_many` and `search_many`"""
+    _worker["matcher"] = Matcher(ast, flags)
+
+
+def _run_batch(job: tuple[list[Haystack], bool, str]) -> list:
+    """Runs in a worker. Matches are sent back as their capture slots, computed here."""
+    records, anchored, output = job
+    results = _match_batch(_worker["matcher"], records, anchored, output)
+    if output == "match":
+        return [None if match is None else match.slots() for match in results]
+    return results
+
+
+def _many(
+    matcher: Matcher,
+    records: Iterable[Haystack],
+    anchored: bool,
+    workers: Optional[int],
+    chunksize: int,
+    output: str,
+) -> Iterator[Result]:
+    # Checked before the first result is asked for
+    if chunksize <= 0:
+        raise ValueError(f"Chunk size must be positive, got {chunksize}")
+    if workers is not None and workers <= 0:
+        raise ValueError(f"Number of workers must be positive, got {workers}")
+    if output not in OUTPUTS:
+        raise ValueError(f"Unknown output {output!r}, expected one of {OUTPUTS}")
+    workers = workers or os.cpu_count() or 1
+    return _many_results(matcher, iter(records), anchored, workers, chunksize, output)
+
+
+def _many_results(
+    matcher: Matcher,
+    records: Iterator[Haystack],
+    anchored: bool,
+    workers: int,
+    chunksize: int,
+    output: str,
+) -> Iterator[Result]:
+    batches = iter(lambda: list(islice(records, chunksize)), [])
+    if workers == 1:
+        for batch in batches:
+            yield from _match_batch(matcher, batch, anchored, output)
+        return
+
+    context = multiprocessing.get_context(_start_method())
+    pool = ProcessPoolExecutor(
+        workers,
+        mp_context=context,
+        initializer=_start_batches,
+        initargs=(matcher.ast, matcher.flags),
+    )
+    try:
+        pending: deque = deque()
+        for batch in batches:
+            future = pool.submit(_run_batch, (batch, anchored, output))
+            # The records are only kept to rebuild the matches over them
+            pending.append((batch if output == "match" else None, future))
+            if len(pending) < BATCHES_AHEAD * workers:
+                continue
+            yield from _results(matcher, *pending.popleft(), output)
+        while pending:
+            yield from _results(matcher, *pending.popleft(), output)
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def _results(
+    matcher: Matcher, batch: Optional[list[Haystack]], future, output: str
+) -> list[Result]:
+    results = future.result()
+    if output != "match":
+        return results
+    # Rebuilt over the records of the batch, which were only copied to the worker
+    return [
+        None if slots is None else Match(matcher.for_haystack(record)[1], slots)
+        for record, slots in zip(batch, results)
+    ]
+
+
+def match_many(
+    matcher: Matcher,
+    records: Iterable[Haystack],
+    workers: Optional[int] = None,
+    chunksize: int = DEFAULT_BATCH_SIZE,
+    output: str = "match",
+) -> Iterator[Result]:
+    """Yields, in order, the match of the pattern at the start of each record, or None. With
+    `output` "span" or "bool", the span of the match (None without one) or whether there is one.
+    Records are matched by `workers` processes (one per CPU by default), `chunksize` at a time,
+    and in the calling process with one worker. Records sent to a process must be picklable:
+    str, bytes or bytearray."""
+    return _many(matcher, records, True, workers, chunksize, output)
+
+
+def search_many(
+    matcher: Matcher,
+    records: Iterable[Haystack],
+    workers: Optional[int] = None,
+    chunksize: int = DEFAULT_BATCH_SIZE,
+    output: str = "match",
+) -> Iterator[Result]:
+    """Like `match_many`, with the leftmost match anywhere in each record"""
+    return _many(matcher, records, False, workers, chunksize, output)
@@ -1,4 +1,5 @@
-import sys
+import string
+from typing import Optional
 from magnet_regex.lexer import Token, TokenType
 from magnet_regex.ast_node import *
 
@@ -87,18 +88,21 @@ class Parser:
 
         if token.t_type == TokenType.STAR:
             self.advance()
-            greedy = self._check_lazy_modifier()
-            return QuantifierNode(atom, 0, None, greedy)
+            greedy = not self._check_lazy_modifier()
+            possessive = greedy and self._check_possessive_modifier()
+            return QuantifierNode(atom, 0, None, greedy, possessive)
         elif token.t_type == TokenType.PLUS:
             self.advance()
-            greedy = self._check_lazy_modifier()
-            return QuantifierNode(atom, 1, None, greedy)
+            greedy = not self._check_lazy_modifier()
+            possessive = greedy and self._check_possessive_modifier()
+            return QuantifierNode(atom, 1, None, greedy, possessive)
         elif token.t_type == TokenType.QUESTION:
             self.advance()
-            greedy = self._check_lazy_modifier()
-            return QuantifierNode(atom, 0, 1, greedy)
+            greedy = not self._check_lazy_modifier()
+            possessive = greedy and self._check_possessive_modifier()
+            return QuantifierNode(atom, 0, 1, greedy, possessive)
         # Handling range quantifiers
-        elif token.t_type == TokenType.RBRACE:
+        elif token.t_type == TokenType.LBRACE:
             return self._parse_range_quantifier(atom)
 
         return atom
@@ -110,18 +114,36 @@ class Parser:
             return True
         return False
 
+    def _check_possessive_modifier(self) -> bool:
+        """Checks whether or not we have the possessive modifier: +"""
+        if self.current_token().t_type == TokenType.POSSESSIVE:
+            self.advance()
+            return True
+        return False
+
+    def _parse_number(self) -> Optional[int]:
+        """Consume consecutive digit tokens and return their value, or None if the current token
+        is not a digit"""
+        digits = ""
+        while True:
+            token = self.current_token()
+            if token.t_type != TokenType.CHAR or not token.value.isdigit():
+                break
+            digits += token.value
+            self.advance()
+
+        return int(digits) if digits else None
 
     def _parse_range_quantifier(self, atom: ASTNode) -> QuantifierNode:
-        self.expect(TokenType.RBRACE)
+        self.expect(TokenType.LBRACE)
 
         token = self.current_token()
+        min_count = self._parse_number()
         # Range quantifiers can only be digits, otherwise return an error
-        if token.t_type != TokenType.CHAR or not token.value.isdigit():
+        if min_count is None:
             raise ValueError(
                 f"Expected number in quantifier at position {token.position}"
             )
-        min_count = int(token.value)
-        self.advance()
         # Default in case we do not have a comma, making this only an exact quantifier match
         max_count = min_count
 
@@ -131,19 +153,25 @@ class Parser:
             token = self.current_token()
 
             if token.t_type == TokenType.RBRACE:
-                max_count = sys.maxsize
-            elif token.t_type == TokenType.CHAR and token.value.isdigit:
-                max_count = int(token.value)
-                self.advance()
+                # Unbounded, same as `*` and `+`
+                max_count = None
             else:
-                raise ValueError(
-                    f"Expected number of '}}' at position {token.position}"
-                )
+                max_count = self._parse_number()
+                if max_count is None:
+                    raise ValueError(
+                        f"Expected number of '}}' at position {token.position}"
+                    )
+                if max_count < min_count:
+                    raise ValueError(
+                        f"Invalid quantifier range {{{min_count},{max_count}}} at position "
+                        f"{token.position}"
+                    )
 
         self.expect(TokenType.RBRACE)
         greedy = not self._check_lazy_modifier()
+        possessive = greedy and self._check_possessive_modifier()
 
-        node = QuantifierNode(atom, min_count, max_count, greedy)
+        node = QuantifierNode(atom, min_count, max_count, greedy, possessive)
 
         return node
 
@@ -189,7 +217,7 @@ class Parser:
             return PredefinedClassNode("S")
         elif token.t_type == TokenType.BACKREF:
             self.advance()
-            return BackreferenceNode(int(token.value))
+            return BackreferenceNode(int(token.value[1:]))
         elif token.t_type == TokenType.LBRACKET:
             # We have a charcter class
             return self._parse_char_class()
@@ -198,6 +226,8 @@ class Parser:
             return self._parse_group()
         elif token.t_type == TokenType.NON_CAPTURING:
             return self._parse_non_capturing_group()
+        elif token.t_type == TokenType.ATOMIC:
+            return self._parse_atomic_group()
         elif token.t_type == TokenType.LOOKAHEAD_POS:
             return self._parse_lookahead(positive=True)
         elif token.t_type == TokenType.LOOKAHEAD_NEG:
@@ -221,6 +251,7 @@ class Parser:
             self.advance()
 
         chars = set()
+        ranges = []
 
         while self.current_token().t_type != TokenType.RBRACKET:
             token = self.current_token()
@@ -229,7 +260,7 @@ class Parser:
             if token.t_type == TokenType.EOF:
                 raise ValueError("Unclosed character class")
 
-            if token.type == TokenType.CHAR:
+            if token.t_type == TokenType.CHAR:
                 char = token.value
                 self.advance()
 
@@ -242,22 +273,13 @@ class Parser:
                         end_char = self.current_token().value
                         self.advance()
 
-                        # We add each character in that range into the set
-                        start_ord = ord(char)
-                        end_ord = ord(end_char)
-
                         # Check if the range is valid
-                        if start_ord > end_ord:
+                        if ord(char) > ord(end_char):
                             raise ValueError(
                                 f"Invalid range {char}-{end_char}: start > end"
                             )
-                        if start_ord < 0 or start_ord > 255:
-                            raise ValueError(f"Invalid ASCII {char} -> {start_ord}")
-                        if end_ord < 0 or end_ord > 255:
-                            raise ValueError(f"Invalid ASCII {end_char} -> {end_ord}")
-
-                        for code in range(start_ord, end_ord + 1):
-                            chars.add(chr(code))
+                        # Any code points, the compiler turns large ranges into a range table
+                        ranges.append((char, end_char))
                     else:
                         # We treat both the character and the dash `-` as  literals
                         chars.add(char)
@@ -270,13 +292,7 @@ class Parser:
                 chars.update("0123456789")
             elif token.t_type == TokenType.WORD:
                 self.advance()
-                lowercase_letters = [
-                    "".join([chr(l) for l in range(ord("a"), ord("z") + 1)])
-                ]
-                uppercase_letters = [
-                    "".join([chr(l) for l in range(ord("A"), ord("Z") + 1)])
-                ]
-                chars.update(lowercase_letters + uppercase_letters + ["0123456789_"])
+                chars.update(string.ascii_letters + string.digits + "_")
             elif token.t_type == TokenType.WHITESPACE:
                 self.advance()
                 chars.update(" \t\n\r\f\v")
@@ -286,6 +302,7 @@ class Parser:
             # Inside a character calls, all these are literals
             elif token.t_type in (
                 TokenType.PLUS,
+                TokenType.POSSESSIVE,
                 TokenType.STAR,
                 TokenType.QUESTION,
                 TokenType.DOT,
@@ -298,7 +315,7 @@ class Parser:
                 TokenType.RPAREN,
             ):
                 self.advance()
-                chars.add(char)
+                chars.add(token.value)
             else:
                 raise ValueError(
                     f"Unexpected token {token.t_type} in character class at position {self.pos}"
@@ -306,9 +323,9 @@ class Parser:
 
         self.expect(TokenType.RBRACKET)
 
-        if not chars:
+        if not chars and not ranges:
             raise ValueError("Empty character class")
-        return CharClassNode(chars, negated)
+        return CharClassNode(chars, negated, ranges)
 
     def _parse_group(self) -> GroupNode:
         self.expect(TokenType.LPAREN)
@@ -330,6 +347,12 @@ class Parser:
         self.expect(TokenType.RPAREN)
         return NonCapturingGroupNode(child)
 
+    def _parse_atomic_group(self) -> AtomicGroupNode:
+        self.advance()
+        child = self.parse_alternation()
+        self.expect(TokenType.RPAREN)
+        return AtomicGroupNode(child)
+
     def _parse_lookahead(self, positive: bool) -> LookaheadNode:
         self.advance()
         child = self.parse_alternation()
@@ -353,6 +376,6 @@ class Parser:
 
     def peek_token(self, offset: int = 1) -> Token:
         offset_pos = self.pos + offset
-        if offset >= len(self.tokens):
+        if offset_pos >= len(self.tokens):
             return self.tokens[-1]
         return self.tokens[offset_pos]
@@ -0,0 +1,294 @@
+"""Compiled patterns and the module level API.
+
+`compile(pattern, flags)` runs the Lexer -> Parser -> Matcher pipeline once and returns a `Pattern`
+that can be reused. Compiled patterns are kept in a thread safe LRU cache keyed on (pattern,
+flags), so services that rebuild the same patterns on every request only pay for it once. The
+`search` / `match` / `findall` / `finditer` shortcuts go through the same cache.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Iterable, Iterator, Optional, TextIO
+
+from magnet_regex.instrument import Profile
+from magnet_regex.lexer import Lexer
+from magnet_regex.matcher import Haystack, Match, Matcher
+from magnet_regex.parallel import DEFAULT_BATCH_SIZE
+from magnet_regex.parallel import DEFAULT_CHUNK_SIZE as DEFAULT_PARALLEL_CHUNK_SIZE
+from magnet_regex.parallel import Result, finditer_parallel, match_many, search_many
+from magnet_regex.parser import Parser
+from magnet_regex.stream import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_MAX_MATCH_LENGTH,
+    Source,
+    finditer_stream,
+)
+
+FLAG_NAMES = ("ignorecase", "multiline", "dotall", "unbounded_lookbehind")
+
+DEFAULT_CACHE_SIZE = 512
+
+
+def _normalize_flags(flags: Optional[dict[str, bool]]) -> tuple[str, ...]:
+    """Returns the enabled flags, sorted, so that equivalent dicts share a cache entry"""
+    if not flags:
+        return ()
+    unknown = set(flags) - set(FLAG_NAMES)
+    if unknown:
+        raise ValueError(f"Unknown flags {sorted(unknown)}, expected some of {FLAG_NAMES}")
+    return tuple(sorted(name for name, enabled in flags.items() if enabled))
+
+
+class Pattern:
+    """A compiled regular expression"""
+
+    def __init__(self, pattern: str, flags: Optional[dict[str, bool]] = None):
+        self.pattern = pattern
+        self.flags = {name: True for name in _normalize_flags(flags)}
+
+        parser = Parser(Lexer(pattern).tokenize())
+        self.ast = parser.parse()
+        self.groups = parser.group_counter
+
+        # The engines keep scratch state (Pike VM marks, the DFA cache) while they run, so every
+        # thread gets its own Matcher over the shared AST
+        self._local = threading.local()
+        self._matcher()
+
+    def _matcher(self) -> Matcher:
+        matcher = getattr(self._local, "matcher", None)
+        if matcher is None:
+            matcher = Matcher(self.ast, self.flags)
+            self._local.matcher = matcher
+        return matcher
+
+    @property
+    def engine(self) -> str:
+        return self._matcher().engine
+
+    # `limits` are the `max_steps`, `timeout` and `cancel` keywords of the Matcher methods
+
+    def match(self, text: Haystack, start: int = 0, **limits) -> Optional[Match]:
+        return self._matcher().match(text, start, **limits)
+
+    def search(self, text: Haystack, **limits) -> Optional[Match]:
+        return self._matcher().search(text, **limits)
+
+    def finditer(
+        self, text: Haystack, pos: int = 0, endpos: Optional[int] = None, **limits
+    ) -> Iterator[Match]:
+        return self._matcher().finditer(text, pos, endpos, **limits)
+
+    def findall(self, text: Haystack, **limits) -> list[Match]:
+        return self._matcher().findall(text, **limits)
+
+    def count(self, text: Haystack, **limits) -> int:
+        return self._matcher().count(text, **limits)
+
+    def first_n(self, text: Haystack, n: int, **limits) -> list[Match]:
+        return self._matcher().first_n(text, n, **limits)
+
+    def finditer_parallel(
+        self,
+        text: Haystack,
+        workers: Optional[int] = None,
+        chunk_size: int = DEFAULT_PARALLEL_CHUNK_SIZE,
+    ) -> Iterator[Match]:
+        """Yields the same matches as `finditer`, searched by a pool of processes over chunks of
+        the text, see `parallel.py`"""
+        return finditer_parallel(self._matcher(), text, workers, chunk_size)
+
+    def findall_parallel(
+        self,
+        text: Haystack,
+        workers: Optional[int] = None,
+        chunk_size: int = DEFAULT_PARALLEL_CHUNK_SIZE,
+    ) -> list[Match]:
+        return list(self.finditer_parallel(text, workers, chunk_size))
+
+    def match_many(
+        self,
+        records: Iterable[Haystack],
+        workers: Optional[int] = None,
+        chunksize: int = DEFAULT_BATCH_SIZE,
+        output: str = "match",
+    ) -> Iterator[Result]:
+        """Yields the result of `match` on each record, in order, computed by a pool of processes.
+        `output` "span" or "bool" reports only the span or whether there is a match, see
+        `parallel.py`."""
+        return match_many(self._matcher(), records, workers, chunksize, output)
+
+    def search_many(
+        self,
+        records: Iterable[Haystack],
+        workers: Optional[int] = None,
+        chunksize: int = DEFAULT_BATCH_SIZE,
+        output: str = "match",
+    ) -> Iterator[Result]:
+        """Like `match_many`, with the result of `search` on each record"""
+        return search_many(self._matcher(), records, workers, chunksize, output)
+
+    def match_array(self, values, output: str = "match"):
+        """Matches every row of a NumPy array or Arrow-like column, with the rows that cannot
+        match ruled out by vectorized prefilters, see `columnar.py`. Needs NumPy."""
+        # Imported here, so that NumPy is only needed by the code that uses it
+        from magnet_regex.columnar import match_array
+
+        return match_array(self._matcher(), values, output)
+
+    def search_array(self, values, output: str = "match"):
+        """Like `match_array`, with the result of `search` on each row"""
+        from magnet_regex.columnar import search_array
+
+        return search_array(self._matcher(), values, output)
+
+    def explain(self) -> str:
+        """The engine, start plan and prefilter searches use, see `Matcher.explain`"""
+        return self._matcher().explain()
+
+    def finditer_stream(
+        self,
+        source: Source,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_match_length: int = DEFAULT_MAX_MATCH_LENGTH,
+        encoding: str = "utf-8",
+    ) -> Iterator[Match]:
+        """Yields the matches over a file object or an iterator of chunks, see `stream.py`"""
+        return finditer_stream(self._matcher(), source, chunk_size, max_match_length, encoding)
+
+    def __repr__(self):
+        if self.flags:
+            return f"Pattern({self.pattern!r}, {self.flags!r})"
+        return f"Pattern({self.pattern!r})"
+
+
+class PatternCache:
+    """Least recently used cache of compiled patterns, safe to share between threads"""
+
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE):
+        if max_size < 0:
+            raise ValueError(f"Cache size must be positive, got {max_size}")
+        self.max_size = max_size
+        self._entries: OrderedDict[tuple, Pattern] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, pattern: str, flags: Optional[dict[str, bool]] = None) -> Pattern:
+        key = (pattern, _normalize_flags(flags))
+
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return compiled
+            self.misses += 1
+
+        # Compiled outside the lock, so a slow pattern doesn't block the other threads. Two
+        # threads may compile the same pattern at once, the first one to finish wins.
+        compiled = Pattern(pattern, flags)
+
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None:
+                self._entries.move_to_end(key)
+                return existing
+            if self.max_size > 0:
+                self._entries[key] = compiled
+                self._evict()
+        return compiled
+
+    def resize(self, max_size: int):
+        if max_size < 0:
+            raise ValueError(f"Cache size must be positive, got {max_size}")
+        with self._lock:
+            self.max_size = max_size
+            self._evict()
+
+    def purge(self):
+        """Drops every cached pattern, the counters are kept"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+            }
+
+    def _evict(self):
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_cache = PatternCache()
+
+
+def compile(pattern: str, flags: Optional[dict[str, bool]] = None) -> Pattern:
+    """Returns the compiled `pattern`, from the cache when it was compiled before"""
+    return _cache.get(pattern, flags)
+
+
+def match(
+    pattern: str, text: Haystack, flags: Optional[dict[str, bool]] = None, **limits
+) -> Optional[Match]:
+    return compile(pattern, flags).match(text, **limits)
+
+
+def search(
+    pattern: str, text: Haystack, flags: Optional[dict[str, bool]] = None, **limits
+) -> Optional[Match]:
+    return compile(pattern, flags).search(text, **limits)
+
+
+def findall(
+    pattern: str, text: Haystack, flags: Optional[dict[str, bool]] = None, **limits
+) -> list[Match]:
+    return compile(pattern, flags).findall(text, **limits)
+
+
+def finditer(
+    pattern: str, text: Haystack, flags: Optional[dict[str, bool]] = None, **limits
+) -> Iterator[Match]:
+    return compile(pattern, flags).finditer(text, **limits)
+
+
+def profile(
+    pattern: str,
+    text: Haystack,
+    flags: Optional[dict[str, bool]] = None,
+    top: int = 10,
+    file: Optional[TextIO] = None,
+    **limits,
+) -> Profile:
+    """Finds every match of `pattern` in `text` with an instrumented matcher, prints the pattern
+    with its `top` hot spots marked to `file` (standard output by default), and returns the
+    profile, see `instrument.py`"""
+    compiled = compile(pattern, flags)
+    collected = Profile()
+    matcher = Matcher(compiled.ast, compiled.flags, profile=collected)
+    for _ in matcher.finditer(text, **limits):
+        pass
+    print(collected.report(top), file=file)
+    return collected
+
+
+def purge():
+    """Clears the cache of compiled patterns"""
+    _cache.purge()
+
+
+def set_cache_size(max_size: int):
+    """Changes how many compiled patterns are kept, 0 disables the cache"""
+    _cache.resize(max_size)
+
+
+def cache_stats() -> dict[str, int]:
+    return _cache.stats()
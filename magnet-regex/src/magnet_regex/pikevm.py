@@ -0,0 +1,276 @@
+"""Pike VM: runs the compiled program over the text, one position at a time.
+
+All the live threads advance in lockstep, each carrying its own capture slots. Threads are kept in
+priority order and an instruction is entered at most once per position, so the running time is
+bounded by O(len(program) x len(text)), no matter how ambiguous the pattern is. Inside loops whose
+body can match the empty string, an instruction is entered once per position for each set of
+loop iterations that started there, see CHECK. That multiplies the bound by the number of sets of
+such loops nested at the instruction: at most 2 to the power of their nesting depth.
+"""
+
+from typing import Optional
+
+from magnet_regex.budget import NEVER, Budget
+from magnet_regex.compiler import (
+    ASSERT,
+    CHAR,
+    CHECK,
+    JMP,
+    LOOK,
+    MARK,
+    MATCH,
+    SAVE,
+    SET,
+    SPLIT,
+    Program,
+    accepts,
+)
+
+
+class PikeVM:
+    def __init__(self, program: Program, flags: Optional[dict[str, bool]] = None):
+        self.program = program
+        self.flags = flags or {}
+        self.multiline = self.flags.get("multiline", False)
+        self.newline = program.newline
+        self.word_chars = program.word_chars
+        # Generation marks, one per instruction. An instruction is already on the list being
+        # built when its mark equals the current generation.
+        self._marks = [0] * len(program)
+        # The same for an instruction reached inside loop iterations that consumed nothing yet,
+        # by (pc, MARK registers) since where it goes from there depends on them
+        self._empty_marks: dict[tuple[int, int], int] = {}
+        self._generation = 0
+        # The budget of the current call, also charged by the lookaround bodies it runs
+        self._budget: Optional[Budget] = None
+
+    def match(
+        self,
+        text: str,
+        start: int = 0,
+        budget: Optional[Budget] = None,
+        end: Optional[int] = None,
+    ) -> Optional[list[int]]:
+        """Runs the program anchored at `start`. Returns the capture slots of the match, where
+        unset slots are -1, or None. With `end`, where a DFA found that the match ends, nothing
+        past it is read except by the assertions."""
+        self._budget = budget
+        return self._run(
+            self.program.start, self.program.slot_count, text, start, anchored=True, end=end
+        )
+
+    def search(
+        self, text: str, start: int = 0, budget: Optional[Budget] = None
+    ) -> Optional[list[int]]:
+        """Finds the leftmost match starting at or after `start`"""
+        self._budget = budget
+        return self._run(self.program.start, self.program.slot_count, text, start, anchored=False)
+
+    def _next_generation(self) -> int:
+        self._generation += 1
+        return self._generation
+
+    def _run(
+        self,
+        entry: int,
+        slot_count: int,
+        text: str,
+        start: int,
+        anchored: bool,
+        end: Optional[int] = None,
+    ) -> Optional[list[int]]:
+        ops = self.program.ops
+        args = self.program.args
+        newline = self.newline
+        length = len(text)
+        # The threads stop consuming here
+        stop = length if end is None else end
+        matched = None
+        pos = start
+        budget = self._budget
+        # Thread steps since the last report to the budget, and how many it allows before the next
+        steps = 0
+        grant = budget.grant() if budget is not None else NEVER
+
+        threads: list[tuple[int, list[int]]] = []
+        generation = self._next_generation()
+
+        while True:
+            # A new thread for a match starting here has the lowest priority, so it goes after
+            # the threads carried over from earlier starts. Once a match was found, no later start
+            # can be leftmost anymore.
+            if matched is None and (not anchored or pos == start):
+                self._add_thread(threads, generation, entry, [-1] * slot_count, text, pos)
+
+            if not threads:
+                if matched is not None or anchored or pos >= stop:
+                    break
+                # Instructions rejected by an assertion at this position were marked as well
+                generation = self._next_generation()
+                pos += 1
+                continue
+
+            next_threads: list[tuple[int, list[int]]] = []
+            next_generation = self._next_generation()
+            char = text[pos] if pos < stop else None
+            steps += len(threads)
+            if steps >= grant:
+                grant = budget.charge(steps, pos)
+                steps = 0
+
+            for pc, slots in threads:
+                op = ops[pc]
+
+                if op == MATCH:
+                    matched = slots
+                    # Every thread after this one has a lower priority, cut them off
+                    break
+
+                if char is None:
+                    continue
+
+                if op == CHAR:
+                    accepted = char == args[pc]
+                elif op == SET:
+                    chars, negated = args[pc]
+                    accepted = (char in chars) != negated
+                else:
+                    accepted = args[pc] or char != newline
+
+                if accepted:
+                    self._add_thread(next_threads, next_generation, pc + 1, slots, text, pos + 1)
+
+            if pos >= stop:
+                break
+
+            threads = next_threads
+            generation = next_generation
+            pos += 1
+
+        if budget is not None:
+            budget.charge(steps, pos)
+        return matched
+
+    def _add_thread(
+        self,
+        threads: list[tuple[int, list[int]]],
+        generation: int,
+        pc: int,
+        slots: list[int],
+        text: str,
+        pos: int,
+    ):
+        """Follows the epsilon instructions from `pc` and appends every reached consuming or
+        accepting instruction to `threads`, in priority order"""
+        program = self.program
+        ops = program.ops
+        marks = self._marks
+        empty_marks = self._empty_marks
+        # Along with each instruction, the bits of the MARK registers of the loop iterations that
+        # started at this position: a CHECK of one of them ends an iteration that consumed nothing
+        stack = [(pc, slots, 0)]
+
+        while stack:
+            pc, slots, empty = stack.pop()
+
+            if empty:
+                if empty_marks.get((pc, empty)) == generation:
+                    continue
+                empty_marks[(pc, empty)] = generation
+            elif marks[pc] == generation:
+                continue
+            else:
+                marks[pc] = generation
+
+            op = ops[pc]
+            if op == SPLIT:
+                # Pushed in reverse, so that `x` is explored first
+                stack.append((program.y[pc], slots, empty))
+                stack.append((program.x[pc], slots, empty))
+            elif op == JMP:
+                stack.append((program.x[pc], slots, empty))
+            elif op == SAVE:
+                # Lookaround bodies run without slots
+                if slots:
+                    slots = slots[:]
+                    slots[program.args[pc]] = pos
+                stack.append((pc + 1, slots, empty))
+            elif op == MARK:
+                stack.append((pc + 1, slots, empty | 1 << program.args[pc]))
+            elif op == CHECK:
+                # An iteration that consumed nothing is the last one
+                bit = 1 << program.args[pc]
+                if empty & bit:
+                    stack.append((program.x[pc], slots, empty & ~bit))
+                else:
+                    stack.append((pc + 1, slots, empty))
+            elif op == ASSERT:
+                if self._check_anchor(program.args[pc], text, pos):
+                    stack.append((pc + 1, slots, empty))
+            elif op == LOOK:
+                if self._check_lookaround(pc, text, pos):
+                    stack.append((pc + 1, slots, empty))
+            else:
+                threads.append((pc, slots))
+
+    def _check_anchor(self, anchor_type: str, text: str, pos: int) -> bool:
+        length = len(text)
+        if anchor_type == "^":
+            return pos == 0 or (self.multiline and text[pos - 1] == self.newline)
+        elif anchor_type == "$":
+            return pos == length or (self.multiline and text[pos] == self.newline)
+
+        before_is_word = pos > 0 and text[pos - 1] in self.word_chars
+        after_is_word = pos < length and text[pos] in self.word_chars
+        if anchor_type == "b":
+            return before_is_word != after_is_word
+        return before_is_word == after_is_word
+
+    def _check_lookaround(self, pc: int, text: str, pos: int) -> bool:
+        ahead, positive, _, max_width = self.program.args[pc]
+        body = self.program.x[pc]
+        # The body has its own instructions, so simulating it here never disturbs the marks of
+        # the caller's threads
+        if ahead:
+            found = self._run(body, 0, text, pos, anchored=True) is not None
+        else:
+            # The body cannot start further back than its width
+            first = 0 if max_width is None else max(0, pos - max_width)
+            found = self._ends_at(body, text, first, pos)
+        return found == positive
+
+    def _ends_at(self, entry: int, text: str, first: int, end: int) -> bool:
+        """Whether the lookaround body at `entry` matches some text[start:end], for any start
+        from `first` on"""
+        program = self.program
+        threads: list[tuple[int, list[int]]] = []
+        generation = self._next_generation()
+        slots: list[int] = []
+        budget = self._budget
+        steps = 0
+        grant = budget.grant() if budget is not None else NEVER
+
+        for pos in range(first, end + 1):
+            self._add_thread(threads, generation, entry, slots, text, pos)
+
+            if pos == end:
+                if budget is not None:
+                    budget.charge(steps, pos)
+                return any(program.ops[pc] == MATCH for pc, _ in threads)
+
+            next_threads: list[tuple[int, list[int]]] = []
+            next_generation = self._next_generation()
+            char = text[pos]
+            steps += len(threads)
+            if steps >= grant:
+                grant = budget.charge(steps, pos)
+                steps = 0
+
+            for pc, _ in threads:
+                if accepts(program, pc, char):
+                    self._add_thread(next_threads, next_generation, pc + 1, slots, text, pos + 1)
+
+            threads = next_threads
+            generation = next_generation
+
+        return False
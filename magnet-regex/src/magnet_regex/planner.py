@@ -0,0 +1,164 @@
+"""Start position plans: which offsets of the text a search tries a match at.
+
+A search normally tries every offset, or leaves it to an automaton's unanchored scan. How a
+pattern starts or ends can rule most of them out before any engine runs:
+
+- `start`: a pattern that starts with `^` outside multiline mode only matches at offset 0;
+- `suffix_window`: one that ends with `$` outside multiline mode, with a bounded width, ends
+  exactly at the end of the text, so it starts within its width of it;
+- `line_starts`: one that starts with `^` in multiline mode only matches at 0 and right after a
+  newline, which `find` jumps between;
+- `word_boundaries`: one that starts with `\\b` only matches where a word starts or ends.
+
+The first two only shrink the part of the text that is searched, and help every engine. The last
+two are a list of offsets to try one by one, which only pays off for the backtracker: it tries
+every offset anyway, while the automata scan the whole text in one linear pass, and restarting
+them at every candidate could scan the same text once per candidate.
+"""
+
+from typing import Iterator, Optional
+
+from magnet_regex.ast_node import (
+    ASTNode,
+    AlternationNonde,
+    AnchorNode,
+    AtomicGroupNode,
+    ConcatNode,
+    GroupNode,
+    NonCapturingGroupNode,
+    QuantifierNode,
+)
+from magnet_regex.compiler import WORD_BYTES, WORD_CHARS, width
+
+# Plan kinds
+SCAN = "scan"
+START = "start"
+SUFFIX_WINDOW = "suffix_window"
+LINE_STARTS = "line_starts"
+WORD_BOUNDARIES = "word_boundaries"
+
+
+def _edge_anchor(node: ASTNode, last: bool) -> Optional[str]:
+    """The anchor every match of `node` starts with (ends with when `last`), if any"""
+    if isinstance(node, AnchorNode):
+        return node.anchor_type
+    elif isinstance(node, ConcatNode) and node.children:
+        return _edge_anchor(node.children[-1 if last else 0], last)
+    elif isinstance(node, (GroupNode, NonCapturingGroupNode, AtomicGroupNode)):
+        return _edge_anchor(node.child, last)
+    elif isinstance(node, QuantifierNode) and node.min_count > 0:
+        # Every iteration starts (ends) with the anchor, and there is at least one
+        return _edge_anchor(node.child, last)
+    elif isinstance(node, AlternationNonde):
+        anchors = {_edge_anchor(alt, last) for alt in node.alternatives}
+        return anchors.pop() if len(anchors) == 1 else None
+    return None
+
+
+class StartPlan:
+    """Where a search can find a match. `kind` is one of the plan kinds above, and `reason` says
+    why it was chosen."""
+
+    def __init__(
+        self,
+        kind: str,
+        reason: str,
+        min_width: int = 0,
+        max_width: Optional[int] = None,
+        binary: bool = False,
+    ):
+        self.kind = kind
+        self.reason = reason
+        # The width of the pattern's matches, for the suffix window
+        self.min_width = min_width
+        self.max_width = max_width
+        self.newline = ord("\n") if binary else "\n"
+        self.word_chars = WORD_BYTES if binary else WORD_CHARS
+
+    def window(self, length: int) -> tuple[int, int]:
+        """The first and last start of a suffix window over a text of `length` characters"""
+        return max(0, length - self.max_width), length - self.min_width
+
+    def allows(self, text, pos: int) -> bool:
+        """Whether a match can start at `pos`"""
+        if self.kind == START:
+            return pos == 0
+        elif self.kind == SUFFIX_WINDOW:
+            first, last = self.window(len(text))
+            return first <= pos <= last
+        elif self.kind == LINE_STARTS:
+            return pos == 0 or text[pos - 1] == self.newline
+        elif self.kind == WORD_BOUNDARIES:
+            before = pos > 0 and text[pos - 1] in self.word_chars
+            after = pos < len(text) and text[pos] in self.word_chars
+            return before != after
+        return True
+
+    def starts(self, text, pos: int) -> Iterator[int]:
+        """The offsets at or after `pos` where a match can start, in increasing order"""
+        length = len(text)
+        if self.kind == LINE_STARTS:
+            yield from self._line_starts(text, pos)
+        elif self.kind == WORD_BOUNDARIES:
+            word_chars = self.word_chars
+            before = pos > 0 and text[pos - 1] in word_chars
+            for i in range(pos, length + 1):
+                after = i < length and text[i] in word_chars
+                if before != after:
+                    yield i
+                before = after
+        else:
+            first, last = (0, 0) if self.kind == START else (0, length)
+            if self.kind == SUFFIX_WINDOW:
+                first, last = self.window(length)
+            yield from range(max(pos, first), last + 1)
+
+    def _line_starts(self, text, pos: int) -> Iterator[int]:
+        if pos == 0 or (pos <= len(text) and text[pos - 1] == self.newline):
+            yield pos
+        if isinstance(text, memoryview):
+            # No find on a memoryview
+            for i in range(pos, len(text)):
+                if text[i] == self.newline:
+                    yield i + 1
+            return
+        separator = "\n" if isinstance(text, str) else b"\n"
+        i = text.find(separator, pos)
+        while i >= 0:
+            yield i + 1
+            i = text.find(separator, i + 1)
+
+    def __repr__(self):
+        return f"StartPlan({self.kind!r})"
+
+
+def build_plan(
+    ast: ASTNode,
+    flags: Optional[dict[str, bool]] = None,
+    binary: bool = False,
+    backtracking: bool = True,
+) -> StartPlan:
+    """Picks the start plan for the pattern. Plans that list offsets are only picked when the
+    pattern runs on the backtracker."""
+    flags = flags or {}
+    multiline = flags.get("multiline", False)
+    first = _edge_anchor(ast, last=False)
+    min_width, max_width = width(ast)
+
+    if first == "^" and not multiline:
+        return StartPlan(START, "the pattern starts with ^", binary=binary)
+    if _edge_anchor(ast, last=True) == "$" and not multiline and max_width is not None:
+        return StartPlan(
+            SUFFIX_WINDOW,
+            f"the pattern ends with $ and matches {min_width} to {max_width} characters",
+            min_width,
+            max_width,
+            binary,
+        )
+    if first == "^" and backtracking:
+        return StartPlan(LINE_STARTS, "the pattern starts with ^ in multiline mode", binary=binary)
+    if first == "b" and backtracking:
+        return StartPlan(WORD_BOUNDARIES, "the pattern starts with \\b", binary=binary)
+    if first in ("^", "b"):
+        return StartPlan(SCAN, "the automata scan the text in one pass", binary=binary)
+    return StartPlan(SCAN, "the pattern is not anchored", binary=binary)
@@ -0,0 +1,214 @@
+"""Literal prefilters: cheap scans that rule out most start positions before an engine runs.
+
+An analysis pass over the AST finds the longest literal every match must contain, along with how
+far from the start of the match it can be. `str.find` (a memchr-speed scan in C) then jumps
+straight to its occurrences, and the engines only run in the window of starts each one allows.
+When the literal is absent from the text, no engine runs at all.
+"""
+
+from dataclasses import dataclass
+from typing import Optional, Union
+
+from magnet_regex.ast_node import (
+    ASTNode,
+    AlternationNonde,
+    AnchorNode,
+    AtomicGroupNode,
+    CharNode,
+    ConcatNode,
+    GroupNode,
+    LiteralNode,
+    LookaheadNode,
+    LookbehindNode,
+    NonCapturingGroupNode,
+    QuantifierNode,
+)
+from magnet_regex.compiler import width
+
+# A range of offsets from the start of the match, the maximum is None when it is unbounded
+Offsets = tuple[int, Optional[int]]
+
+
+def _add(a: Offsets, b: Offsets) -> Offsets:
+    return a[0] + b[0], None if a[1] is None or b[1] is None else a[1] + b[1]
+
+
+@dataclass
+class Literals:
+    """What the analysis knows about the literals in a node's matches"""
+
+    # The text the node always matches, None when it can match different strings
+    exact: Optional[str]
+    # Every match of the node starts with `prefix` and ends with `suffix`
+    prefix: str = ""
+    suffix: str = ""
+    # The longest literal found in every match, and where it can be relative to the match start
+    inner: str = ""
+    inner_offsets: Offsets = (0, 0)
+
+    @classmethod
+    def of_exact(cls, text: str) -> "Literals":
+        return cls(text, text, text, text, (0, 0))
+
+
+def literals(node: ASTNode) -> Literals:
+    """Runs the literal analysis over `node`"""
+    if isinstance(node, CharNode):
+        return Literals.of_exact(node.char)
+    elif isinstance(node, LiteralNode):
+        return Literals.of_exact(node.text)
+    elif isinstance(node, (AnchorNode, LookaheadNode, LookbehindNode)):
+        # Zero width, the literals around them are still adjacent in the match
+        return Literals.of_exact("")
+    elif isinstance(node, (GroupNode, NonCapturingGroupNode, AtomicGroupNode)):
+        # What an atomic group matches is one of its child's matches
+        return literals(node.child)
+    elif isinstance(node, AlternationNonde) and len(node.alternatives) == 1:
+        return literals(node.alternatives[0])
+    elif isinstance(node, ConcatNode):
+        return _concat_literals(node.children)
+    elif isinstance(node, QuantifierNode) and node.max_count == 0:
+        return Literals.of_exact("")
+    elif isinstance(node, QuantifierNode):
+        child = literals(node.child)
+        if child.exact is not None:
+            # x{3,5} always starts and ends with xxx
+            repeated = child.exact * node.min_count
+            if node.max_count == node.min_count:
+                return Literals.of_exact(repeated)
+            return Literals(None, repeated, repeated, repeated, (0, 0))
+        if node.min_count > 0:
+            # The first iteration is mandatory
+            return Literals(None, child.prefix, child.suffix, child.inner, child.inner_offsets)
+    return Literals(None)
+
+
+def _concat_literals(children: list[ASTNode]) -> Literals:
+    prefix: Optional[str] = None
+    best, best_offsets = "", (0, 0)
+    # The run of adjacent literals ending at the current child, and where it starts
+    run, run_offsets = "", (0, 0)
+    offsets: Offsets = (0, 0)
+
+    def consider(literal: str, literal_offsets: Offsets):
+        nonlocal best, best_offsets
+        if len(literal) > len(best):
+            best, best_offsets = literal, literal_offsets
+
+    for child in children:
+        info = literals(child)
+        child_width = width(child)
+
+        if info.exact is not None:
+            if not run:
+                run_offsets = offsets
+            run += info.exact
+        else:
+            if prefix is None:
+                prefix = run + info.prefix
+            consider(run + info.prefix, run_offsets if run else offsets)
+            consider(info.inner, _add(offsets, info.inner_offsets))
+
+            # The child's suffix ends where the child does, and starts a new run
+            end = _add(offsets, child_width)
+            run = info.suffix
+            run_offsets = (end[0] - len(run), None if end[1] is None else end[1] - len(run))
+        offsets = _add(offsets, child_width)
+
+    if prefix is None:
+        return Literals.of_exact(run)
+    consider(run, run_offsets)
+    return Literals(None, prefix, run, best, best_offsets)
+
+
+def literal_prefix(node: ASTNode) -> tuple[str, bool]:
+    """Returns the literal every match of `node` starts with, and whether that literal is all of
+    `node`"""
+    info = literals(node)
+    if info.exact is not None:
+        return info.exact, True
+    return info.prefix, False
+
+
+class LiteralFilter:
+    """Finds where matches can start, given a literal every match contains between `min_offset`
+    and `max_offset` characters after its start"""
+
+    def __init__(
+        self,
+        literal: Union[str, bytes],
+        ignore_case: bool = False,
+        min_offset: int = 0,
+        max_offset: Optional[int] = 0,
+    ):
+        self.ignore_case = ignore_case
+        self.literal = literal.lower() if ignore_case else literal
+        self.min_offset = min_offset
+        # None when the literal can be arbitrarily far from the start
+        self.max_offset = max_offset
+
+    @property
+    def is_prefix(self) -> bool:
+        return self.max_offset == 0
+
+    def haystack(self, text):
+        """Returns the object `find` scans for `text`, prepared once per text. None means the
+        prefilter cannot help and every offset is a candidate."""
+        if isinstance(text, memoryview):
+            # A memoryview has no find, but the object it views does, when the view is all of it
+            source = text.obj
+            if (
+                hasattr(source, "find")
+                and text.c_contiguous
+                and text.format == "B"
+                and text.nbytes == len(source)
+            ):
+                return source
+            return None
+        if not self.ignore_case:
+            return text
+        folded = text.lower()
+        # A few characters lowercase to more than one, and then the offsets in the folded copy
+        # don't line up with the text anymore
+        return folded if len(folded) == len(text) else None
+
+    def find(self, haystack, pos: int) -> int:
+        """Returns the first offset at or after `pos` where the literal occurs, or -1"""
+        return haystack.find(self.literal, pos)
+
+    def may_match_at(self, text, start: int) -> bool:
+        """Quick test for an anchored match at `start`, False when it certainly fails"""
+        if self.ignore_case:
+            return True
+        haystack = self.haystack(text)
+        if haystack is None:
+            return True
+        if self.max_offset is None:
+            end = len(text)
+        else:
+            end = start + self.max_offset + len(self.literal)
+        return haystack.find(self.literal, start + self.min_offset, end) >= 0
+
+
+def build_prefilter(
+    ast: ASTNode, flags: Optional[dict[str, bool]] = None, binary: bool = False
+) -> Optional[LiteralFilter]:
+    """Returns a prefilter for the pattern, or None when matches don't share a literal. For binary
+    haystacks the literal is searched as bytes, with the same code points."""
+    flags = flags or {}
+    ignore_case = flags.get("ignorecase", False)
+
+    info = literals(ast)
+    # A prefix pins the start of the match exactly, so it wins unless the inner literal is longer
+    literal, (min_offset, max_offset) = info.prefix, (0, 0)
+    if len(info.inner) > len(info.prefix):
+        literal, (min_offset, max_offset) = info.inner, info.inner_offsets
+
+    if not literal or (ignore_case and len(literal.lower()) != len(literal)):
+        return None
+    if binary:
+        # Lowercasing a copy of a binary haystack would defeat the point of not decoding it
+        if ignore_case:
+            return None
+        return LiteralFilter(literal.encode("latin-1"), False, min_offset, max_offset)
+    return LiteralFilter(literal, ignore_case, min_offset, max_offset)
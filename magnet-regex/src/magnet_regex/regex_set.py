@@ -0,0 +1,149 @@
+"""Matching many patterns against the same text in one pass.
+
+Patterns are sorted into three groups when the set is built:
+
+- Patterns that are a plain literal (no classes, anchors or groups) go into a single
+  Aho-Corasick automaton.
+- Everything else the DFA can run is compiled into one program, with one MATCH per pattern, and
+  scanned by a `SetDFA`. Its states are shared between all the patterns, so once the cache is
+  warm a scan costs one dictionary lookup per character, however many patterns there are.
+- Patterns with backreferences or lookarounds are run one by one.
+
+Where a pattern matched is only worked out, with the pattern's own `Matcher`, for the patterns
+the scans reported.
+"""
+
+from typing import Iterable, Optional
+
+from magnet_regex.aho_corasick import AhoCorasick
+from magnet_regex.compiler import compile_program, compile_set, supports_dfa
+from magnet_regex.dfa import DFACacheThrashing, LazyDFA, SetDFA
+from magnet_regex.lexer import Lexer
+from magnet_regex.matcher import Match, Matcher
+from magnet_regex.optimizer import optimize
+from magnet_regex.parser import Parser
+from magnet_regex.prefilter import literals
+
+
+class RegexSet:
+    """A collection of patterns matched together. Like a `Matcher`, a set keeps scratch state
+    while it runs, and should not be shared between threads."""
+
+    def __init__(
+        self,
+        patterns: Iterable[str],
+        flags: Optional[dict[str, bool]] = None,
+        dfa_cache_capacity: int = LazyDFA.DEFAULT_CACHE_CAPACITY,
+    ):
+        self.patterns = list(patterns)
+        self.flags = flags or {}
+        ignore_case = self.flags.get("ignorecase", False)
+
+        self._asts = [
+            optimize(Parser(Lexer(pattern).tokenize()).parse()) for pattern in self.patterns
+        ]
+        self._matchers: dict[int, Matcher] = {}
+
+        # Pattern indexes handled by each strategy, and the text of the literal patterns
+        self._literal_ids: list[int] = []
+        self._literal_texts: dict[int, str] = {}
+        self._dfa_ids: list[int] = []
+        self._other_ids: list[int] = []
+
+        for index, ast in enumerate(self._asts):
+            program = compile_program(ast, self.flags)
+            exact = literals(ast).exact
+            if (
+                exact
+                and program.group_count == 0
+                and not program.has_assertions
+                and not program.has_lookarounds
+                and not (ignore_case and len(exact.lower()) != len(exact))
+            ):
+                self._literal_ids.append(index)
+                self._literal_texts[index] = exact
+            elif supports_dfa(program):
+                self._dfa_ids.append(index)
+            else:
+                self._other_ids.append(index)
+
+        self._literals: Optional[AhoCorasick] = None
+        if self._literal_ids:
+            self._literals = AhoCorasick(
+                [self._literal_texts[index] for index in self._literal_ids], ignore_case
+            )
+
+        self._dfa: Optional[SetDFA] = None
+        if self._dfa_ids:
+            program = compile_set([self._asts[index] for index in self._dfa_ids], self.flags)
+            self._dfa = SetDFA(program, self.flags, dfa_cache_capacity)
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def __repr__(self):
+        return f"RegexSet({len(self.patterns)} patterns)"
+
+    def _matcher(self, index: int) -> Matcher:
+        matcher = self._matchers.get(index)
+        if matcher is None:
+            matcher = Matcher(self._asts[index], self.flags)
+            self._matchers[index] = matcher
+        return matcher
+
+    def _scan(self, text: str, stop_at_first: bool) -> dict[int, Optional[int]]:
+        """Maps the index of every pattern that matches `text` to the end of its leftmost match
+        when that is known already (literal patterns), None otherwise"""
+        found: dict[int, Optional[int]] = {}
+
+        if self._literals is not None:
+            remaining = len(self._literal_ids)
+            for literal_index, end in self._literals.iter_matches(text):
+                index = self._literal_ids[literal_index]
+                if index not in found:
+                    found[index] = end
+                    remaining -= 1
+                    if stop_at_first or not remaining:
+                        break
+            if stop_at_first and found:
+                return found
+
+        if self._dfa is not None:
+            try:
+                for dfa_index in self._dfa.scan(text, stop_at_first):
+                    found[self._dfa_ids[dfa_index]] = None
+            except DFACacheThrashing:
+                # Too many distinct states for the cache, run the patterns one by one instead
+                for index in self._dfa_ids:
+                    if self._matcher(index).search(text) is not None:
+                        found[index] = None
+                        if stop_at_first:
+                            break
+            if stop_at_first and found:
+                return found
+
+        for index in self._other_ids:
+            if self._matcher(index).search(text) is not None:
+                found[index] = None
+                if stop_at_first:
+                    break
+        return found
+
+    def is_match(self, text: str) -> bool:
+        """Whether any pattern of the set matches somewhere in `text`"""
+        return bool(self._scan(text, stop_at_first=True))
+
+    def matches(self, text: str) -> list[int]:
+        """Returns the indexes of the patterns that match somewhere in `text`, in order"""
+        return sorted(self._scan(text, stop_at_first=False))
+
+    def search(self, text: str) -> dict[int, Match]:
+        """Maps the index of every pattern that matches `text` to its leftmost match"""
+        results = {}
+        for index, end in sorted(self._scan(text, stop_at_first=False).items()):
+            if end is not None:
+                start = end - len(self._literal_texts[index])
+                results[index] = Match(text, [start, end])
+            else:
+                results[index] = self._matcher(index).search(text)
+        return results
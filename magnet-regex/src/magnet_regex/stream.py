@@ -0,0 +1,122 @@
+"""Matching over streams: text or binary file objects, and iterators of chunks.
+
+The text is read a chunk at a time into a buffer. A match found in the buffer is only reported
+once the buffer extends far enough past its start to cover everything the pattern can look at
+(its maximum width, lookaheads, and the character after the match for `$` and `\\b`): then no
+later data can change it, nor reveal a match starting earlier. Everything before the next search
+position is dropped, except for the few characters lookbehinds and anchors need to see, so the
+buffer never holds much more than a chunk plus the longest possible match.
+
+Patterns without a maximum width (`.*`, `\\d+`, backreferences) are assumed to have matches of at
+most `max_match_length` characters. Longer matches may be cut short or missed.
+"""
+
+import codecs
+from typing import BinaryIO, Iterable, Iterator, TextIO, Union
+
+from magnet_regex.ast_node import LookbehindNode, walk
+from magnet_regex.compiler import width
+from magnet_regex.matcher import Match, Matcher
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_MATCH_LENGTH = 8 * 1024
+
+Source = Union[TextIO, BinaryIO, Iterable[Union[str, bytes]]]
+
+
+def iter_chunks(
+    source: Source, chunk_size: int = DEFAULT_CHUNK_SIZE, encoding: str = "utf-8"
+) -> Iterator[str]:
+    """Yields the text of `source` in chunks. File objects are read `chunk_size` at a time, and
+    bytes are decoded incrementally, so a character split across two reads is not lost."""
+    if hasattr(source, "read"):
+        chunks = iter(lambda: source.read(chunk_size), source.read(0))
+    else:
+        chunks = iter(source)
+
+    decoder = None
+    for chunk in chunks:
+        if isinstance(chunk, (bytes, bytearray, memoryview)):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder(encoding)()
+            chunk = decoder.decode(chunk)
+        if chunk:
+            yield chunk
+
+    if decoder is not None:
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+
+def scan_window(matcher: Matcher, max_match_length: int) -> tuple[int, int]:
+    """Returns how many characters after and before its start the pattern can inspect to settle a
+    match, with unbounded widths replaced by `max_match_length`"""
+    ahead = width(matcher.ast, lookaheads=True)[1]
+    # One more character for the assertions that look at the next one
+    ahead = (max_match_length if ahead is None else ahead) + 1
+
+    behind = 0
+    for node in walk(matcher.ast):
+        if isinstance(node, LookbehindNode):
+            node_width = width(node.child)[1]
+            behind = max(behind, max_match_length if node_width is None else node_width)
+    # One more character for `^` and `\b`, which look at the previous one
+    return ahead, behind + 1
+
+
+def finditer_stream(
+    matcher: Matcher,
+    source: Source,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_match_length: int = DEFAULT_MAX_MATCH_LENGTH,
+    encoding: str = "utf-8",
+) -> Iterator[Match]:
+    """Yields the matches of `matcher` over `source`, like `findall`, with their offsets in the
+    whole stream. Offsets count characters, also for binary sources, which are decoded with
+    `encoding`."""
+    if chunk_size <= 0:
+        raise ValueError(f"Chunk size must be positive, got {chunk_size}")
+    if max_match_length < 0:
+        raise ValueError(f"Maximum match length must be positive, got {max_match_length}")
+
+    ahead, behind = scan_window(matcher, max_match_length)
+    buffer = ""
+    # Offset of buffer[0] in the stream, and where the next search starts in the buffer
+    base = 0
+    pos = 0
+    chunks = iter_chunks(source, chunk_size, encoding)
+    # Small chunks are gathered and appended to the buffer together, so that it isn't copied and
+    # searched again for every one of them
+    pending: list[str] = []
+    pending_size = 0
+
+    while True:
+        chunk = next(chunks, None)
+        at_end = chunk is None
+        if not at_end:
+            pending.append(chunk)
+            pending_size += len(chunk)
+            if pending_size < chunk_size or len(buffer) + pending_size - pos < ahead:
+                continue
+        buffer += "".join(pending)
+        pending.clear()
+        pending_size = 0
+
+        # Starts from here on may depend on text that wasn't read yet
+        horizon = len(buffer) + 1 if at_end else len(buffer) - ahead + 1
+
+        for match in matcher.scanner(buffer).matches(pos, horizon):
+            # Positions count from the start of the stream
+            yield match.shifted(base)
+            pos = match.end if match.end > match.start else match.start + 1
+        pos = max(pos, min(horizon, len(buffer)))
+
+        if at_end:
+            return
+
+        # Drop what no later search can look at
+        drop = max(0, pos - behind)
+        buffer = buffer[drop:]
+        base += drop
+        pos -= drop
@@ -0,0 +1,55 @@
+import json
+import unittest
+from dataclasses import replace
+from magnet_regex.bench import CATALOG, CORPORA, compare, run
+
+
+class TestBench(unittest.TestCase):
+    def test_corpora_are_reproducible(self):
+        for name, generate in CORPORA.items():
+            with self.subTest(corpus=name):
+                text = generate(2000, 7)
+                self.assertEqual(text, generate(2000, 7))
+                self.assertGreaterEqual(len(text), 2000)
+                if name != "pathological":
+                    self.assertNotEqual(text, generate(2000, 8))
+
+    def test_engines_agree_with_re(self):
+        # Short texts, with ReDoS classics `re` runs in a few milliseconds
+        cases = [replace(case, size=case.size and 12) for case in CATALOG]
+        results = run(cases, size=3000, repeat=1, latency_samples=5)
+        json.dumps(results)
+
+        counts = {}
+        for result in results["results"]:
+            if result["status"] == "unsupported":
+                self.assertIn(result["engine"], ("dfa", "pikevm"))
+                continue
+            self.assertEqual(result["status"], "ok")
+            self.assertGreater(result["throughput_mb_s"], 0)
+            self.assertLessEqual(result["latency_us"]["p50"], result["latency_us"]["max"])
+            counts.setdefault(result["case"], {})[result["engine"]] = result["matches"]
+        for case, found in counts.items():
+            with self.subTest(case=case):
+                self.assertEqual(set(found.values()), {found["re"]})
+
+    def test_compare_reports_regressions(self):
+        measured = {
+            "case": "a",
+            "engine": "dfa",
+            "status": "ok",
+            "matches": 3,
+            "throughput_mb_s": 10.0,
+            "compile_ms": 1.0,
+            "latency_us": {"p50": 2.0, "p99": 5.0},
+            "peak_kib": 8.0,
+        }
+        old = {"results": [measured, {"case": "b", "engine": "dfa", "status": "ok"}]}
+        new = json.loads(json.dumps(old))
+        self.assertEqual(compare(old, new), [])
+
+        new["results"][0].update(throughput_mb_s=8.0, compile_ms=0.5, matches=4)
+        new["results"][0]["latency_us"]["p99"] = 5.2
+        new["results"][1]["status"] = "timeout"
+        changes = {(c["case"], c["metric"]) for c in compare(old, new)}
+        self.assertEqual(changes, {("a", "throughput_mb_s"), ("a", "matches"), ("b", "status")})
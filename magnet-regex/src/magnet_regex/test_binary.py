@@ -0,0 +1,69 @@
+import mmap
+import re
+import tempfile
+import unittest
+from magnet_regex._testing import parse
+from magnet_regex.matcher import Matcher
+from magnet_regex.pattern import Pattern
+
+
+CASES = [
+    (r"ab+c", b"xabbbc abc"),
+    (r"\bfoo\b", b"foo food foo"),
+    (r"(\d+)-(\d+)", b"12-34 5-6"),
+    (r"[^a-c]+", b"abcxyz\xff"),
+    (r"(\w)\1", b"hello"),
+    (r"(?<=a)b", b"abab"),
+    (r"é", b"caf\xe9"),
+]
+
+
+class TestBinaryHaystacks(unittest.TestCase):
+    def test_agrees_with_bytes_patterns(self):
+        for pattern, data in CASES:
+            expected = [(m.span(), m.groups()) for m in re.finditer(pattern.encode("latin-1"), data)]
+            for engine in Matcher.ENGINES:
+                try:
+                    matcher = Matcher(parse(pattern), engine=engine)
+                except ValueError:
+                    continue
+                for haystack in (data, bytearray(data), memoryview(data)):
+                    with self.subTest(pattern=pattern, engine=engine, kind=type(haystack)):
+                        got = [
+                            ((m.start, m.end), tuple(map(bytes, m.groups())))
+                            for m in matcher.findall(haystack)
+                        ]
+                        self.assertEqual(got, expected)
+
+    def test_flags(self):
+        matcher = Matcher(parse(r"^error.$"), {"ignorecase": True, "multiline": True})
+        self.assertEqual([m.start for m in matcher.findall(b"ERROR!\nerror?\nErr")], [0, 7])
+        self.assertEqual(Matcher(parse("a.b"), {"dotall": True}).search(b"a\nb").end, 3)
+
+    def test_results_are_zero_copy(self):
+        data = bytearray(b"key=value")
+        match = Matcher(parse(r"(\w+)=(\w+)")).search(data)
+
+        self.assertIsInstance(match.text, memoryview)
+        self.assertEqual(match.group(2), b"value")
+        data[4] = ord("V")
+        self.assertEqual(match.group(2), b"Value")
+
+    def test_str_and_bytes_share_a_matcher(self):
+        pattern = Pattern(r"id=(\d+)")
+        self.assertEqual(pattern.search("x id=12").group(1), "12")
+        self.assertEqual(bytes(pattern.search(b"x id=34").group(1)), b"34")
+        self.assertEqual(pattern.search("id=5").group(1), "5")
+
+    def test_mmap(self):
+        with tempfile.TemporaryFile() as file:
+            file.write(b"junk " * 10000 + b"ERROR 42 junk")
+            file.flush()
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                match = Pattern(r"ERROR (\d+)").search(mapped)
+                self.assertEqual((match.start, bytes(match.group(1))), (50000, b"42"))
+                del match
+
+    def test_characters_above_255_cannot_match_bytes(self):
+        with self.assertRaises(ValueError):
+            Matcher(parse("€")).search(b"\x80")
@@ -0,0 +1,66 @@
+import threading
+import unittest
+from magnet_regex._testing import parse
+from magnet_regex.budget import Budget, CancellationToken, MatchBudgetExceeded
+from magnet_regex.matcher import Matcher
+from magnet_regex.pattern import compile
+
+
+class TestBudget(unittest.TestCase):
+    def test_max_steps_in_every_engine(self):
+        text = "ab " * 5000
+        for engine in Matcher.ENGINES:
+            with self.subTest(engine=engine):
+                matcher = Matcher(parse(r"a[^a]*z"), engine=engine)
+                with self.assertRaises(MatchBudgetExceeded) as caught:
+                    matcher.search(text, max_steps=500)
+                self.assertEqual(caught.exception.reason, "max_steps")
+                # Engines report in batches, the Pike VM a character's worth of threads at a time
+                self.assertIn(caught.exception.steps, range(501, 510))
+                self.assertGreater(caught.exception.position, 0)
+
+    def test_limits_do_not_change_results(self):
+        matcher = Matcher(parse(r"(\w+) \1"))
+        text = "the the cat sat sat"
+        expected = [m.span() for m in matcher.findall(text)]
+        found = matcher.findall(text, max_steps=10**6, timeout=60, cancel=CancellationToken())
+        self.assertEqual([m.span() for m in found], expected)
+
+    def test_findall_shares_one_budget(self):
+        matcher = Matcher(parse("ab"))
+        text = "ab" * 2000
+        self.assertEqual(len(matcher.findall(text, max_steps=10**5)), 2000)
+        with self.assertRaises(MatchBudgetExceeded):
+            matcher.findall(text, max_steps=1000)
+
+    def test_cancellation(self):
+        token = CancellationToken()
+        token.cancel()
+        with self.assertRaises(MatchBudgetExceeded) as caught:
+            compile(r"(a|b)*[cd]").search("ab" * 100, cancel=token)
+        self.assertEqual(caught.exception.reason, "cancelled")
+
+        # Cancelled from another thread while the match runs
+        token = CancellationToken()
+        timer = threading.Timer(0.01, token.cancel)
+        timer.start()
+        try:
+            matcher = Matcher(parse(r"(\w+)[xy]\1"), engine="backtrack")
+            with self.assertRaises(MatchBudgetExceeded):
+                matcher.search("ab" * 10**6, cancel=token)
+        finally:
+            timer.cancel()
+
+    def test_timeout(self):
+        # No literal for the prefilter to rule the match out with
+        matcher = Matcher(parse(r"(a|b)*[cd]"), engine="pikevm")
+        with self.assertRaises(MatchBudgetExceeded) as caught:
+            matcher.search("ab" * 10**6, timeout=0.01)
+        self.assertEqual(caught.exception.reason, "timeout")
+
+    def test_invalid_limits(self):
+        with self.assertRaises(ValueError):
+            Budget(max_steps=-1)
+        with self.assertRaises(ValueError):
+            Budget(timeout=-1)
+        self.assertIsNone(Budget.create())
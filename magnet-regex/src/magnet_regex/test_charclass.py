@@ -0,0 +1,48 @@
+import re
+import unittest
+from magnet_regex._testing import parse
+from magnet_regex.charclass import CharClass, compile_class, normalize
+from magnet_regex.compiler import SET, compile_program
+from magnet_regex.matcher import Matcher
+
+
+class TestCharClass(unittest.TestCase):
+    def test_normalize(self):
+        ranges = [(5, 9), (0, 2), (3, 4), (20, 30), (25, 26)]
+        self.assertEqual(normalize(ranges), [(0, 9), (20, 30)])
+
+    def test_representation(self):
+        # Small classes are plain sets, large ones a bitmap and a range table
+        self.assertEqual(compile_class([(97, 99)]), frozenset("abc"))
+        members = compile_class([(0x20, 0x7E), (0x4E00, 0x9FFF)])
+        self.assertIsInstance(members, CharClass)
+        self.assertEqual(len(members), 95 + 0x5200)
+        for char in " ~中":
+            self.assertIn(char, members)
+        for char in "\x7fꀀ":
+            self.assertNotIn(char, members)
+
+    def test_folding_at_compile_time(self):
+        self.assertEqual(compile_class([(ord("k"),) * 2], ignore_case=True), frozenset("kKK"))
+        members = compile_class([(0x430, 0x44F)], ignore_case=True)
+        self.assertIn("Я", members)
+        self.assertNotIn("Ё", members)
+
+    def test_ranges_above_255(self):
+        cases = [
+            ("[а-я]+", "Привет мир", 0),
+            ("[а-я]+", "Привет МИР", re.IGNORECASE),
+            ("[^\x00-\x1f]+", "ab\x01cd一\x1f", 0),
+            ("[一-鿿]+", "abc 中文字 def", 0),
+            ("[Ā-\U0010ffff]+", "abcĀ\U0001f600z", 0),
+        ]
+        for pattern, text, flags in cases:
+            with self.subTest(pattern=pattern):
+                matcher = Matcher(parse(pattern), {"ignorecase": bool(flags)})
+                found = [m.text for m in matcher.findall(text)]
+                self.assertEqual(found, re.findall(pattern, text, flags))
+
+    def test_binary_haystacks_keep_the_bytes_in_range(self):
+        program = compile_program(parse("[\xf0-Ā]"), binary=True)
+        chars, negated = program.args[program.ops.index(SET)]
+        self.assertEqual(chars, frozenset(range(0xF0, 0x100)))
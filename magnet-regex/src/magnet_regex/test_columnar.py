@@ -0,0 +1,77 @@
+import unittest
+from magnet_regex.pattern import Pattern
+
+try:
+    import numpy as np
+    from magnet_regex.columnar import candidates, first_chars
+except ImportError:
+    np = None
+
+
+def expected(compiled, rows, anchored):
+    find = compiled.match if anchored else compiled.search
+    return [None if m is None else m.span() for m in map(find, rows)]
+
+
+def spans(columns):
+    pairs = zip(columns.starts.tolist(), columns.ends.tolist())
+    return [None if start < 0 else (start, end) for start, end in pairs]
+
+
+@unittest.skipUnless(np is not None, "NumPy is not installed")
+class TestColumnar(unittest.TestCase):
+    def test_same_results_as_the_matcher(self):
+        rows = ["a=1", "x b=22", "", "c=d", "é=3", "日本=4", "id", "b=", "\nq=5"]
+        cases = [r"(\w+)=(\d+)", r"b=\d*", r"日|q", r"[^=]=(x)?", r"=?", r".=", r"(?<=b)=2"]
+        for pattern in cases:
+            compiled = Pattern(pattern)
+            for anchored in (True, False):
+                find = compiled.match_array if anchored else compiled.search_array
+                for column in (np.array(rows), np.array(rows, dtype=object)):
+                    with self.subTest(pattern=pattern, anchored=anchored, dtype=column.dtype):
+                        columns = find(column)
+                        self.assertEqual(spans(columns), expected(compiled, rows, anchored))
+                        self.assertEqual(
+                            find(column, output="bool").tolist(),
+                            [span is not None for span in expected(compiled, rows, anchored)],
+                        )
+
+    def test_bytes_and_packed_columns(self):
+        compiled = Pattern(r"(\w+)=(\d+)")
+        rows = [b"k=1", b"k", b"xy=22", b"", b"\xff=3"]
+        data, offsets = b"".join(rows), [0]
+        for row in rows:
+            offsets.append(offsets[-1] + len(row))
+        for column in (np.array(rows), (data, offsets)):
+            columns = compiled.search_array(column)
+            self.assertEqual(columns.mask.tolist(), [True, False, True, False, False])
+            self.assertEqual(columns.group(2).tolist(), [b"1", None, b"22", None, None])
+            starts, ends = columns.span(1)
+            self.assertEqual(starts.tolist(), [0, -1, 0, -1, -1])
+            self.assertEqual(ends.tolist(), [1, -1, 2, -1, -1])
+
+        columns = compiled.match_array(np.array(rows), output="span")
+        with self.assertRaises(IndexError):
+            columns.group(1)
+        with self.assertRaises(ValueError):
+            compiled.match_array(np.array(rows), output="groups")
+
+    def test_vectorized_prefilters(self):
+        compiled = Pattern(r"[ab]x|cd")
+        table, _ = first_chars(compiled._matcher().program)
+        self.assertEqual(np.flatnonzero(table).tolist(), [ord("a"), ord("b"), ord("c")])
+        self.assertIsNone(first_chars(Pattern(r"a*")._matcher().program))
+
+        rows = np.array(["zzax", "cz", "qqcd", ""])
+        codes = rows.view(np.uint32)
+        starts = np.arange(4) * 4
+        ends = starts + np.array([4, 2, 4, 0])
+        matcher = compiled._matcher()
+        survivors = candidates(matcher, codes, starts, ends, False)
+        self.assertEqual(survivors.tolist(), [True, True, True, False])
+        survivors = candidates(matcher, codes, starts, ends, True)
+        self.assertEqual(survivors.tolist(), [False, True, False, False])
+        # The required literal rules out the rows that miss one of its characters
+        matcher = Pattern(r"\d+-id")._matcher()
+        survivors = candidates(matcher, codes, starts, ends, False)
+        self.assertEqual(survivors.tolist(), [False] * 4)
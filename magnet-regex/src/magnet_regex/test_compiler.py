@@ -0,0 +1,233 @@
+import re
+import unittest
+from magnet_regex._testing import parse
+from magnet_regex.backtrack import Backtracker
+from magnet_regex.compiler import (
+    CHECK,
+    LOOK,
+    MARK,
+    SET,
+    SPLIT,
+    compile_program,
+    compile_reverse,
+)
+from magnet_regex.matcher import Matcher
+
+
+class TestCompiler(unittest.TestCase):
+    def test_program_layout(self):
+        program = compile_program(parse(r"a(b|c)*\d"))
+
+        self.assertEqual(program.group_count, 1)
+        self.assertEqual(program.slot_count, 4)
+        self.assertFalse(program.has_backrefs)
+        # The predefined class is resolved to a set test at compile time
+        self.assertIn(SET, program.ops)
+        self.assertIn("<- start", program.dump())
+
+    def test_split_priority(self):
+        greedy = compile_program(parse("a*"))
+        lazy = compile_program(parse("a*?"))
+
+        split = greedy.ops.index(SPLIT, greedy.start)
+        self.assertEqual(greedy.x[split], split + 1)
+        split = lazy.ops.index(SPLIT, lazy.start)
+        self.assertEqual(lazy.y[split], split + 1)
+
+    def test_empty_loop_guard(self):
+        # Only loops whose body can match the empty string need MARK / CHECK
+        self.assertNotIn(CHECK, compile_program(parse("(ab)*")).ops)
+        program = compile_program(parse("(a*)*"))
+        self.assertIn(MARK, program.ops)
+        self.assertIn(CHECK, program.ops)
+        self.assertEqual(program.register_count, 1)
+
+    def test_empty_iterations_leave_the_loop_in_every_engine(self):
+        # An iteration that consumed nothing is the last one, and the pattern goes on after the
+        # loop, as in `re`
+        cases = [
+            (r"(?:.*?)+", "xxa"),
+            (r"b(?:(?:\w*?)*)?", "AbAB"),
+            (r"(?:[^x]*?)+.", "abcdefghijklmn"),
+            (r"(?:|[^x])*b", "Abab"),
+            (r"((?:[ab])*)*", "abax"),
+            (r"(((..)?)+)*", "Ax"),
+            (r"((?:\w|[ab]*?)+)c", "abab abc"),
+            (r"(a|)*?b", "aab"),
+            (r"(?:(a*?)(b*))*x", "aabbx"),
+            (r"(?:a*|b)*?c", "abbac"),
+            (r"(?:(?:a?)*?)+$", "aaa"),
+        ]
+        for pattern, text in cases:
+            expected = re.search(pattern, text)
+            groups = range(expected.re.groups + 1)
+            for engine in Matcher.ENGINES:
+                with self.subTest(pattern=pattern, engine=engine):
+                    found = Matcher(parse(pattern), engine=engine).search(text)
+                    self.assertEqual(found.span(), expected.span())
+                    if engine != "dfa":
+                        self.assertEqual(
+                            [found.span(n) for n in groups], [expected.span(n) for n in groups]
+                        )
+
+    def test_tight_loops(self):
+        program = compile_program(parse(r"\d+x[a-z]*?(ab)*"))
+        loops = [
+            pc
+            for pc in range(program.start, len(program))
+            if program.tight_loops[pc] is not None
+        ]
+        # `\d+` and `[a-z]*?`, but not the loop over a group
+        self.assertEqual([program.tight_loops[pc] for pc in loops], [True, False])
+        for pc in loops:
+            self.assertEqual(program.ops[pc + 1], SET)
+
+
+class TestBacktracker(unittest.TestCase):
+    def run_findall(self, pattern, text, flags=None):
+        matcher = Matcher(parse(pattern), flags, engine="backtrack")
+        return [
+            (m.start, m.end, {i: g for i, g in enumerate(m.groups(), 1) if g is not None})
+            for m in matcher.findall(text)
+        ]
+
+    def test_backreferences(self):
+        self.assertEqual(
+            self.run_findall(r"(\w)\1", "hello look"),
+            [(2, 4, {1: "l"}), (7, 9, {1: "o"})],
+        )
+        self.assertEqual(self.run_findall(r"(\w+) \1", "hello hello world"), [(0, 11, {1: "hello"})])
+        self.assertEqual(self.run_findall(r"(a)\1", "aA", {"ignorecase": True}), [(0, 2, {1: "a"})])
+
+    def test_backtracks_into_groups(self):
+        # Needs to revisit the alternation inside the first group after the second one fails
+        pattern = r"(a|ab)(c|bcd)\2"
+        expected = [(m.start(), m.end(), {1: m.group(1), 2: m.group(2)}) for m in re.finditer(pattern, "abcdbcd abcc")]
+        self.assertEqual(self.run_findall(pattern, "abcdbcd abcc"), expected)
+
+    def test_lookarounds(self):
+        self.assertEqual(self.run_findall(r"(?<=(a))b\1", "abaab"), [(1, 3, {1: "a"})])
+        self.assertEqual(self.run_findall(r"(?<!a)b", "ab cb"), [(4, 5, {})])
+        self.assertEqual(self.run_findall(r"\w+(?=!)", "hi there!"), [(3, 8, {})])
+
+    def test_lookbehind_width(self):
+        program = compile_program(parse(r"(?<=ab|c{2,4})x"))
+        self.assertEqual(program.args[program.ops.index(LOOK)], (False, True, 2, 4))
+
+        # Variable width bodies, in both engines that run lookarounds
+        text = "ab1 c1 cc1 ccccc1 b1"
+        for engine in ("backtrack", "pikevm"):
+            with self.subTest(engine=engine):
+                matcher = Matcher(parse(r"(?<=ab|c{2,4})1"), engine=engine)
+                self.assertEqual([m.start for m in matcher.findall(text)], [2, 9, 16])
+
+        with self.assertRaises(ValueError):
+            compile_program(parse(r"(?<=a.*)b"))
+        program = compile_program(parse(r"(?<=a.*)b"), {"unbounded_lookbehind": True})
+        self.assertEqual(Backtracker(program).search("xaxxb")[:2], [4, 5])
+
+    def test_reverse(self):
+        # The reversed pattern matches the reversed text, anchors and lookarounds mirrored
+        cases = [
+            (r"^(ab|c)+d$", "ababcd"),
+            (r"a(?=bc)bc\b", "abc"),
+            (r"x(?<!y)(?<=x)z", "xz"),
+            (r"a{2,3}b?", "aaab"),
+        ]
+        for pattern, text in cases:
+            with self.subTest(pattern=pattern):
+                program = compile_reverse(parse(pattern))
+                self.assertEqual(program.group_count, 0)
+                self.assertEqual(Backtracker(program).match(text[::-1])[:2], [0, len(text)])
+        # `^` became `$`
+        self.assertIsNone(Backtracker(compile_reverse(parse("^ab"))).match("bax"))
+
+        with self.assertRaises(ValueError):
+            compile_reverse(parse(r"(a)\1"))
+        with self.assertRaises(ValueError):
+            compile_reverse(parse(r"a++"))
+
+    def test_empty_iterations_terminate(self):
+        backtracker = Backtracker(compile_program(parse(r"(a*)*b")))
+        self.assertEqual(backtracker.search("aaab")[:2], [0, 4])
+        self.assertIsNone(backtracker.search("aaa"))
+
+    def test_tight_loops_backtrack_like_re(self):
+        cases = [
+            (r"\d+5", "12345 1255 5", 0),
+            (r"([a-z]*)(z|yz)", "xyz zz abc", 0),
+            (r"(.*)=(.*?);", "a=b;c=d;\ne=;", 0),
+            (r"<.*?>+", "<a>> <b", re.DOTALL),
+            (r"x[^x]*?x", "xabx xx", 0),
+            (r"a*?b", "aaab", re.IGNORECASE),
+        ]
+        for pattern, text, flags in cases:
+            with self.subTest(pattern=pattern):
+                expected = [
+                    (m.start(), m.end(), dict(enumerate(m.groups(), 1)))
+                    for m in re.finditer(pattern, text, flags)
+                ]
+                names = {re.IGNORECASE: "ignorecase", re.DOTALL: "dotall"}
+                found = self.run_findall(pattern, text, {names[flags]: True} if flags else None)
+                self.assertEqual(found, expected)
+
+    def test_atomic_groups_and_possessive_quantifiers(self):
+        cases = [
+            (r"(?>a+)b", "aaab ab"),
+            (r"(?>a+)ab", "aaab"),
+            (r'"[^"]*+"', '"abc" "d'),
+            (r"(?>(a|ab))c", "abc ac"),
+            (r"(\d{2,3}+)\d", "1234 123"),
+            (r"(?>(\w+)),\1", "ab,ab ab,a"),
+            (r"x?+x", "xx x"),
+        ]
+        for pattern, text in cases:
+            with self.subTest(pattern=pattern):
+                expected = [
+                    (m.start(), m.end(), {i: g for i, g in enumerate(m.groups(), 1) if g})
+                    for m in re.finditer(pattern, text)
+                ]
+                self.assertEqual(self.run_findall(pattern, text), expected)
+
+        # Atomic patterns are left to the backtracker, where they stay linear without the memo
+        self.assertEqual(Matcher(parse(r"(?>a+)+b")).engine, "backtrack")
+        with self.assertRaises(ValueError):
+            Matcher(parse("a++"), engine="pikevm")
+        backtracker = Backtracker(compile_program(parse(r"(?>a+)+b")), memoize=False)
+        self.assertIsNone(backtracker.match("a" * 5000))
+
+    def test_memoization_bounds_ambiguous_patterns(self):
+        # Each of these takes seconds when every path is backtracked
+        cases = [(r"(a|aa)*c", "a" * 30), (r"(a|aa)*(c)\2", "a" * 30), (r"(a*)*b", "a" * 25)]
+        for pattern, text in cases:
+            with self.subTest(pattern=pattern):
+                backtracker = Backtracker(compile_program(parse(pattern)))
+                self.assertIsNone(backtracker.search(text))
+                self.assertTrue(backtracker.memoized)
+
+    def test_memoization_finds_the_same_matches(self):
+        cases = [
+            (r"(a|ab)(c|bcd)\2", "abcdbcd abcc"),
+            (r"(a*)*b", "aaab"),
+            (r"((a)|b)*\2", "abbaba"),
+            (r"(?:(a)|b)+?\1", "bbaba"),
+            (r"(?<=(a))b\1", "abaab"),
+        ]
+        for pattern, text in cases:
+            with self.subTest(pattern=pattern):
+                program = compile_program(parse(pattern))
+                memoized = Backtracker(program)
+                # Record from the first backtrack on
+                memoized.MEMO_AFTER_BACKTRACKS = 0
+                plain = Backtracker(program, memoize=False)
+                for start in range(len(text) + 1):
+                    self.assertEqual(memoized.search(text, start), plain.search(text, start))
+                    self.assertEqual(memoized.match(text, start), plain.match(text, start))
+
+    def test_memoization_falls_back_past_the_memory_cap(self):
+        backtracker = Backtracker(compile_program(parse(r"(a|aa)*c")))
+        backtracker.MEMO_MAX_BYTES = 1
+        backtracker.MEMO_AFTER_BACKTRACKS = 0
+        self.assertEqual(backtracker.search("aaaac")[:2], [0, 5])
+        self.assertIsNone(backtracker.search("a" * 12))
+        self.assertFalse(backtracker.memoized)
@@ -0,0 +1,121 @@
+import re
+import unittest
+from magnet_regex._testing import parse
+from magnet_regex.dfa import LazyDFA, ReverseDFA
+from magnet_regex.matcher import Matcher
+from magnet_regex.compiler import compile_program, compile_reverse
+
+
+def build_dfa(
+    pattern, flags=None, cache_capacity=LazyDFA.DEFAULT_CACHE_CAPACITY, reverse=False
+):
+    ast = parse(pattern)
+    program = compile_program(ast, flags)
+    return LazyDFA(program, flags, cache_capacity, compile_reverse(ast) if reverse else None)
+
+
+def dfa_spans(dfa, text):
+    spans = []
+    pos = 0
+    while pos <= len(text):
+        span = dfa.search(text, pos)
+        if span is None:
+            break
+        spans.append(span)
+        pos = span[1] if span[1] > span[0] else span[0] + 1
+    return spans
+
+
+CASES = [
+    (r"ab*c|d", "abbc xd ac abd"),
+    (r"(a|ab)(c|bcd)(d*)", "xxabcd abcd"),
+    (r"a{2,3}", "aaaa a aaaaaaa"),
+    (r"a+?", "aaa"),
+    (r"\d+\.\d+", "v1.22 and 333.4"),
+    (r"[^a-c]+", "abcxyzabc"),
+    (r"\bcat\b", "tomcat cat cats"),
+    (r"\Bcat", "tomcat cat"),
+    (r"^\w+", "hello world"),
+    (r"\w+$", "hello world"),
+    (r"a.c", "abc a\nc"),
+    (r"(foo|foobar)x", "foobarx"),
+    (r".*?x", "aaxbbx"),
+    (r"a*", "baaab"),
+    (r"", "abc"),
+]
+
+
+class TestLazyDFA(unittest.TestCase):
+    def test_spans_agree_with_re(self):
+        for pattern, text in CASES:
+            with self.subTest(pattern=pattern):
+                expected = [m.span() for m in re.finditer(pattern, text)]
+                self.assertEqual(dfa_spans(build_dfa(pattern), text), expected)
+
+    def test_reverse_dfa_finds_the_same_spans(self):
+        for pattern, text in CASES:
+            with self.subTest(pattern=pattern):
+                expected = [m.span() for m in re.finditer(pattern, text)]
+                self.assertEqual(dfa_spans(build_dfa(pattern, reverse=True), text), expected)
+
+    def test_find_start(self):
+        dfa = ReverseDFA(compile_reverse(parse(r"\b\w+")))
+        self.assertEqual(dfa.find_start("ab cde", 6), 3)
+        # Never left of `pos`, which still tells where the word starts
+        self.assertEqual(dfa.find_start("ab cde", 6, 4), None)
+        self.assertEqual(dfa.find_start("ab cde", 2, 0), 0)
+        multiline = {"multiline": True}
+        dfa = ReverseDFA(compile_reverse(parse("^a+$"), multiline), multiline)
+        self.assertEqual(dfa.find_start("b\naa\n", 4), 2)
+
+    def test_groups_run_on_demand(self):
+        matcher = Matcher(parse(r"(\w+)@(\w+)"))
+        match = matcher.search("mail joe@example now")
+        self.assertEqual(match.span(), (5, 16))
+        self.assertIsNotNone(match._captures)
+        self.assertEqual(match.groups(), ("joe", "example"))
+        self.assertIsNone(match._captures)
+
+    def test_anchors_in_multiline_mode(self):
+        dfa = build_dfa(r"^\w+$", {"multiline": True})
+        self.assertEqual(dfa_spans(dfa, "ab\ncd e\nfg"), [(0, 2), (8, 10)])
+
+    def test_anchored_find_end(self):
+        dfa = build_dfa(r"\d+")
+        self.assertEqual(dfa.find_end("ab123c", 2, anchored=True), 5)
+        self.assertIsNone(dfa.find_end("ab123c", 1, anchored=True))
+
+    def test_cache_counters(self):
+        dfa = build_dfa(r"[a-z]+@[a-z]+")
+        text = "contact: joe at example, ann at test " * 50
+
+        dfa.find_end(text)
+        stats = dfa.stats()
+        self.assertGreater(stats["misses"], 0)
+        self.assertGreater(stats["states"], 0)
+
+        misses = stats["misses"]
+        dfa.find_end(text)
+        # Every transition of the second scan is already cached
+        self.assertEqual(dfa.stats()["misses"], misses)
+        self.assertGreater(dfa.stats()["hits"], len(text))
+
+    def test_small_cache_flushes_and_stays_correct(self):
+        pattern = r"(a|b)*a(a|b)(a|b)(a|b)(a|b)c"
+        text = "abbabaabbbababbaabab" * 20 + "abbbbc"
+        dfa = build_dfa(pattern, cache_capacity=4096)
+        # Keep flushing instead of giving up
+        dfa.MAX_FLUSHES = len(text)
+
+        self.assertEqual(dfa_spans(dfa, text), [m.span() for m in re.finditer(pattern, text)])
+        self.assertGreater(dfa.stats()["flushes"], 0)
+
+    def test_matcher_falls_back_to_pikevm_when_thrashing(self):
+        pattern = r"(a|b)*a(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)c"
+        text = "abbabaabbbababbaabab" * 50 + "aabbbbbc"
+        matcher = Matcher(parse(pattern), dfa_cache_capacity=1024)
+
+        self.assertEqual(matcher.engine, "dfa")
+        match = matcher.search(text)
+        self.assertEqual((match.start, match.end), re.search(pattern, text).span())
+        self.assertGreater(matcher.dfa.stats()["gave_up"], 0)
@@ -0,0 +1,95 @@
+import io
+import unittest
+from magnet_regex._testing import parse
+from magnet_regex.backtrack import Backtracker
+from magnet_regex.instrument import Profile, ProfiledBacktracker
+from magnet_regex.matcher import Matcher
+from magnet_regex.pattern import Pattern, profile
+
+
+def stats(collected):
+    return {repr(entry.node): entry for entry in collected.nodes()}
+
+
+class TestInstrument(unittest.TestCase):
+    def test_off_by_default(self):
+        for engine in Matcher.ENGINES:
+            self.assertIs(type(Matcher(parse(r"a+b"), engine=engine).backtracker), Backtracker)
+        with self.assertRaises(ValueError):
+            Matcher(parse(r"a+b"), engine="dfa", profile=Profile())
+
+    def test_same_matches_and_counts(self):
+        text = "xaab ab b aaab x12y"
+        for pattern in (r"(a|aa)+b", r"(?<=x)\d+(?=y)", r"(?>a+|b)b", r"(\w)\1", r"a*?b"):
+            with self.subTest(pattern=pattern):
+                collected = Profile()
+                matcher = Matcher(parse(pattern), profile=collected)
+                self.assertIsInstance(matcher.backtracker, ProfiledBacktracker)
+                expected = [m.span() for m in Pattern(pattern).finditer(text)]
+                self.assertEqual([m.span() for m in matcher.finditer(text)], expected)
+                self.assertGreater(collected.calls, 0)
+                for entry in collected.nodes():
+                    self.assertLessEqual(entry.failed, entry.entered)
+                    self.assertGreaterEqual(entry.time_ns, 0)
+
+    def test_backtracks_per_quantifier(self):
+        collected = Profile()
+        matcher = Matcher(parse(r"(a|aa)+$"), profile=collected)
+        self.assertIsNone(matcher.search("a" * 12 + "!"))
+        counts = stats(collected)
+        quantifier = next(entry for name, entry in counts.items() if name.startswith("Quantifier"))
+        self.assertGreater(quantifier.backtracks, 100)
+        self.assertEqual(counts["Anchor($)"].entered, counts["Anchor($)"].failed)
+        self.assertEqual(collected.max_depth, 1)
+
+        collected.reset()
+        self.assertEqual(collected.calls, 0)
+        self.assertTrue(all(entry.entered == 0 for entry in collected.nodes()))
+
+    def test_lazy_loops_backtrack_once_they_cannot_grow(self):
+        collected = Profile()
+        matcher = Matcher(parse(r"[ac]*?b"), profile=collected)
+        self.assertEqual(matcher.match("acab").span(), (0, 4))
+        quantifier = next(e for n, e in stats(collected).items() if n.startswith("Quantifier"))
+        # Growing the loop by a character is not a backtrack
+        self.assertEqual(quantifier.backtracks, 0)
+
+        collected.reset()
+        self.assertIsNone(matcher.match("acaxb"))
+        quantifier = next(e for n, e in stats(collected).items() if n.startswith("Quantifier"))
+        self.assertEqual(quantifier.backtracks, 1)
+
+    def test_depth_and_binary_haystacks(self):
+        collected = Profile()
+        matcher = Matcher(parse(r"(?=(?>ab|b)c)\w"), profile=collected)
+        self.assertEqual(matcher.search(b"xbc").span(), (1, 2))
+        self.assertEqual(matcher.search("xabc").span(), (1, 2))
+        self.assertEqual(collected.max_depth, 3)
+        # The str and binary matchers count into the same nodes
+        self.assertEqual(len(collected.nodes()), len(set(map(id, collected.nodes()))))
+        self.assertEqual(stats(collected)["Char('c')"].entered, 2)
+
+    def test_hooks(self):
+        calls = []
+        collected = Profile(calls.append)
+        matcher = Matcher(parse(r"\d+x"), profile=collected)
+        matcher.findall("12x 3 45x")
+        self.assertEqual(len(calls), collected.calls)
+        self.assertEqual(
+            set(calls[0]), {"entered", "failed", "backtracks", "time_ns", "max_depth", "max_stack"}
+        )
+        # The hooks also count the instructions around the pattern, which no node owns
+        self.assertGreaterEqual(
+            sum(call["entered"] for call in calls),
+            sum(entry.entered for entry in collected.nodes()),
+        )
+
+    def test_profile_prints_the_hot_spots(self):
+        out = io.StringIO()
+        collected = profile(r"(\w+)=(\d+)", "a=1 bb=22 c=x", top=3, file=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], r"(\w+)=(\d+)")
+        self.assertEqual(len(lines), 5)
+        self.assertTrue(all("entered" in line for line in lines[2:]))
+        self.assertIn("^", lines[2])
+        self.assertGreater(collected.calls, 0)
@@ -54,3 +54,32 @@ class TestLexer(unittest.TestCase):
                 Token(TokenType.EOF, None, 18),
             ],
         )
+
+    def test_possessive_and_atomic(self):
+        tokens = Lexer(r"(?>a*+)\++[+]").tokenize()
+
+        self.assertEqual(
+            tokens,
+            [
+                Token(TokenType.ATOMIC, r"(?>", 0),
+                Token(TokenType.CHAR, r"a", 3),
+                Token(TokenType.STAR, r"*", 4),
+                Token(TokenType.POSSESSIVE, r"+", 5),
+                Token(TokenType.RPAREN, r")", 6),
+                # An escaped plus is a literal, the plus after it a quantifier
+                Token(TokenType.CHAR, r"+", 7),
+                Token(TokenType.PLUS, r"+", 9),
+                Token(TokenType.LBRACKET, r"[", 10),
+                Token(TokenType.PLUS, r"+", 11),
+                Token(TokenType.RBRACKET, r"]", 12),
+                Token(TokenType.EOF, None, 13),
+            ],
+        )
+
+    def test_lazy_quantifiers_cannot_be_possessive(self):
+        for pattern, position in ((r"a*?+", 3), (r"a{2}?+", 5), (r"(?:ab)??+", 8)):
+            with self.subTest(pattern=pattern):
+                with self.assertRaisesRegex(ValueError, f"Multiple repeat at position {position}"):
+                    Lexer(pattern).tokenize()
+        # A `?` quantifier can be possessive
+        self.assertEqual(Lexer(r"a?+").tokenize()[2].t_type, TokenType.POSSESSIVE)
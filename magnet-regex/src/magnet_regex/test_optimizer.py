@@ -0,0 +1,82 @@
+import re
+import unittest
+from magnet_regex._testing import parse
+from magnet_regex.ast_node import (
+    AlternationNonde,
+    CharClassNode,
+    CharNode,
+    ConcatNode,
+    GroupNode,
+    LiteralNode,
+    QuantifierNode,
+)
+from magnet_regex.compiler import CHAR, compile_program
+from magnet_regex.matcher import Matcher
+from magnet_regex.optimizer import debug_dump, optimize
+
+
+class TestOptimizer(unittest.TestCase):
+    def test_unwraps_and_merges_literals(self):
+        self.assertEqual(optimize(parse("abc")), LiteralNode("abc"))
+        self.assertEqual(optimize(parse("a")), CharNode("a"))
+        self.assertEqual(
+            optimize(parse("a(?:bc)d+")),
+            ConcatNode([LiteralNode("abc"), QuantifierNode(CharNode("d"), 1, None)]),
+        )
+        self.assertEqual(optimize(parse("(?:ab){1}")), LiteralNode("ab"))
+
+    def test_single_characters_become_a_class(self):
+        node = optimize(parse("a|b|[cd]|ef|g"))
+        self.assertIsInstance(node, AlternationNonde)
+        self.assertEqual(node.alternatives[0], CharClassNode({"a", "b", "c", "d"}))
+        # Only neighbours are merged, `g` is still tried after `ef`
+        self.assertEqual(node.alternatives[1:], [LiteralNode("ef"), CharNode("g")])
+
+    def test_common_prefixes_are_factored(self):
+        self.assertEqual(
+            optimize(parse("abc|abd")),
+            ConcatNode([LiteralNode("ab"), CharClassNode({"c", "d"})]),
+        )
+        node = optimize(parse("(foo|foobar|fx)"))
+        self.assertIsInstance(node, GroupNode)
+        # foo|foobar gives oo(?:|bar), which is tried before x
+        bar = AlternationNonde([ConcatNode([]), LiteralNode("bar")])
+        foo = ConcatNode([LiteralNode("oo"), bar])
+        expected = ConcatNode([CharNode("f"), AlternationNonde([foo, CharNode("x")])])
+        self.assertEqual(node.child, expected)
+
+    def test_matches_are_unchanged(self):
+        cases = [
+            (r"(abc|abd|ab)(c)?", "abcc abd ab abdc"),
+            (r"(?:foo|foobar|fx)+", "foobarfxfoo fo"),
+            (r"(a|b|(c)|ab)+\2?", "abcab cc"),
+            (r"x(?:ab(c)|ab(d))", "xabd xabc"),
+        ]
+        for pattern, text in cases:
+            for engine in ("auto", "backtrack"):
+                with self.subTest(pattern=pattern, engine=engine):
+                    matcher = Matcher(parse(pattern), engine=engine)
+                    found = [(m.span(), m.groups()) for m in matcher.findall(text)]
+                    expected = [(m.span(), m.groups()) for m in re.finditer(pattern, text)]
+                    self.assertEqual(found, expected)
+
+    def test_input_is_left_untouched(self):
+        ast = parse("abc|abd")
+        before = repr(ast), list(ast.alternatives)
+        optimize(ast)
+        self.assertEqual((repr(ast), list(ast.alternatives)), before)
+
+    def test_debug_dump(self):
+        dump = debug_dump(parse("ab|ac"))
+        before, after = dump.split("after:\n")
+        self.assertIn("Char('b')", before)
+        self.assertEqual(after, "Concat\n  Char('a')\n  CharClass([bc])")
+
+    def test_literal_runs(self):
+        program = compile_program(optimize(parse("x+hello")))
+        first = program.args.index("h")
+        self.assertEqual(program.ops[first], CHAR)
+        self.assertEqual(program.literal_runs[first], "hello")
+        self.assertEqual(program.literal_runs[first + 3], "lo")
+        self.assertIsNone(program.literal_runs[first + 4])
+        self.assertEqual(set(compile_program(parse("hello"), binary=True).literal_runs), {None})
@@ -0,0 +1,95 @@
+import unittest
+from magnet_regex._testing import parse
+from magnet_regex.matcher import Matcher
+from magnet_regex.parallel import is_bounded
+from magnet_regex.pattern import Pattern
+
+
+def found(matches):
+    return [(m.span(), m.groups()) for m in matches]
+
+
+class TestParallel(unittest.TestCase):
+    def test_same_matches_as_finditer(self):
+        text = "id=12 id=345 idx=6\nid=7 ab aab\n" * 8
+        cases = [
+            (r"id=(\d{1,3})", {}),
+            (r"(a|ab)(b?)", {}),
+            (r"^\w{2}", {"multiline": True}),
+            (r"(?<=a)a?b\b|$", {}),
+            (r"x?", {}),
+        ]
+        for pattern, flags in cases:
+            compiled = Pattern(pattern, flags)
+            expected = found(compiled.finditer(text))
+            for chunk_size in (1, 5, 64):
+                with self.subTest(pattern=pattern, chunk_size=chunk_size):
+                    matches = compiled.findall_parallel(text, workers=2, chunk_size=chunk_size)
+                    self.assertEqual(found(matches), expected)
+
+    def test_binary_and_wide_text(self):
+        compiled = Pattern(r"é(\w)|日本")
+        text = "éa 日本 éb " * 10
+        self.assertEqual(
+            found(compiled.findall_parallel(text, workers=2, chunk_size=7)),
+            found(compiled.finditer(text)),
+        )
+        compiled = Pattern(r"(\w)=\d")
+        data = b"a=1 bc=2 d=e " * 10
+        matches = compiled.findall_parallel(data, workers=2, chunk_size=7)
+        self.assertEqual([m.span() for m in matches], [m.span() for m in compiled.finditer(data)])
+        self.assertEqual(bytes(matches[1].group(1)), b"c")
+
+    def test_unbounded_patterns_run_sequentially(self):
+        self.assertTrue(is_bounded(Matcher(parse(r"a{2,5}(?=b|cd)"))))
+        for pattern in (r"a+", r"(a)\1", r"(?<=a.*)b"):
+            self.assertFalse(is_bounded(Matcher(parse(pattern), {"unbounded_lookbehind": True})))
+
+        compiled = Pattern(r"\d+")
+        text = "1 22 333 " * 20
+        self.assertEqual(
+            found(compiled.findall_parallel(text, workers=2, chunk_size=4)),
+            found(compiled.finditer(text)),
+        )
+        with self.assertRaises(ValueError):
+            compiled.findall_parallel(text, workers=0)
+
+    def test_many_records(self):
+        compiled = Pattern(r"(\w+)=(\d+)")
+        records = ["a=1", "x b=22", "", "c=d", "é=3"] * 7
+        expected_match = [found([m])[0] if m else None for m in map(compiled.match, records)]
+        expected_search = [found([m])[0] if m else None for m in map(compiled.search, records)]
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                matches = compiled.match_many(iter(records), workers=workers, chunksize=3)
+                self.assertEqual([found([m])[0] if m else None for m in matches], expected_match)
+                matches = compiled.search_many(records, workers=workers, chunksize=4)
+                self.assertEqual([found([m])[0] if m else None for m in matches], expected_search)
+                self.assertEqual(
+                    list(compiled.search_many(records, workers, 4, output="span")),
+                    [e and e[0] for e in expected_search],
+                )
+                self.assertEqual(
+                    list(compiled.match_many(records, workers, 4, output="bool")),
+                    [e is not None for e in expected_match],
+                )
+
+        data = [b"k=1", b"k", bytearray(b"xy=22")]
+        self.assertEqual(
+            list(compiled.search_many(data, workers=2, output="span")),
+            [(0, 3), None, (0, 5)],
+        )
+        with self.assertRaises(ValueError):
+            compiled.match_many(records, output="groups")
+        with self.assertRaises(ValueError):
+            compiled.search_many(records, chunksize=0)
+
+    def test_is_match(self):
+        for pattern in (r"b\d", r"(\w)\1"):
+            matcher = Matcher(parse(pattern))
+            for text in ("b1", "xb1", "aa", "xaa", b"b1", b"xaa", ""):
+                with self.subTest(pattern=pattern, text=text):
+                    self.assertEqual(matcher.is_match(text), matcher.search(text) is not None)
+                    self.assertEqual(
+                        matcher.is_match(text, anchored=True), matcher.match(text) is not None
+                    )
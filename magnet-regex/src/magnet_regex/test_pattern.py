@@ -0,0 +1,109 @@
+import re
+import threading
+import unittest
+import magnet_regex
+from magnet_regex.pattern import PatternCache
+
+
+class TestPattern(unittest.TestCase):
+    def setUp(self):
+        magnet_regex.purge()
+
+    def test_compile_is_cached(self):
+        first = magnet_regex.compile(r"(\d+)-(\d+)")
+        second = magnet_regex.compile(r"(\d+)-(\d+)")
+
+        self.assertIs(first, second)
+        self.assertEqual(first.groups, 2)
+        self.assertEqual(first.search("tel 12-345").group(2), "345")
+
+    def test_flags_are_part_of_the_key(self):
+        plain = magnet_regex.compile("abc")
+        ignorecase = magnet_regex.compile("abc", {"ignorecase": True})
+
+        self.assertIsNot(plain, ignorecase)
+        self.assertIsNone(plain.search("ABC"))
+        self.assertIsNotNone(ignorecase.search("ABC"))
+        # Disabled flags don't change the key
+        self.assertIs(magnet_regex.compile("abc", {"ignorecase": False}), plain)
+
+        with self.assertRaises(ValueError):
+            magnet_regex.compile("abc", {"verbose": True})
+
+    def test_module_shortcuts(self):
+        self.assertEqual(magnet_regex.search(r"\d+", "abc 123").group(), "123")
+        self.assertIsNone(magnet_regex.match(r"\d+", "abc 123"))
+        self.assertEqual(len(magnet_regex.findall(r"\d", "1a2b3")), 3)
+
+    def test_finditer_is_lazy(self):
+        pattern = magnet_regex.compile(r"\d+")
+        matches = pattern.finditer("1 22 333")
+
+        self.assertEqual(next(matches).group(), "1")
+        self.assertEqual([m.group() for m in matches], ["22", "333"])
+        self.assertEqual([m.group() for m in magnet_regex.finditer("a*", "baa")], ["", "aa", ""])
+
+    def test_finditer_pos_and_endpos(self):
+        text = "ab1 ab22 ab333"
+        for pattern, pos, endpos in [(r"ab\d+", 1, None), (r"ab\d+$", 0, 7), (r"\bab", 4, 12)]:
+            with self.subTest(pattern=pattern, pos=pos, endpos=endpos):
+                compiled = re.compile(pattern.replace("$", r"\Z"))
+                expected = [m.span() for m in compiled.finditer(text, pos, endpos or len(text))]
+                got = magnet_regex.compile(pattern).finditer(text, pos, endpos)
+                self.assertEqual([(m.start, m.end) for m in got], expected)
+
+    def test_finditer_clamps_pos_and_endpos(self):
+        text = "ab1 ab22"
+        bounds = [(0, -1), (-5, -2), (-3, 99), (20, 99), (5, 2), (2, 5), (0, 0)]
+        for pattern in (r"ab\d*", r"\d*"):
+            compiled = re.compile(pattern)
+            for pos, endpos in bounds:
+                expected = [m.span() for m in compiled.finditer(text, pos, endpos)]
+                for haystack in (text, text.encode()):
+                    with self.subTest(pattern=pattern, pos=pos, endpos=endpos, kind=type(haystack)):
+                        got = magnet_regex.compile(pattern).finditer(haystack, pos, endpos)
+                        self.assertEqual([m.span() for m in got], expected)
+
+    def test_count_and_first_n(self):
+        pattern = magnet_regex.compile(r"x+")
+        text = "x xx " * 1000
+        self.assertEqual(pattern.count(text), 2000)
+        self.assertEqual([m.group() for m in pattern.first_n(text, 3)], ["x", "xx", "x"])
+        self.assertEqual(pattern.first_n("none", 3), [])
+
+    def test_lru_eviction_and_stats(self):
+        cache = PatternCache(max_size=2)
+        a = cache.get("a")
+        cache.get("b")
+        # Touch "a" so that "b" is the least recently used one
+        self.assertIs(cache.get("a"), a)
+        cache.get("c")
+
+        self.assertEqual(len(cache), 2)
+        self.assertIs(cache.get("a"), a)
+        self.assertEqual(cache.stats(), {"hits": 2, "misses": 3, "size": 2, "max_size": 2})
+
+        # "b" was evicted
+        cache.get("b")
+        self.assertEqual(cache.stats()["misses"], 4)
+
+        cache.purge()
+        self.assertEqual(len(cache), 0)
+        cache.resize(0)
+        self.assertIsNot(cache.get("a"), cache.get("a"))
+
+    def test_shared_between_threads(self):
+        pattern = magnet_regex.compile(r"(\w+)@(\w+)")
+        results = []
+
+        def worker():
+            for _ in range(50):
+                results.append(pattern.search("mail joe@example now").group(1))
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ["joe"] * 200)
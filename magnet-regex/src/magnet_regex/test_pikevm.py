@@ -0,0 +1,164 @@
+import re
+import unittest
+from magnet_regex._testing import parse
+from magnet_regex.instrument import Profile
+from magnet_regex.matcher import Matcher
+
+
+def build_matcher(pattern, flags=None, engine="auto"):
+    return Matcher(parse(pattern), flags, engine)
+
+
+def as_tuples(matches):
+    return [
+        (m.start, m.end, m.text, {i: g for i, g in enumerate(m.groups(), 1) if g is not None})
+        for m in matches
+    ]
+
+
+def re_tuples(pattern, text):
+    return [
+        (
+            m.start(),
+            m.end(),
+            m.group(0),
+            {i: g for i, g in enumerate(m.groups(), 1) if g is not None},
+        )
+        for m in re.finditer(pattern, text)
+    ]
+
+
+CASES = [
+    (r"ab*c|d", ["abbc", "xd", "ac", "abd"]),
+    (r"(a|ab)(c|bcd)(d*)", ["abcd", "xxabcd"]),
+    (r"a{2,3}", ["aaaa", "a", "aaaaaaa"]),
+    (r"a{2,}?b", ["aaaab"]),
+    (r"(\d+)-(\d+)", ["tel 12-345 x"]),
+    (r"[a-c]+x", ["zzabcabx"]),
+    (r"[^a-c]+", ["abcxyzabc"]),
+    (r"\bcat\b", ["tomcat cat"]),
+    (r"\Bcat", ["tomcat cat"]),
+    (r"^hello", ["hello world", "say hello"]),
+    (r"world$", ["hello world", "world peace"]),
+    (r"a.c", ["abc a\nc"]),
+    (r"(?:foo|bar)+", ["foobarfoox"]),
+    (r"x(?=y)", ["xz xy"]),
+    (r"x(?!y)", ["xy xz"]),
+    (r"(?<=a)b", ["cb ab"]),
+    (r"(?<!a)b", ["ab cb"]),
+    (r"(a|b)*c", ["ababc"]),
+    (r".*?x", ["aaxbbx"]),
+    (r"a*", ["baaa", ""]),
+    (r"(\w+)@(\w+)\.com", ["mail joe@example.com now"]),
+    (r"colou?r", ["color colour"]),
+]
+
+# Loops whose body can match the empty string, and lazy quantifiers inside loops, where engines
+# that skip the empty iteration check differently would find different matches
+AGREEMENT_CASES = [
+    (r"(?:.*?)+", ["xxa", ""]),
+    (r"b(?:(?:\w*?)*)?", ["AbAB"]),
+    (r"(?:[^x]*?)+.", ["abcdefghijklmn"]),
+    (r"(a*)*b", ["aaab", "aaa b"]),
+    (r"(a|)*?b", ["xaab ab"]),
+    (r"(?:|[^x])*b", ["Abab"]),
+    (r"((?:[ab])*)*", ["abax"]),
+    (r"(\w*?,)+?(\d+)", ["a,b,,12 x,3"]),
+    (r"(?:(a*?)(b*))*x", ["aabbx abx"]),
+    (r"(?:a|b*?)+c", ["abbac c"]),
+    (r"((?:a?)*?)+$", ["aaa", "ab"]),
+    (r"(?:(x?)(y??))*z", ["xyxz yz"]),
+]
+
+
+class TestPikeVM(unittest.TestCase):
+    def test_engine_selection(self):
+        self.assertEqual(build_matcher(r"(a|b)*c", engine="pikevm").engine, "pikevm")
+        self.assertEqual(build_matcher(r"a(?=b)").engine, "pikevm")
+        self.assertEqual(build_matcher(r"(\w)\1").engine, "backtrack")
+        self.assertEqual(build_matcher(r"(a|b)*c", engine="backtrack").engine, "backtrack")
+
+        with self.assertRaises(ValueError):
+            build_matcher(r"(\w)\1", engine="pikevm")
+
+    def test_findall_agrees_with_re_and_backtracker(self):
+        for pattern, texts in CASES:
+            pikevm = build_matcher(pattern, engine="pikevm")
+            backtrack = build_matcher(pattern, engine="backtrack")
+            for text in texts:
+                with self.subTest(pattern=pattern, text=text):
+                    expected = re_tuples(pattern, text)
+                    self.assertEqual(as_tuples(pikevm.findall(text)), expected)
+                    self.assertEqual(as_tuples(backtrack.findall(text)), expected)
+
+    def test_engines_agree(self):
+        for pattern, texts in CASES + AGREEMENT_CASES:
+            matchers = {}
+            for engine in Matcher.ENGINES:
+                try:
+                    matchers[engine] = build_matcher(pattern, engine=engine)
+                except ValueError:
+                    # The DFA does not run lookarounds
+                    continue
+            # Gaining a backreference, even one that matches nothing, moves `auto` to the
+            # backtracker
+            with_backref = build_matcher(pattern + r"()\%d" % (re.compile(pattern).groups + 1))
+            self.assertEqual(with_backref.engine, "backtrack")
+            for text in texts:
+                expected = re.search(pattern, text)
+                expected = expected and (expected.span(), expected.groups())
+                reference = as_tuples(matchers["backtrack"].findall(text))
+                for engine, matcher in matchers.items():
+                    with self.subTest(pattern=pattern, text=text, engine=engine):
+                        self.assertEqual(as_tuples(matcher.findall(text)), reference)
+                        found = matcher.search(text)
+                        self.assertEqual(found and (found.span(), found.groups()), expected)
+                with self.subTest(pattern=pattern, text=text, engine="auto with a backreference"):
+                    spans = [match.span() for match in with_backref.findall(text)]
+                    self.assertEqual(spans, [found[:2] for found in reference])
+                with self.subTest(pattern=pattern, text=text, engine="auto with a profile"):
+                    profiled = Matcher(parse(pattern), profile=Profile())
+                    self.assertEqual(as_tuples(profiled.findall(text)), reference)
+
+    def test_match_and_search(self):
+        matcher = build_matcher(r"(\d+)-(\d+)")
+
+        self.assertIsNone(matcher.match("tel 12-345"))
+        match = matcher.match("tel 12-345", 4)
+        self.assertEqual((match.start, match.end), (4, 10))
+        self.assertEqual(match.group(2), "345")
+
+        match = matcher.search("tel 12-345")
+        self.assertEqual(match.group(), "12-345")
+        self.assertEqual(match.groups(), ("12", "345"))
+        self.assertEqual(match.span(2), (7, 10))
+
+    def test_match_objects(self):
+        text = "tel 12-345"
+        match = build_matcher(r"(\d+)-(\d+)(x)?").search(text)
+
+        self.assertIs(match.string, text)
+        self.assertEqual(match.span(), (4, 10))
+        self.assertEqual(match.span(3), (-1, -1))
+        self.assertEqual(match.groups(), ("12", "345", None))
+        self.assertEqual(match.groups(""), ("12", "345", ""))
+        self.assertFalse(hasattr(match, "__dict__"))
+        with self.assertRaises(IndexError):
+            match.group(4)
+
+    def test_groups_under_a_zero_quantifier(self):
+        match = build_matcher(r"a(b){0}c").search("ac")
+        self.assertEqual(match.groups(), (None,))
+
+    def test_flags(self):
+        self.assertEqual(build_matcher("HeLLo", {"ignorecase": True}).search("say hello").start, 4)
+        self.assertEqual(build_matcher("a.c", {"dotall": True}).search("a\nc").end, 3)
+        matcher = build_matcher("^b$", {"multiline": True})
+        self.assertEqual(matcher.search("a\nb\nc").start, 2)
+
+    def test_pathological_patterns_are_linear(self):
+        # Both would take exponential time in a backtracking engine
+        self.assertIsNone(build_matcher(r"(a|aa)*b").search("a" * 5000))
+        self.assertIsNone(build_matcher(r"(a*)*b").search("a" * 5000))
+        match = build_matcher(r"(\w+\s?)*$").search("ab cd " * 500 + "!")
+        self.assertEqual((match.start, match.end), (3001, 3001))
@@ -0,0 +1,78 @@
+import re
+import unittest
+from magnet_regex._testing import parse
+from magnet_regex.matcher import Matcher
+from magnet_regex.pattern import compile
+from magnet_regex.planner import (
+    LINE_STARTS,
+    SCAN,
+    START,
+    SUFFIX_WINDOW,
+    WORD_BOUNDARIES,
+    build_plan,
+)
+
+
+class TestPlanner(unittest.TestCase):
+    def test_plan_kinds(self):
+        cases = [
+            (r"^ab|^c", {}, START),
+            (r"(^a)+b", {}, START),
+            (r"ab^|c", {}, SCAN),
+            (r"a{1,3}(b|cd)$", {}, SUFFIX_WINDOW),
+            (r"a+$", {}, SCAN),
+            (r"^a", {"multiline": True}, LINE_STARTS),
+            (r"\bfoo", {}, WORD_BOUNDARIES),
+            (r"a$", {"multiline": True}, SCAN),
+        ]
+        for pattern, flags, kind in cases:
+            with self.subTest(pattern=pattern):
+                self.assertEqual(build_plan(parse(pattern), flags).kind, kind)
+        # The automata scan the text in one pass rather than restart at every line
+        automata = build_plan(parse("^a"), {"multiline": True}, backtracking=False)
+        self.assertEqual(automata.kind, SCAN)
+
+    def test_starts(self):
+        text = "ab cd\nef\n"
+        lines = build_plan(parse("^a"), {"multiline": True})
+        self.assertEqual(list(lines.starts(text, 0)), [0, 6, 9])
+        self.assertEqual(list(lines.starts(text, 1)), [6, 9])
+        lines = build_plan(parse("^a"), {"multiline": True}, binary=True)
+        self.assertEqual(list(lines.starts(text.encode(), 0)), [0, 6, 9])
+        self.assertEqual(list(lines.starts(memoryview(text.encode()), 0)), [0, 6, 9])
+        words = build_plan(parse(r"\ba"))
+        self.assertEqual(list(words.starts(text, 0)), [0, 2, 3, 5, 6, 8])
+        window = build_plan(parse(r"a{2,4}$"))
+        self.assertEqual(list(window.starts(text, 0)), [5, 6, 7])
+
+    def test_matches_are_unchanged(self):
+        text = "ab ab\nba aab\nab"
+        cases = [
+            (r"^(a|b)b", 0),
+            (r"^(\w)b", re.MULTILINE),
+            (r"\b(\w)\w\b", 0),
+            (r"(a|b)b$", 0),
+            (r"^(\w)\w*\s*\1", re.MULTILINE),
+            (r"\b(a+)b", 0),
+        ]
+        for pattern, flags in cases:
+            for engine in Matcher.ENGINES:
+                options = {"multiline": True} if flags else {}
+                try:
+                    matcher = Matcher(parse(pattern), options, engine=engine)
+                except ValueError:
+                    continue
+                with self.subTest(pattern=pattern, engine=engine):
+                    found = [(m.span(), m.groups()) for m in matcher.finditer(text)]
+                    expected = [(m.span(), m.groups()) for m in re.finditer(pattern, text, flags)]
+                    self.assertEqual(found, expected)
+                    binary = [m.span() for m in matcher.finditer(text.encode())]
+                    self.assertEqual(binary, [span for span, _ in expected])
+
+    def test_explain(self):
+        explained = compile(r"^(\w)\1x", {"multiline": True}).explain()
+        self.assertIn("engine: backtrack", explained)
+        self.assertIn("start plan: line_starts", explained)
+        # A backreference can match any number of characters
+        self.assertIn("prefilter: literal 'x', 1 or more characters after the start", explained)
+        self.assertIn("start plan: scan", compile("ab").explain())
@@ -0,0 +1,108 @@
+import re
+import unittest
+from magnet_regex._testing import parse
+from magnet_regex.matcher import Matcher
+from magnet_regex.prefilter import build_prefilter, literal_prefix, literals
+
+
+def spans(matcher, text):
+    return [(m.start, m.end) for m in matcher.findall(text)]
+
+
+class TestLiteralPrefix(unittest.TestCase):
+    def test_prefixes(self):
+        cases = [
+            (r"ERROR: (\d+)", "ERROR: "),
+            (r"(ab)c", "abc"),
+            (r"(?:ab)+c", "ab"),
+            (r"a{3}b", "aaab"),
+            (r"a{2,4}b", "aa"),
+            (r"^\bfoo$", "foo"),
+            (r"ab|ac", ""),
+            (r"a*b", ""),
+        ]
+        for pattern, expected in cases:
+            with self.subTest(pattern=pattern):
+                self.assertEqual(literal_prefix(parse(pattern))[0], expected)
+
+    def test_inner_literals(self):
+        cases = [
+            (r"\d+\.\d+\.\d+ timeout", " timeout", (5, None)),
+            (r".*Exception", "Exception", (0, None)),
+            (r"\d{1,3}-(ab|cd)-\w{2}xyz", "xyz", (7, 9)),
+            (r"[a-z](?:foo)+bar", "foobar", (1, None)),
+            (r"\w(foo|bar)", "", (0, 0)),
+        ]
+        for pattern, literal, offsets in cases:
+            with self.subTest(pattern=pattern):
+                info = literals(parse(pattern))
+                self.assertEqual(info.inner, literal)
+                if literal:
+                    self.assertEqual(info.inner_offsets, offsets)
+
+    def test_no_prefilter_without_literal(self):
+        self.assertIsNone(build_prefilter(parse(r"\d+")))
+        self.assertTrue(build_prefilter(parse(r"id=\d+")).is_prefix)
+
+    def test_case_insensitive_haystack(self):
+        prefilter = build_prefilter(parse("Error"), {"ignorecase": True})
+        haystack = prefilter.haystack("no ERROR here")
+        self.assertEqual(prefilter.find(haystack, 0), 3)
+
+
+class TestMatcherWithPrefilter(unittest.TestCase):
+    def test_findall_agrees_with_re(self):
+        cases = [
+            (r"ERROR: (\d+)", "ERROR: x ERROR: 12 ERROR 3 ERROR: 45"),
+            (r"ab+c", "abab abbbc abc ac"),
+            (r"(?<=x)ab", "ab xab xxab"),
+            (r"aa", "aaaaa"),
+            (r"a{2,3}", "a aa aaaa"),
+        ]
+        for pattern, text in cases:
+            with self.subTest(pattern=pattern):
+                matcher = Matcher(parse(pattern))
+                self.assertIsNotNone(matcher.prefilter)
+                self.assertEqual(spans(matcher, text), [m.span() for m in re.finditer(pattern, text)])
+
+    def test_inner_literal_windows(self):
+        cases = [
+            (r"\d+\.\d+ timeout", "1.2 ok, 10.20 timeout, 3.4 timeout"),
+            (r"\d{1,3}x\d", "1234x5 12x3 x4"),
+            (r"[a-c]{2}xyz", "axyz abxyz bbbxyz"),
+            (r"\bid(\d)-done", "id1-don id22-done id3-done"),
+        ]
+        for pattern, text in cases:
+            with self.subTest(pattern=pattern):
+                matcher = Matcher(parse(pattern))
+                self.assertFalse(matcher.prefilter.is_prefix)
+                self.assertEqual(spans(matcher, text), [m.span() for m in re.finditer(pattern, text)])
+
+    def test_absent_literal_never_starts_an_engine(self):
+        matcher = Matcher(parse(r".*Exception"))
+
+        def fail(*args):
+            raise AssertionError("the engine should not run")
+
+        matcher._find = fail
+        self.assertIsNone(matcher.search("x" * 10000))
+        self.assertEqual(matcher.findall("no exceptions here"), [])
+
+    def test_case_insensitive(self):
+        matcher = Matcher(parse(r"error: (\d+)"), {"ignorecase": True})
+        match = matcher.search("info: 1\nERROR: 42\n")
+        self.assertEqual((match.start, match.end, match.group(1)), (8, 17, "42"))
+
+    def test_dense_candidates_fall_back_to_the_engine(self):
+        matcher = Matcher(parse(r"a[^a]*z"))
+        text = "a" * 1000 + "bz"
+        self.assertEqual(matcher.search(text).start, 999)
+
+    def test_match_checks_the_literal(self):
+        matcher = Matcher(parse(r"id=(\d+)"))
+        self.assertIsNone(matcher.match("x id=1"))
+        self.assertEqual(matcher.match("x id=1", 2).group(1), "1")
+
+        matcher = Matcher(parse(r"\d{1,2}:ok"))
+        self.assertIsNone(matcher.match("123:ok"))
+        self.assertEqual(matcher.match("12:ok").end, 5)
@@ -0,0 +1,82 @@
+import re
+import unittest
+from magnet_regex.aho_corasick import AhoCorasick
+from magnet_regex.regex_set import RegexSet
+
+PATTERNS = [
+    "foo",
+    r"\d+ms",
+    "ba[rz]",
+    "^start",
+    r"(\w)\1",
+    "end$",
+    r"(?<=x)y",
+    "missing",
+    "(ab)c",
+    "bar",
+]
+
+TEXTS = ["foo took 12ms", "start bar end", "hello xy", "zzz", "abc bar", ""]
+
+
+def expected_matches(patterns, text, flags=0):
+    return [
+        index
+        for index, pattern in enumerate(patterns)
+        if re.search(pattern.replace("$", r"\Z"), text, flags)
+    ]
+
+
+class TestAhoCorasick(unittest.TestCase):
+    def test_overlapping_occurrences(self):
+        automaton = AhoCorasick(["he", "she", "his", "hers"])
+        self.assertEqual(
+            list(automaton.iter_matches("ushers")),
+            [(1, 4), (0, 4), (3, 6)],
+        )
+
+    def test_ignore_case(self):
+        automaton = AhoCorasick(["Error"], ignore_case=True)
+        self.assertEqual(list(automaton.iter_matches("an ERROR")), [(0, 8)])
+
+
+class TestRegexSet(unittest.TestCase):
+    def test_matches_agree_with_re(self):
+        regex_set = RegexSet(PATTERNS)
+        for text in TEXTS:
+            with self.subTest(text=text):
+                expected = expected_matches(PATTERNS, text)
+                self.assertEqual(regex_set.matches(text), expected)
+                self.assertEqual(regex_set.is_match(text), bool(expected))
+
+    def test_strategies(self):
+        regex_set = RegexSet(PATTERNS)
+        self.assertEqual(regex_set._literal_ids, [0, 7, 9])
+        self.assertEqual(regex_set._other_ids, [4, 6])
+
+    def test_search_reports_leftmost_matches(self):
+        regex_set = RegexSet(PATTERNS)
+        text = "abc bar 5ms foo foo"
+        found = regex_set.search(text)
+
+        for index in expected_matches(PATTERNS, text):
+            expected = re.search(PATTERNS[index], text)
+            self.assertEqual((found[index].start, found[index].end), expected.span())
+        self.assertEqual(found[8].group(1), "ab")
+
+    def test_flags(self):
+        regex_set = RegexSet(["error", r"warn\w*"], {"ignorecase": True})
+        self.assertEqual(regex_set.matches("ERROR and WARNING"), [0, 1])
+
+    def test_falls_back_when_the_dfa_thrashes(self):
+        patterns = [r"(a|b)*a(a|b)(a|b)(a|b)(a|b)(a|b)c", r"x\d"]
+        text = "abbabaabbbababbaabab" * 50 + "aabbbbbc"
+        regex_set = RegexSet(patterns, dfa_cache_capacity=1024)
+        self.assertEqual(regex_set.matches(text), expected_matches(patterns, text))
+        self.assertGreater(regex_set._dfa.stats()["gave_up"], 0)
+
+    def test_many_patterns(self):
+        patterns = [f"rule{n}:" + r"\d+" for n in range(300)] + [f"word{n}" for n in range(300)]
+        regex_set = RegexSet(patterns)
+        text = "x rule17:42 y word299 rule250:x"
+        self.assertEqual(regex_set.matches(text), expected_matches(patterns, text))
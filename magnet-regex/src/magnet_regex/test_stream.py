@@ -0,0 +1,85 @@
+import io
+import re
+import unittest
+from magnet_regex._testing import parse
+from magnet_regex.matcher import Matcher
+from magnet_regex.pattern import Pattern
+from magnet_regex.stream import finditer_stream, iter_chunks, scan_window
+
+
+def stream_spans(pattern, source, **kwargs):
+    return [(m.start, m.end) for m in Pattern(pattern).finditer_stream(source, **kwargs)]
+
+
+def re_spans(pattern, text):
+    return [m.span() for m in re.finditer(pattern, text)]
+
+
+class TestStream(unittest.TestCase):
+    def test_matches_across_chunk_boundaries(self):
+        text = "id=123 id=4567 id=8 " * 20
+        pattern = r"id=\d{1,4}"
+        for chunk_size in (1, 3, 7, 64):
+            with self.subTest(chunk_size=chunk_size):
+                chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+                self.assertEqual(
+                    stream_spans(pattern, chunks, chunk_size=chunk_size), re_spans(pattern, text)
+                )
+
+    def test_file_objects(self):
+        text = "first foo\nsecond foo bar\nfoo\n"
+        expected = re_spans(r"\bfoo\b", text)
+        self.assertEqual(stream_spans(r"\bfoo\b", io.StringIO(text), chunk_size=4), expected)
+        self.assertEqual(
+            stream_spans(r"\bfoo\b", io.BytesIO(text.encode()), chunk_size=4), expected
+        )
+
+    def test_binary_chunks_split_inside_a_character(self):
+        text = "café crème café"
+        data = text.encode()
+        chunks = [data[i:i + 1] for i in range(len(data))]
+        self.assertEqual(stream_spans("é", chunks, chunk_size=1), re_spans("é", text))
+
+    def test_groups_and_lookarounds(self):
+        text = "x-ab1 ab2 cab3"
+        matches = list(Pattern(r"(?<=c)ab(\d)").finditer_stream(iter(text), chunk_size=2))
+        self.assertEqual([(m.start, m.end, m.group(1)) for m in matches], [(11, 14, "3")])
+
+    def test_scanner_over_a_window(self):
+        text = "ab1 ab22 ab333"
+        scanner = Matcher(parse(r"ab(\d+)"), {"ignorecase": True}).scanner(text.upper())
+        self.assertEqual(scanner.search(5).span(), (9, 14))
+        matches = list(scanner.matches(1, 9))
+        self.assertEqual([m.span() for m in matches], [(4, 8)])
+
+        shifted = matches[0].shifted(100)
+        self.assertEqual((shifted.start, shifted.span(1)), (104, (106, 108)))
+        self.assertEqual(shifted.group(1), "22")
+        self.assertEqual(shifted.slots(), [104, 108, 106, 108])
+        self.assertEqual(Matcher(parse(r"a(x)?")).scanner("a").search().slots(), [0, 1, -1, -1])
+
+    def test_unbounded_patterns_use_the_limit(self):
+        matcher = Matcher(parse(r"a\d+"))
+        self.assertEqual(scan_window(matcher, 100), (101, 1))
+        self.assertEqual(scan_window(Matcher(parse(r"(?<=ab)c(?=de)")), 100), (4, 3))
+
+        text = "a" + "1" * 50 + " a22"
+        self.assertEqual(
+            stream_spans(r"a\d+", iter(text), chunk_size=8, max_match_length=60),
+            re_spans(r"a\d+", text),
+        )
+
+    def test_buffer_stays_bounded(self):
+        matcher = Matcher(parse(r"x\d\d"))
+        chunks = ("." * 999 + "x12" for _ in range(200))
+        stream = finditer_stream(matcher, chunks, chunk_size=1000)
+        count = 0
+        for match in stream:
+            count += 1
+            self.assertEqual(match.end % 1002, 0)
+            self.assertLess(len(stream.gi_frame.f_locals["buffer"]), 3000)
+        self.assertEqual(count, 200)
+
+    def test_iter_chunks(self):
+        self.assertEqual(list(iter_chunks(io.StringIO("abcde"), chunk_size=2)), ["ab", "cd", "e"])
+        self.assertEqual(list(iter_chunks([b"ab", b"", b"c"])), ["ab", "c"])
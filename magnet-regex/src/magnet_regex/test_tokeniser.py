@@ -1,4 +1,5 @@
 import unittest
+from magnet_regex.ast_node import AtomicGroupNode, CharNode, QuantifierNode
 from magnet_regex.lexer import Lexer
 from magnet_regex.parser import Parser
 from magnet_regex.matcher import Matcher
@@ -44,4 +45,14 @@ class TestParser(unittest.TestCase):
         ast = parser.parse()
         matcher = Matcher(ast)
 
-        print(matcher.search("world hello"))
\ No newline at end of file
+        print(matcher.search("world hello"))
+
+    def test_possessive_and_atomic(self):
+        ast = Parser(Lexer(r"a{2,3}+(?>b)").tokenize()).parse()
+        quantifier, atomic = ast.alternatives[0].children
+
+        self.assertEqual(quantifier, QuantifierNode(CharNode("a"), 2, 3, True, True))
+        self.assertEqual(quantifier.symbol(), "{2, 3}+")
+        self.assertIsInstance(atomic, AtomicGroupNode)
+        with self.assertRaises(ValueError):
+            Parser(Lexer("a*?+").tokenize()).parse()